@@ -1,4 +1,4 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 
 class FragranceFamily(models.Model):
     _name = 'fragrance.family'
@@ -17,6 +17,54 @@ class FragranceFamily(models.Model):
             rec._compute_percentage_start()
             rec._compute_percentage_end()
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_fragrance_family_data(self):
+        """Return the id, name, color, description, threshold and the names of
+        the intensity traits in sequence of all the fragrance families, by id.
+        The result is shared by all the requests and must not be modified."""
+        families = self.sudo().search([], order='id')
+        return tuple({
+            'id': family.id,
+            'name': family.name,
+            'color': family.color,
+            'description': family.description,
+            'threshold': family.threshold,
+            'intensity_traits': tuple(family.intensity_index_ids.sorted('sequence').mapped('name')),
+        } for family in families)
+
+    @api.model
+    def _get_fragrance_families(self, category=None):
+        """Return the fragrance families by id, or those whose name contains
+        the category by name, without querying them."""
+        data = self._get_fragrance_family_data()
+        if category is None:
+            return self.browse([family['id'] for family in data])
+        data = sorted((family for family in data if category.lower() in family['name'].lower()),
+                      key=lambda family: family['name'])
+        return self.browse([family['id'] for family in data])
+
+    @api.model
+    def _get_fragrance_colors(self):
+        """Return the color of the fragrance families by lowercase name"""
+        return {family['name'].lower(): family['color'] for family in self._get_fragrance_family_data()}
+
 class FragranceFamilyValue(models.Model):
     _name = 'fragrance.family.value'
     _description = 'Fragrance Family Value'
@@ -67,3 +115,19 @@ class FragranceIntensityIndex(models.Model):
     sequence = fields.Integer(string='Sequence', help="Order of the intensity index")
     name = fields.Char(string='Name')
     fragrance_family_id = fields.Many2one('fragrance.family', string='Fragrance Family')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -1,4 +1,4 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 import base64
 from odoo.tools.mimetypes import guess_mimetype
 
@@ -42,6 +42,33 @@ class InfoCard(models.Model):
     has_image_3 = fields.Boolean(string="Needs Image 3", default=False)
     has_image_4 = fields.Boolean(string="Needs Image 4", default=False)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('name')
+    def _get_card_id(self, name):
+        return self.sudo().search([('name', '=', name)], limit=1).id
+
+    @api.model
+    def _get_card(self, name):
+        """Return the information card of the page, without searching it"""
+        return self.browse(self._get_card_id(name))
+
     def get_image_mime(self):
         for record in self.with_context(bin_size=False):
             image = record.image_1
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+
+# Fields of the perfumes kept in the cached catalogue
+CATALOGUE_FIELDS = frozenset(['name_code', 'main_category_id', 'perfume_name', 'display_name'])
+
 
 class PerfumeDetails(models.Model):
     _name = 'perfume.details'
     _description = 'Perfume Details'
     _rec_name = 'perfume_name'
+    _sql_constraints = [
+        ('name_code_unique', 'unique(name_code)', 'The name code of the perfume must be unique.'),
+    ]
 
     # Basic Information
     gender = fields.Selection([
@@ -63,3 +70,48 @@ class PerfumeDetails(models.Model):
                 record.display_name = record.perfume_name
             else:
                 record.display_name = record.name_code or 'New Perfume'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if CATALOGUE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_catalogue(self):
+        """Return the id, main category, perfume name and display name of all
+        the perfumes by name code. The result is shared by all the requests
+        and must not be modified."""
+        perfumes = self.sudo().search_fetch([], list(CATALOGUE_FIELDS))
+        return {perfume.name_code: {
+            'id': perfume.id,
+            'main_category_id': perfume.main_category_id.id,
+            'perfume_name': perfume.perfume_name,
+            'display_name': perfume.display_name,
+        } for perfume in perfumes}
+
+    @api.model
+    def _get_by_codes(self, codes):
+        """Return the perfumes of the name codes by code, the codes unknown in
+        the catalogue being left out. The perfumes are read together."""
+        catalogue = self._get_catalogue()
+        ids = {code: catalogue[code]['id'] for code in codes if code in catalogue}
+        prefetch_ids = tuple(set(ids.values()))
+        return {code: self.browse(perfume_id).with_prefetch(prefetch_ids) for code, perfume_id in ids.items()}
+
+    @api.model
+    def _get_by_code(self, code):
+        """Return the perfume of the name code, empty when it is unknown"""
+        return self.browse(self._get_catalogue().get(code, {}).get('id'))
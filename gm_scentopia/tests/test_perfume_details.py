@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('-at_install', 'post_install')
+class TestPerfumeDetails(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.family = self.env['fragrance.family'].create({'name': 'Test Family'})
+        self.perfume = self.env['perfume.details'].create({
+            'gender': 'unisex',
+            'name_code': 'TST-001',
+            'perfume_name': 'Test Perfume',
+        })
+
+    def test_01_catalogue_refreshed_on_write(self):
+        Perfume = self.env['perfume.details']
+        self.assertEqual(Perfume._get_catalogue()['TST-001']['id'], self.perfume.id)
+        self.assertEqual(Perfume._get_by_code('TST-001'), self.perfume)
+
+        self.perfume.write({'name_code': 'TST-002', 'main_category_id': self.family.id})
+        catalogue = Perfume._get_catalogue()
+        self.assertNotIn('TST-001', catalogue)
+        self.assertEqual(catalogue['TST-002']['main_category_id'], self.family.id)
+        self.assertFalse(Perfume._get_by_code('TST-001'))
+
+        # the fields out of the catalogue do not clear it
+        self.perfume.write({'scent_writeup': 'Fresh and light'})
+        self.assertEqual(Perfume._get_by_codes(['TST-002', 'UNKNOWN']), {'TST-002': self.perfume})
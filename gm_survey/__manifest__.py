@@ -11,7 +11,7 @@ Long description of module's purpose
     'author': "My Company",
     'website': "https://www.yourcompany.com",
     'category': 'Uncategorized',
-    'version': '0.1',
+    'version': '0.2',
     'depends': ['base', 'survey', 'survey_crm_generation', 'gm_web', 'gm_scentopia', 'queue_job'],
 
     # always loaded
@@ -19,6 +19,7 @@ Long description of module's purpose
         'security/ir.model.access.csv',
         'data/data_20_question.xml',
         'data/paperformat.xml',
+        'data/ir_actions_server.xml',
         # 'data/data_40_question.xml',
         'views/views.xml',
         'static/src/xml/survey_page.xml',
@@ -53,19 +53,12 @@ class GmSurvey(http.Controller):
         survey = request.env['survey.survey'].sudo().search([('personality_test', '=', True)], limit=1)
         if not survey:
             return request.render('http_routing.404', {})
-            
-        domain = [('survey_id', '=', survey.id), ('is_page', '=', True)]
-        pages = request.env['survey.question'].sudo().search([
-            *domain,
-            '|',
-            ('fixed_question', '=', True),
-            ('fixed_question', '=', False)
-        ])
-        
-        for page in pages:
-            page.sudo().write({
-                'random_questions_count': fixed_question if page.fixed_question else question
-            })
+
+        # The counts are used when the attempt is created on the start page,
+        # the sections of the survey are shared by all the visitors
+        question_counts = dict(request.session.get('gm_survey_question_counts', {}))
+        question_counts[survey.access_token] = [question, fixed_question]
+        request.session['gm_survey_question_counts'] = question_counts
 
         base_url = survey.sudo().get_base_url()
         start_url = survey.sudo().get_start_url()
@@ -113,18 +106,13 @@ class GmSurvey(http.Controller):
         answer = request.env['survey.user_input'].sudo().search([('access_token', '=', answer_token)], limit=1)
         if not answer:
             return request.render('http_routing.404', {})
-        question_data = answer.user_input_line_ids.filtered(lambda x: not x.question_id.fixed_question)
-        _logger.info(question_data)
-        _logger.info(len(question_data))
-        fragrance_family = request.env['fragrance.family'].sudo().search([])
-        divide_by = len(question_data) / 20
         data = {
-            fragrance.name: {
-                'value': len(answer.user_input_line_ids.filtered(lambda x: x.fragrance_family_id == fragrance and not x.question_id.fixed_question)) / divide_by,
-                'percentage': len(answer.user_input_line_ids.filtered(lambda x: x.fragrance_family_id == fragrance and not x.question_id.fixed_question)) / len(question_data) * 100,
-                'description': fragrance.description,
-                'color': fragrance.color or '#FFFFFF'  # Default color if not found
-            } for fragrance in fragrance_family
+            name: {
+                'value': family['score'],
+                'percentage': family['percentage'],
+                'description': family['description'],
+                'color': family['color'],
+            } for name, family in answer._get_fragrance_profile().items()
         }
         _logger.info("data = %s", data)
         labels = list(data.keys())
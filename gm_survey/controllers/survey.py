@@ -30,6 +30,14 @@ class GmSurvey(Survey):
         )
         return device_token
 
+    @http.route('/survey/start/<string:survey_token>', type='http', auth='public', website=True)
+    def survey_start(self, survey_token, answer_token=None, email=False, **post):
+        # Pick the number of questions chosen on /take_a_survey for the attempt
+        question_counts = request.session.get('gm_survey_question_counts', {}).get(survey_token)
+        if question_counts and not answer_token:
+            request.update_context(gm_survey_question_counts=tuple(question_counts))
+        return super().survey_start(survey_token, answer_token=answer_token, email=email, **post)
+
     @http.route('/survey/submit/<string:survey_token>/<string:answer_token>', type='json', auth='public', website=True)
     def survey_submit(self, survey_token, answer_token, **post):
 
@@ -231,16 +239,12 @@ class GmSurvey(Survey):
         survey_sudo, answer_sudo = access_data['survey_sudo'], access_data['answer_sudo']
         data = {}
         if access_data['survey_sudo'].theme_survey == "custom":
-            question_data = answer_sudo.user_input_line_ids.filtered(lambda x: not x.question_id.fixed_question)
-            _logger.info(question_data)
-            _logger.info(len(question_data))
-            fragrance_family = request.env['fragrance.family'].sudo().search([])
             data = {
-                fragrance.name: {
-                    'value': int(answer_sudo.fragrance_value_ids.filtered(lambda x: x.fragrance_family_id.id == fragrance.id).value),
-                    'description': fragrance.description,
-                    'color': fragrance.color or '#FFFFFF'  # Default color if not found
-                } for fragrance in fragrance_family
+                name: {
+                    'value': int(family['value']),
+                    'description': family['description'],
+                    'color': family['color'],
+                } for name, family in answer_sudo._get_fragrance_profile().items()
             }
             _logger.info("data = %s", data)
             template="gm_survey.survey_page_print_custom"
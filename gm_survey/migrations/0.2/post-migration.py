@@ -0,0 +1,15 @@
+from odoo import SUPERUSER_ID, api
+from odoo.tools import split_every
+
+
+def migrate(cr, version):
+    """Count the answers of the user inputs scored before they were counted."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    UserInput = env['survey.user_input']
+    user_input_ids = UserInput.search([('state', '=', 'done'), ('fragrance_answer_count', '=', 0)]).ids
+    for ids in split_every(1000, user_input_ids):
+        UserInput.browse(ids)._compute_fragrance_values()
+        env.flush_all()
+        env.invalidate_all()
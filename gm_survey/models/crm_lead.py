@@ -517,29 +517,29 @@ class CrmLead(models.Model):
             for fv in self.fragrance_value_ids 
             if fv.value and fv.fragrance_family_id
         }
-        fragrance_families = self.env['fragrance.family'].search([], order="id")
-        max_len = max(len(cat.intensity_index_ids) for cat in fragrance_families)
+        fragrance_families = self.env['fragrance.family']._get_fragrance_family_data()
+        max_len = max(len(cat['intensity_traits']) for cat in fragrance_families)
 
         table = []
         for i in range(max_len):
             row = {}
             for fragrance in fragrance_families:
-                traits = fragrance.intensity_index_ids.sorted("sequence")
+                traits = fragrance['intensity_traits']
                 if i < len(traits):
                     idx_from_top = i
                     highlight = False
-                    if fragrance.name in values:
-                        val = values[fragrance.name]   # nilai dihitung dari bawah
+                    if fragrance['name'] in values:
+                        val = values[fragrance['name']]   # nilai dihitung dari bawah
                         target_idx = len(traits) - val
                         if max(0, target_idx - 2) <= idx_from_top <= min(len(traits) - 1, target_idx + 2):
                             highlight = True
-                    row[fragrance.name] = {
-                        'text': traits[idx_from_top].name,
+                    row[fragrance['name']] = {
+                        'text': traits[idx_from_top],
                         'highlight': highlight,
-                        'color': fragrance.color or 'fff'
+                        'color': fragrance['color'] or 'fff'
                     }
                 else:
-                    row[fragrance.name] = {'text': '', 'highlight': False, 'color': 'fff'}
+                    row[fragrance['name']] = {'text': '', 'highlight': False, 'color': 'fff'}
             table.append(row)
         return table, fragrance_families
 
@@ -13,10 +13,12 @@ class SurveySurvey(models.Model):
         if self.personality_test:
             self.env['survey.survey'].search([('id','!=', self.id)]).write({'personality_test': False})
 
-    def _prepare_user_input_predefined_questions(self):
+    def _prepare_user_input_predefined_questions(self, random_questions_count=0, fixed_questions_count=0):
         """ Will generate the questions for a randomized survey.
         It uses the random_questions_count of every sections of the survey to
-        pick a random number of questions and returns the merged recordset """
+        pick a random number of questions and returns the merged recordset.
+        The counts given for an attempt replace the ones of the sections, so
+        that the sections are not written on every start of the survey """
         self.ensure_one()
 
         questions = self.env['survey.question']
@@ -32,9 +34,12 @@ class SurveySurvey(models.Model):
             if self.questions_selection == 'all':
                 questions |= page.question_ids
             else:
-                if 0 < page.random_questions_count < len(page.question_ids):
+                page_questions_count = page.random_questions_count
+                if random_questions_count:
+                    page_questions_count = fixed_questions_count if page.fixed_question else random_questions_count
+                if 0 < page_questions_count < len(page.question_ids):
                     questions_fixed = questions.concat(*random.sample(page.question_ids.filtered(lambda x: x.fixed_question), 7))
-                    questions_non_fixed = questions.concat(*random.sample(page.question_ids.filtered(lambda x: not x.fixed_question), page.random_questions_count))
+                    questions_non_fixed = questions.concat(*random.sample(page.question_ids.filtered(lambda x: not x.fixed_question), page_questions_count))
                     questions = questions_non_fixed + questions_fixed
                 else:
                     questions |= page.question_ids
@@ -1,15 +1,40 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, Command
 from odoo.exceptions import UserError
 import logging
-from ..tools.chart import radar_factory
-import matplotlib.pyplot as plt
+from odoo.tools import split_every
+from odoo.tools.lru import LRU
+from ..tools.chart import render_radar_chart
 import base64
+import hashlib
 import io
+import json
+import lxml.html
 import numpy as np
 from pypdf import PdfReader, PdfWriter
 
 _logger = logging.getLogger(__name__)
 
+# Key of the user inputs to score before commit in cr.precommit.data
+FRAGRANCE_SCORING_KEY = 'gm_survey.fragrance_scoring'
+
+# Reports of the lead merged in the perfume personality report, in their order
+PERSONALITY_REPORT_SECTIONS = [
+    'gm_survey.avatar_report_page_1',
+    'gm_survey.avatar_report_page_5',
+    'gm_survey.avatar_report_page_6',
+    'gm_survey.avatar_report_page_9',
+    'gm_survey.avatar_report_intensity_index',
+    'gm_survey.avatar_report_intensity_table',
+]
+PERSONALITY_REPORT_NAME = 'Scentzania Report.pdf'
+# Invisible text put on the first page of every section to split the pdf
+PERSONALITY_REPORT_MARKER = 'gmsurveysection%d'
+
+# Radar charts by vector of fragrance values, in memory of the worker
+RADAR_CHART_CACHE = LRU(256)
+RADAR_CHART_NAME = 'gm_survey_radar_chart_%s.png'
+
+
 class SurveyUserInput(models.Model):
     _inherit = 'survey.user_input'
 
@@ -22,6 +47,9 @@ class SurveyUserInput(models.Model):
     personality_oriental = fields.Integer(string='Oriental', readonly=True, compute='_compute_personality_scores',store=True)
     device_token = fields.Char('Device Token', index=True)
     fragrance_value_ids = fields.One2many('survey.user_input.fragrance_value', 'user_input_id', string="Fragrance Values")
+    fragrance_answer_count = fields.Integer(string='Fragrance Answers', readonly=True, help="Number of answers to the questions which are not fixed, the fragrance values are computed from.")
+    random_questions_count = fields.Integer(string='Random Questions', readonly=True, help="Number of questions picked in every section for this attempt, the count of the sections is used when empty.")
+    fixed_questions_count = fields.Integer(string='Fixed Questions', readonly=True, help="Number of questions picked in the sections of fixed questions for this attempt.")
 
     def set_avatar_name(self, name=False):
         for rec in self:
@@ -40,28 +68,57 @@ class SurveyUserInput(models.Model):
     def render_radar_chart(self):
         for record in self:
             data = {x.fragrance_family_id.name: x.value for x in record.fragrance_value_ids}
-            labels = list(data.keys())
-            values = list(data.values())
-            N = len(values)
-            theta = radar_factory(N, frame='polygon')
-
-            fig, ax = plt.subplots(figsize=(4, 4), subplot_kw=dict(projection='radar'))
-            ax.plot(theta, values, color='#EEC3C3')
-            ax.fill(theta, values, color='#EEC3C3', alpha=0.9)
-            ax.set_varlabels(labels)
-            ax.set_rmax(max(values) + 1)
-            # ax.set_theta_offset(np.pi / 2)
-            ax.set_theta_direction(-1) 
-            ax.set_title("")
-            ax.yaxis.grid(True, linestyle="--", linewidth=0.8, color="gray")  # lingkaran
-            ax.xaxis.grid(True, linestyle=":", linewidth=0.8, color="gray") 
-
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format='png', bbox_inches='tight', transparent=True)
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-            plt.close(fig)
-            return image_base64
+            png = self._get_radar_chart(list(data.keys()), list(data.values()))
+            return base64.b64encode(png).decode('utf-8')
+
+    @api.model
+    def _get_radar_chart_key(self, labels, values):
+        # the charts are the same for all the user inputs with the same values
+        vector = [list(labels), [round(value, 2) for value in values]]
+        return hashlib.sha256(json.dumps(vector).encode()).hexdigest()
+
+    @api.model
+    def _get_radar_chart(self, labels, values):
+        """Return the png of the radar chart of the values, from the memory of
+        the worker or from the attachments, rendered only when both miss."""
+        key = self._get_radar_chart_key(labels, values)
+        png = RADAR_CHART_CACHE.get(key)
+        if png is not None:
+            return png
+        Attachment = self.env['ir.attachment'].sudo()
+        name = RADAR_CHART_NAME % key
+        attachment = Attachment.search([('res_model', '=', self._name), ('res_id', '=', 0), ('name', '=', name)], limit=1)
+        if attachment:
+            png = attachment.raw
+        else:
+            png = render_radar_chart(labels, values)
+            Attachment.create({
+                'name': name,
+                'type': 'binary',
+                'raw': png,
+                'mimetype': 'image/png',
+                'res_model': self._name,
+                'res_id': 0,
+            })
+        RADAR_CHART_CACHE[key] = png
+        return png
+
+    def _prerender_radar_charts(self):
+        """Render the radar charts of the user inputs which are not stored yet,
+        once for every distinct vector of fragrance values."""
+        keys = set()
+        for ids in split_every(500, self.ids):
+            for record in self.browse(ids):
+                data = {x.fragrance_family_id.name: x.value for x in record.fragrance_value_ids}
+                if not data:
+                    continue
+                key = self._get_radar_chart_key(list(data.keys()), list(data.values()))
+                if key not in keys:
+                    keys.add(key)
+                    self._get_radar_chart(list(data.keys()), list(data.values()))
+            self.env.invalidate_all()
+        _logger.info("%d radar charts rendered for %d user inputs", len(keys), len(self))
+        return True
 
     @api.depends('user_input_line_ids.suggested_answer_id.fragrance_family_id')
     def _compute_personality_scores(self):
@@ -84,91 +141,144 @@ class SurveyUserInput(models.Model):
             rec.personality_woody = scores['Woody']
             rec.personality_oriental = scores['Oriental']
 
-    @api.model
-    def create(self, vals):
-        res = super().create(vals)
-        if res.opportunity_id:
-            res._create_personality_mapping()
+    @api.model_create_multi
+    def create(self, vals_list):
+        # The question counts of the attempt chosen on /take_a_survey
+        question_counts = self.env.context.get('gm_survey_question_counts')
+        for vals in vals_list:
+            if 'predefined_question_ids' in vals:
+                continue
+            if question_counts:
+                vals.setdefault('random_questions_count', question_counts[0])
+                vals.setdefault('fixed_questions_count', question_counts[1])
+            if vals.get('random_questions_count'):
+                survey = self.env['survey.survey'].browse(vals.get('survey_id', self.env.context.get('default_survey_id')))
+                questions = survey._prepare_user_input_predefined_questions(
+                    vals['random_questions_count'], vals.get('fixed_questions_count', 0))
+                vals['predefined_question_ids'] = [Command.set(questions.ids)]
+        res = super().create(vals_list)
+        res.filtered('opportunity_id')._create_personality_mapping()
         return res
 
     def write(self, vals):
-        self.ensure_one()
-        
-        # Calculate fragrance values in one pass
-        fragrance_data = self.env['fragrance.family'].sudo().search([])
-        divisor = 2 if len(self.user_input_line_ids) > 27 else 1
-        
-        # Calculate raw values
-        raw_values = {}
-        for fragrance in fragrance_data:
-            raw_value = sum(1 for line in self.user_input_line_ids 
-                   if line.fragrance_family_id.id == fragrance.id 
-                   and not line.question_id.fixed_question) / divisor
-            raw_values[fragrance.id] = raw_value
-        
-        # Convert to integers with total target of 20
-        if raw_values:
-            # Step 1: round to int
-            int_values = {k: int(round(v)) for k, v in raw_values.items()}
-            
-            # Step 2: check difference from target total (20)
-            target = 20
-            current_sum = sum(int_values.values())
-            diff = target - current_sum
-            
-            # Step 3: adjust to item with largest value
-            if diff != 0:
-                key_max = max(int_values, key=int_values.get)
-                int_values[key_max] += diff
-            
-            # Calculate for target 10
-            int_values_10 = {}
-            if raw_values:
-                # Scale down to target 10
-                scale_factor = 10 / sum(raw_values.values()) if sum(raw_values.values()) > 0 else 0
-                int_values_10 = {k: int(round(v * scale_factor)) for k, v in raw_values.items()}
-                
-                # Adjust to exact target 10
-                current_sum_10 = sum(int_values_10.values())
-                diff_10 = 10 - current_sum_10
-                if diff_10 != 0:
-                    key_max_10 = max(int_values_10, key=int_values_10.get)
-                    int_values_10[key_max_10] += diff_10
-            
-            # Calculate for target 6
-            int_values_6 = {}
-            if raw_values:
-                # Scale down to target 6
-                scale_factor = 6 / sum(raw_values.values()) if sum(raw_values.values()) > 0 else 0
-                int_values_6 = {k: int(round(v * scale_factor)) for k, v in raw_values.items()}
-                
-                # Adjust to exact target 6
-                current_sum_6 = sum(int_values_6.values())
-                diff_6 = 6 - current_sum_6
-                if diff_6 != 0:
-                    key_max_6 = max(int_values_6, key=int_values_6.get)
-                    int_values_6[key_max_6] += diff_6
-        else:
-            int_values = {}
-        
-        
-        vals['fragrance_value_ids'] = [(5, 0, 0)] + [
-            (0, 0, {
-                'user_input_id': self.id,
-                'fragrance_family_id': fragrance.id,
-                'value': int_values.get(fragrance.id, 0),
-                'value_50': int_values_10.get(fragrance.id, 0),
-                'value_30': int_values_6.get(fragrance.id, 0),
-            }) for fragrance in fragrance_data
-        ]
-
         res = super().write(vals)
-        for record in self:
-            if record.opportunity_id:
-                record._create_personality_mapping()
+        # The mapping is built when the survey is done, rebuild it only
+        # when the lead of a done survey changes afterwards
+        if 'opportunity_id' in vals and not self.env.context.get('gm_survey_mark_done'):
+            self.filtered(lambda r: r.state == 'done' and r.opportunity_id)._create_personality_mapping()
         return res
 
+    def _mark_done(self):
+        # Score the answers of the last page before the lead is generated
+        self._score_pending_fragrance_values()
+        res = super(SurveyUserInput, self.with_context(gm_survey_mark_done=True))._mark_done()
+        self.filtered('opportunity_id')._create_personality_mapping()
+        return res
 
+    def _schedule_fragrance_scoring(self):
+        """Score the fragrance families of the user inputs once before the
+        transaction is committed, however many answer lines changed."""
+        if not self:
+            return
+        pending = self.env.cr.precommit.data.setdefault(FRAGRANCE_SCORING_KEY, set())
+        if not pending:
+            self.env.cr.precommit.add(self._score_pending_fragrance_values)
+        pending.update(self.ids)
+
+    def _score_pending_fragrance_values(self):
+        pending = self.env.cr.precommit.data.pop(FRAGRANCE_SCORING_KEY, set())
+        if pending:
+            self.sudo().browse(pending).exists()._compute_fragrance_values()
+            self.env.flush_all()
+
+    @api.model
+    def _get_fragrance_values(self, raw_values):
+        """Return the values of the fragrance families for a total of 20,
+        10 and 6 from their raw values, the difference being adjusted on the
+        family with the largest value."""
+
+        def distribute(values, target):
+            int_values = {k: int(round(v)) for k, v in values.items()}
+            diff = target - sum(int_values.values())
+            if diff != 0 and int_values:
+                key_max = max(int_values, key=int_values.get)
+                int_values[key_max] += diff
+            return int_values
+
+        total = sum(raw_values.values())
+        int_values = distribute(raw_values, 20)
+        int_values_10 = distribute({k: v * (10 / total if total > 0 else 0) for k, v in raw_values.items()}, 10)
+        int_values_6 = distribute({k: v * (6 / total if total > 0 else 0) for k, v in raw_values.items()}, 6)
+        return int_values, int_values_10, int_values_6
+
+    def _compute_fragrance_values(self):
+        """Count the answers of each fragrance family with one grouped query
+        and update the fragrance values of the user inputs in place."""
+        fragrance_data = self.env['fragrance.family']._get_fragrance_families()
+        Line = self.env['survey.user_input.line'].sudo()
+        line_counts = dict(Line._read_group(
+            [('user_input_id', 'in', self.ids)], ['user_input_id'], ['__count']))
+        family_counts = {}
+        answer_counts = {}
+        for user_input, family, count in Line._read_group([
+            ('user_input_id', 'in', self.ids),
+            ('question_id.fixed_question', '=', False),
+        ], ['user_input_id', 'fragrance_family_id'], ['__count']):
+            answer_counts[user_input.id] = answer_counts.get(user_input.id, 0) + count
+            if family:
+                family_counts[user_input.id, family.id] = count
+        FragranceValue = self.env['survey.user_input.fragrance_value'].sudo()
+        to_create = []
+        to_unlink = FragranceValue
+        for rec in self:
+            if rec.fragrance_answer_count != answer_counts.get(rec.id, 0):
+                rec.fragrance_answer_count = answer_counts.get(rec.id, 0)
+            divisor = 2 if line_counts.get(rec, 0) > 27 else 1
+            counts = {fragrance.id: family_counts.get((rec.id, fragrance.id), 0) for fragrance in fragrance_data}
+            int_values, int_values_10, int_values_6 = self._get_fragrance_values(
+                {k: count / divisor for k, count in counts.items()})
+            existing = {}
+            for fragrance_value in rec.sudo().fragrance_value_ids:
+                if fragrance_value.fragrance_family_id.id in counts and \
+                        fragrance_value.fragrance_family_id.id not in existing:
+                    existing[fragrance_value.fragrance_family_id.id] = fragrance_value
+                else:
+                    to_unlink |= fragrance_value
+            for fragrance in fragrance_data:
+                values = {
+                    'answer_count': counts[fragrance.id],
+                    'value': int_values.get(fragrance.id, 0),
+                    'value_50': int_values_10.get(fragrance.id, 0),
+                    'value_30': int_values_6.get(fragrance.id, 0),
+                }
+                fragrance_value = existing.get(fragrance.id)
+                if not fragrance_value:
+                    to_create.append(dict(values, user_input_id=rec.id, fragrance_family_id=fragrance.id))
+                    continue
+                changed = {k: v for k, v in values.items() if fragrance_value[k] != v}
+                if changed:
+                    fragrance_value.write(changed)
+        to_unlink.unlink()
+        FragranceValue.create(to_create)
+
+    def _get_fragrance_profile(self):
+        """Return by name of fragrance family its answer count, stored value,
+        score on 20, percentage, description and color, from the fragrance
+        values stored on the user input, all zero without user input."""
+        values = {fv.fragrance_family_id.id: fv for fv in self.fragrance_value_ids}
+        total = self.fragrance_answer_count
+        profile = {}
+        for fragrance in self.env['fragrance.family']._get_fragrance_family_data():
+            count = values[fragrance['id']].answer_count if fragrance['id'] in values else 0
+            profile[fragrance['name']] = {
+                'answer_count': count,
+                'value': values[fragrance['id']].value if fragrance['id'] in values else 0,
+                'score': count * 20 / total if total else 0,
+                'percentage': count * 100 / total if total else 0,
+                'description': fragrance['description'],
+                'color': fragrance['color'] or '#FFFFFF',  # Default color if not found
+            }
+        return profile
 
     def _create_personality_mapping(self):
         for rec in self:
@@ -256,16 +366,14 @@ class SurveyUserInput(models.Model):
     @api.depends('user_input_line_ids.fragrance_family_id')
     def _compute_avatar_id(self):
         """Compute the avatar_id based on exact match of fragrance_family_ids"""
-        Avatar = self.env['scentopia.avatar']
+        avatars = self.env['scentopia.avatar'].search([('fragrance_family_ids', '!=', False)])
         for record in self:
             # Get all records that have this max value
             max_value_records = record.fragrance_value_ids.filtered(lambda r: r.value >= r.fragrance_family_id.threshold)
             # Get the fragrance family ids from these records
             families = max_value_records.mapped('fragrance_family_id.id')
             target_set = set(families)
-            record.avatar_id = Avatar.search([
-                ('fragrance_family_ids', '!=', False),
-            ]).filtered(lambda a: set(a.fragrance_family_ids.ids) == target_set)[:1].id or False
+            record.avatar_id = avatars.filtered(lambda a: set(a.fragrance_family_ids.ids) == target_set)[:1].id or False
 
     @api.onchange('device_token')
     def _onchange_device_token(self):
@@ -287,11 +395,12 @@ class SurveyUserInput(models.Model):
 
     @api.model
     def send_email_report(self, answer_token, selected_reports=False):
-        _logger.info("================calling======================")
-        generate_reports = self.generate_report(answer_token, selected_reports)
         answer = self.env['survey.user_input'].sudo().search(
             [('access_token', '=', answer_token)], limit=1
         )
+        if not answer or not answer.partner_id.email:
+            return False
+        selected_reports = selected_reports or []
         report_map = {
             "love_match": answer.avatar_id.love_match_report,
             "career_match": answer.avatar_id.career_match_report,
@@ -302,14 +411,24 @@ class SurveyUserInput(models.Model):
             "ayurvedic_dosha": answer.avatar_id.ayurvedic_report,
         }
 
-        if not answer or not answer.partner_id.email:
-            return False
-        report_list = [(0, 0, {
-                'name': 'Scentzania Report.pdf',
+        # Attach the cached report of the lead instead of rendering it for every mail, the
+        # attachment of the mail shares the file of the cached report in the filestore and
+        # is kept when the cached report is rendered again
+        personality_report = 'perfume_personality' in selected_reports and answer._get_personality_report()
+        if personality_report:
+            report_list = [Command.create({
+                'name': PERSONALITY_REPORT_NAME,
                 'type': 'binary',
-                'datas': generate_reports,
+                'raw': personality_report.raw,
                 'mimetype': 'application/pdf',
             })]
+        else:
+            report_list = [(0, 0, {
+                    'name': PERSONALITY_REPORT_NAME,
+                    'type': 'binary',
+                    'datas': self.generate_report(answer_token, selected_reports),
+                    'mimetype': 'application/pdf',
+                })]
         for report in selected_reports:
             if report in report_map and report_map[report]:
                 report_list.append((0, 0, {
@@ -345,32 +464,108 @@ class SurveyUserInput(models.Model):
 
         for report in selected_reports:
             if report == "perfume_personality":
-                personality = answer.avatar_id.perfume_personality_report
-                if personality:
-                    page_1 = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_page_1', [answer.opportunity_id.id])[0]
-                    page_5 = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_page_5', [answer.opportunity_id.id])[0]
-                    page_6 = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_page_6', [answer.opportunity_id.id])[0]
-                    page_9 = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_page_9', [answer.opportunity_id.id])[0]
-                    intensity_index = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_intensity_index', [answer.opportunity_id.id])[0]
-                    intensity_table = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
-                        'gm_survey.avatar_report_intensity_table', [answer.opportunity_id.id])[0]
-                    merged = self.process_report_personality(
-                        personality, page_1, page_5, page_6, page_9, intensity_index, intensity_table
-                    )
-                    if merged:
-                        pdf = PdfReader(io.BytesIO(base64.b64decode(merged)))
-                        for page in pdf.pages:
-                            writer.add_page(page)
+                personality_report = answer._get_personality_report()
+                if personality_report:
+                    writer.append(io.BytesIO(personality_report.raw))
 
         output = io.BytesIO()
         writer.write(output)
         return base64.b64encode(output.getvalue())
 
+    def _get_personality_report_key(self):
+        """Return the key of the perfume personality report of the lead, it
+        changes with the fragrance values of the lead, with the avatar and with
+        the fragrance families and intensities the report describes."""
+        self.ensure_one()
+        lead = self.opportunity_id
+        [[families_date]] = self.env['fragrance.family'].sudo()._read_group([], aggregates=['write_date:max'])
+        [[intensities_date]] = self.env['fragrance.intensity.index'].sudo()._read_group(
+            [], aggregates=['write_date:max'])
+        key = [
+            [(value.fragrance_family_id.id, value.value) for value in lead.fragrance_value_ids],
+            lead.partner_id.name,
+            self.avatar_id.id,
+            fields.Datetime.to_string(self.avatar_id.write_date),
+            fields.Datetime.to_string(families_date),
+            fields.Datetime.to_string(intensities_date),
+        ]
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    def _get_personality_report(self):
+        """Return the attachment of the perfume personality report of the lead,
+        rendered again only when its key changed."""
+        self.ensure_one()
+        Attachment = self.env['ir.attachment'].sudo()
+        lead = self.opportunity_id
+        personality = self.avatar_id.perfume_personality_report
+        if not lead or not personality:
+            return Attachment
+        key = self._get_personality_report_key()
+        attachments = Attachment.search([
+            ('res_model', '=', 'crm.lead'),
+            ('res_id', '=', lead.id),
+            ('name', '=', PERSONALITY_REPORT_NAME),
+        ])
+        report = attachments.filtered(lambda a: a.description == key)[:1]
+        if report:
+            return report
+        merged = self.process_report_personality(personality, *self._render_personality_report_sections(lead))
+        attachments.unlink()
+        return Attachment.create({
+            'name': PERSONALITY_REPORT_NAME,
+            'type': 'binary',
+            'datas': merged,
+            'mimetype': 'application/pdf',
+            'res_model': 'crm.lead',
+            'res_id': lead.id,
+            'description': key,
+        })
+
+    @api.model
+    def _render_personality_report_sections(self, lead):
+        """Render the pages of the lead in the perfume personality report with
+        a single run of wkhtmltopdf, then split them back by section."""
+        IrActionsReport = self.env['ir.actions.report'].sudo()
+        bodies = []
+        for index, report_ref in enumerate(PERSONALITY_REPORT_SECTIONS):
+            html = IrActionsReport._render_qweb_html(report_ref, lead.ids, data={'report_type': 'pdf'})[0]
+            report_bodies, _res_ids, header, footer, paperformat_args = IrActionsReport._prepare_html(
+                self._mark_report_section(html, index), report_model='crm.lead')
+            bodies += report_bodies
+        # The sections share the same paper format and layout
+        content = IrActionsReport._run_wkhtmltopdf(
+            bodies, report_ref=PERSONALITY_REPORT_SECTIONS[0], header=header, footer=footer,
+            specific_paperformat_args=paperformat_args)
+
+        reader = PdfReader(io.BytesIO(content))
+        starts = []
+        for number, page in enumerate(reader.pages):
+            text = page.extract_text() or ''
+            if len(starts) < len(PERSONALITY_REPORT_SECTIONS) and PERSONALITY_REPORT_MARKER % len(starts) in text:
+                starts.append(number)
+        if len(starts) != len(PERSONALITY_REPORT_SECTIONS) or starts[0] != 0:
+            _logger.warning("Sections of the personality report of lead %s not found, rendering them separately", lead.id)
+            return [IrActionsReport._render_qweb_pdf(report_ref, lead.ids)[0] for report_ref in PERSONALITY_REPORT_SECTIONS]
+
+        sections = []
+        for start, end in zip(starts, starts[1:] + [len(reader.pages)]):
+            writer = PdfWriter()
+            for page in reader.pages[start:end]:
+                writer.add_page(page)
+            output = io.BytesIO()
+            writer.write(output)
+            sections.append(output.getvalue())
+        return sections
+
+    @api.model
+    def _mark_report_section(self, html, index):
+        root = lxml.html.fromstring(html)
+        for article in root.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' article ')]"):
+            marker = lxml.html.Element('span', style='color: #fff; font-size: 1px;')
+            marker.text = PERSONALITY_REPORT_MARKER % index
+            article.insert(0, marker)
+        return lxml.html.tostring(root, encoding='utf-8')
+
     @api.model
     def process_report_personality(self, perfume_personality, page_1, page_5, page_6, page_9, intensity_index, intensity_table):
         writer = PdfWriter()
@@ -417,6 +612,26 @@ class SurveyUserInputLine(models.Model):
         help="Select the fragrance family for this answer"
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines.user_input_id._schedule_fragrance_scoring()
+        return lines
+
+    def write(self, vals):
+        if not {'user_input_id', 'question_id', 'fragrance_family_id'} & set(vals):
+            return super().write(vals)
+        user_inputs = self.user_input_id
+        res = super().write(vals)
+        (user_inputs | self.user_input_id)._schedule_fragrance_scoring()
+        return res
+
+    def unlink(self):
+        user_inputs = self.user_input_id
+        res = super().unlink()
+        user_inputs.exists()._schedule_fragrance_scoring()
+        return res
+
 class SurveyUserInputFragranceValue(models.Model):
     _name = 'survey.user_input.fragrance_value'
     _description = 'Survey User Input Fragrance Value'
@@ -424,6 +639,7 @@ class SurveyUserInputFragranceValue(models.Model):
 
     user_input_id = fields.Many2one('survey.user_input', string='User Input', ondelete='cascade')
     fragrance_family_id = fields.Many2one('fragrance.family', string='Fragrance Family')
+    answer_count = fields.Integer(string='Answers', readonly=True)
     value = fields.Float(string='Value Original')
     value_manual = fields.Float(string='Value Manual')
     value_50 = fields.Float(string='Value 50ml')
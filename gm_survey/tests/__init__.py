@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from . import test_take_a_survey
+from . import test_radar_chart
+from . import test_fragrance_scoring
+from . import test_personality_report
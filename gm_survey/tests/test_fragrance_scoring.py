@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.survey_user_input import FRAGRANCE_SCORING_KEY
+
+
+@tagged('-at_install', 'post_install')
+class TestFragranceScoring(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.families = cls.env['fragrance.family'].create([
+            {'name': 'Test %s' % name} for name in ['Citrus', 'Fresh', 'Floral', 'Woody', 'Oriental']
+        ])
+        cls.survey = cls.env['survey.survey'].create({
+            'title': 'Scoring Test',
+            'access_mode': 'public',
+            'users_login_required': False,
+            'generate_leads': True,
+        })
+        cls.page = cls.env['survey.question'].create({
+            'survey_id': cls.survey.id,
+            'title': 'Questions',
+            'is_page': True,
+            'sequence': 1,
+        })
+        cls.questions = cls.env['survey.question'].create([{
+            'survey_id': cls.survey.id,
+            'title': 'Question %s' % index,
+            'question_type': 'text_box',
+            'fixed_question': index % 5 == 4,
+            'sequence': index + 2,
+        } for index in range(32)])
+
+    def setUp(self):
+        super().setUp()
+        self.answer = self.survey._create_answer()
+        self._score()
+
+    def _add_lines(self, questions, offset=0):
+        return self.env['survey.user_input.line'].create([{
+            'user_input_id': self.answer.id,
+            'question_id': question.id,
+            'answer_type': 'text_box',
+            'value_text_box': 'Answer',
+            'fragrance_family_id': self.families[(index * index + offset) % 5].id,
+        } for index, question in enumerate(questions)])
+
+    def _score(self):
+        self.env.cr.precommit.run()
+
+    def _get_values(self, answer):
+        return {
+            value.fragrance_family_id.id: (value.value, value.value_50, value.value_30)
+            for value in answer.fragrance_value_ids
+        }
+
+    def _get_old_values(self, answer):
+        """ the values of the answer computed as the user input did on every
+        write before the scoring was deferred to the commit """
+        fragrance_data = self.env['fragrance.family'].sudo().search([])
+        divisor = 2 if len(answer.user_input_line_ids) > 27 else 1
+        raw_values = {}
+        for fragrance in fragrance_data:
+            raw_values[fragrance.id] = sum(1 for line in answer.user_input_line_ids
+                                           if line.fragrance_family_id.id == fragrance.id
+                                           and not line.question_id.fixed_question) / divisor
+        int_values = {k: int(round(v)) for k, v in raw_values.items()}
+        diff = 20 - sum(int_values.values())
+        if diff != 0:
+            int_values[max(int_values, key=int_values.get)] += diff
+        total = sum(raw_values.values())
+        scaled_values = []
+        for target in (10, 6):
+            scale_factor = target / total if total > 0 else 0
+            values = {k: int(round(v * scale_factor)) for k, v in raw_values.items()}
+            diff = target - sum(values.values())
+            if diff != 0:
+                values[max(values, key=values.get)] += diff
+            scaled_values.append(values)
+        return {
+            fragrance.id: (int_values[fragrance.id], scaled_values[0][fragrance.id], scaled_values[1][fragrance.id])
+            for fragrance in fragrance_data
+        }
+
+    def test_01_answer_lines_scoring(self):
+        """ the values computed once before the commit are those of the old
+        algorithm, below and above 27 answer lines """
+        lines = self._add_lines(self.questions[:20])
+        self.assertIn(self.answer.id, self.env.cr.precommit.data[FRAGRANCE_SCORING_KEY])
+        self._score()
+        self.assertNotIn(FRAGRANCE_SCORING_KEY, self.env.cr.precommit.data)
+        self.assertEqual(self.answer.fragrance_answer_count, 16)
+        self.assertEqual(self._get_values(self.answer), self._get_old_values(self.answer))
+
+        lines |= self._add_lines(self.questions[20:], offset=1)
+        self._score()
+        self.assertEqual(len(self.answer.user_input_line_ids), 32)
+        self.assertEqual(self._get_values(self.answer), self._get_old_values(self.answer))
+
+        lines[:7].unlink()
+        self._score()
+        self.assertEqual(len(self.answer.user_input_line_ids), 25)
+        self.assertEqual(self._get_values(self.answer), self._get_old_values(self.answer))
+
+        lines[7:].unlink()
+        self._score()
+        self.assertEqual(self.answer.fragrance_answer_count, 0)
+        self.assertEqual(self._get_values(self.answer), self._get_old_values(self.answer))
+
+    def test_02_page_navigation_no_scoring(self):
+        """ moving to another page does not score the answer again """
+        self._add_lines(self.questions[:10])
+        self._score()
+        with patch.object(self.registry['survey.user_input'], '_compute_fragrance_values', autospec=True) as compute:
+            self.answer.last_displayed_page_id = self.page
+            self.assertNotIn(FRAGRANCE_SCORING_KEY, self.env.cr.precommit.data)
+            self._score()
+        compute.assert_not_called()
+
+    def test_03_mark_done_scores_last_page(self):
+        """ the answers of the last page are scored before the mapping of the
+        generated lead is built """
+        self._add_lines(self.questions)
+        mapped_values = []
+
+        def create_personality_mapping(answers):
+            for answer in answers.filtered('opportunity_id'):
+                mapped_values.append(self._get_values(answer))
+
+        with patch.object(self.registry['survey.user_input'], '_create_personality_mapping',
+                          autospec=True, side_effect=create_personality_mapping):
+            self.answer._mark_done()
+        self.assertTrue(self.answer.opportunity_id)
+        self.assertEqual(mapped_values, [self._get_old_values(self.answer)])
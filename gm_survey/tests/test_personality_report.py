@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+from unittest.mock import patch
+
+from pypdf import PdfWriter
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.survey_user_input import PERSONALITY_REPORT_NAME, PERSONALITY_REPORT_SECTIONS
+
+
+def _make_pdf(page_count):
+    writer = PdfWriter()
+    for _index in range(page_count):
+        writer.add_blank_page(width=72, height=72)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@tagged('-at_install', 'post_install')
+class TestPersonalityReport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.families = cls.env['fragrance.family'].create([
+            {'name': 'Test %s' % name} for name in ['Citrus', 'Fresh', 'Floral', 'Woody', 'Oriental']
+        ])
+        cls.avatar = cls.env['scentopia.avatar'].create({
+            'name': 'Test Avatar',
+            'fragrance_family_ids': [(6, 0, cls.families[:3].ids)],
+            'perfume_personality_report': base64.b64encode(_make_pdf(9)),
+        })
+        cls.partner = cls.env['res.partner'].create({
+            'name': 'Test Taker',
+            'email': 'taker@example.com',
+        })
+        cls.survey = cls.env['survey.survey'].create({
+            'title': 'Report Test',
+            'access_mode': 'public',
+            'users_login_required': False,
+        })
+        cls.answer = cls.survey._create_answer(partner=cls.partner)
+        cls.env['survey.user_input.fragrance_value'].create([{
+            'user_input_id': cls.answer.id,
+            'fragrance_family_id': family.id,
+            'value': value,
+        } for family, value in zip(cls.families, [8, 6, 4, 2, 0])])
+        cls.lead = cls.env['crm.lead'].create({
+            'name': 'Report Test',
+            'partner_id': cls.partner.id,
+            'survey_user_input_id': cls.answer.id,
+        })
+        cls.answer.opportunity_id = cls.lead
+
+    def setUp(self):
+        super().setUp()
+        sections = [_make_pdf(1) for _section in PERSONALITY_REPORT_SECTIONS]
+        patcher = patch.object(self.registry['survey.user_input'], '_render_personality_report_sections',
+                               autospec=True, return_value=sections)
+        self.render_sections = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_reports(self):
+        return self.env['ir.attachment'].search([
+            ('res_model', '=', 'crm.lead'),
+            ('res_id', '=', self.lead.id),
+            ('name', '=', PERSONALITY_REPORT_NAME),
+        ])
+
+    def test_01_report_cache(self):
+        """ the report of the lead is rendered again only when its fragrance
+        values change """
+        self.assertEqual(self.answer.avatar_id, self.avatar)
+        report = self.answer._get_personality_report()
+        self.assertTrue(report.raw.startswith(b'%PDF'))
+        self.assertEqual(self.render_sections.call_count, 1)
+        self.assertEqual(self.answer._get_personality_report(), report)
+        self.assertEqual(self.render_sections.call_count, 1)
+
+        self.answer.fragrance_value_ids.filtered(lambda v: v.fragrance_family_id == self.families[0]).value = 7
+        new_report = self.answer._get_personality_report()
+        self.assertNotEqual(new_report, report)
+        self.assertFalse(report.exists())
+        self.assertEqual(self.render_sections.call_count, 2)
+        self.assertEqual(self._get_reports(), new_report)
+
+    def test_02_mail_attachment_kept(self):
+        """ the report attached to a sent mail is kept when the report of the
+        lead is rendered again """
+        with patch.object(self.registry['mail.mail'], 'send', autospec=True):
+            self.assertTrue(self.env['survey.user_input'].send_email_report(
+                self.answer.access_token, ['perfume_personality']))
+        mail = self.env['mail.mail'].search([('email_to', '=', self.partner.email)], order='id desc', limit=1)
+        report = self._get_reports()
+        self.assertEqual(self.render_sections.call_count, 1)
+        self.assertEqual(mail.attachment_ids.mapped('name'), [PERSONALITY_REPORT_NAME])
+        self.assertEqual(mail.attachment_ids.raw, report.raw)
+        raw = report.raw
+
+        self.answer.fragrance_value_ids.filtered(lambda v: v.fragrance_family_id == self.families[1]).value = 5
+        self.answer._get_personality_report()
+        self.assertEqual(self.render_sections.call_count, 2)
+        self.assertFalse(report.exists())
+        self.assertTrue(mail.attachment_ids.exists())
+        mail.attachment_ids.invalidate_recordset()
+        self.assertEqual(mail.attachment_ids.raw, raw)
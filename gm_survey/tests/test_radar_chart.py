@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from ..models import survey_user_input
+
+
+@tagged('-at_install', 'post_install')
+class TestRadarChart(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        survey_user_input.RADAR_CHART_CACHE.clear()
+        self.labels = ['Citrus', 'Fresh', 'Floral', 'Woody', 'Oriental']
+
+    def _get_chart_attachments(self):
+        return self.env['ir.attachment'].search([
+            ('res_model', '=', 'survey.user_input'),
+            ('res_id', '=', 0),
+            ('name', '=like', 'gm_survey_radar_chart_%'),
+        ])
+
+    def test_01_radar_chart_cache(self):
+        UserInput = self.env['survey.user_input']
+        attachments = self._get_chart_attachments()
+        png = UserInput._get_radar_chart(self.labels, [6, 4, 3, 5, 2])
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertEqual(len(self._get_chart_attachments() - attachments), 1)
+        # the same vector is served from the memory, then from the attachment
+        self.assertEqual(UserInput._get_radar_chart(self.labels, [6.0, 4, 3, 5, 2]), png)
+        survey_user_input.RADAR_CHART_CACHE.clear()
+        self.assertEqual(UserInput._get_radar_chart(self.labels, [6, 4, 3, 5, 2]), png)
+        self.assertEqual(len(self._get_chart_attachments() - attachments), 1)
+        UserInput._get_radar_chart(self.labels, [2, 5, 3, 4, 6])
+        self.assertEqual(len(self._get_chart_attachments() - attachments), 2)
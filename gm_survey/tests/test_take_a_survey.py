@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from odoo.tests import HttpCase, tagged
+
+
+@tagged('-at_install', 'post_install')
+class TestTakeASurvey(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['survey.survey'].search([('personality_test', '=', True)]).personality_test = False
+        cls.survey = cls.env['survey.survey'].create({
+            'title': 'Personality Test',
+            'access_mode': 'public',
+            'users_login_required': False,
+            'questions_selection': 'random',
+            'personality_test': True,
+        })
+        cls.page = cls.env['survey.question'].create({
+            'survey_id': cls.survey.id,
+            'title': 'Questions',
+            'is_page': True,
+            'random_questions_count': 10,
+            'sequence': 1,
+        })
+        cls.env['survey.question'].create([{
+            'survey_id': cls.survey.id,
+            'title': 'Question %s' % index,
+            'question_type': 'text_box',
+            'fixed_question': index >= 12,
+            'sequence': index + 2,
+        } for index in range(20)])
+        cls.page_write_date = cls.page.write_date
+
+    def test_01_attempt_question_counts(self):
+        answer = self.survey.with_context(gm_survey_question_counts=(5, 7))._create_answer()
+        self.assertEqual(answer.random_questions_count, 5)
+        self.assertEqual(answer.fixed_questions_count, 7)
+        self.assertEqual(len(answer.predefined_question_ids), 12)
+        self.assertEqual(len(answer.predefined_question_ids.filtered('fixed_question')), 7)
+        # the count of the section is kept for the attempts without counts
+        answer = self.survey._create_answer()
+        self.assertFalse(answer.random_questions_count)
+        self.assertEqual(len(answer.predefined_question_ids), 17)
+
+    def test_02_concurrent_starts(self):
+        """ 200 visitors start the survey at once, none of them writes on the
+        sections shared with the others """
+        url = '%s/take_a_survey' % self.base_url()
+
+        def start(questions):
+            with requests.Session() as session:
+                response = session.get(url, params={'questions': questions, 'fixed_questions': 7}, timeout=60)
+                response.raise_for_status()
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            list(executor.map(start, [5 + index % 2 for index in range(200)]))
+
+        self.page.invalidate_recordset()
+        self.assertEqual(self.page.write_date, self.page_write_date)
+        self.assertEqual(self.page.random_questions_count, 10)
+        answers = self.env['survey.user_input'].search([('survey_id', '=', self.survey.id)])
+        self.assertEqual(len(answers), 200)
+        self.assertEqual(sorted(set(answers.mapped('random_questions_count'))), [5, 6])
+        for answer in answers:
+            self.assertEqual(len(answer.predefined_question_ids), answer.random_questions_count + 7)
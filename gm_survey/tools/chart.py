@@ -1,6 +1,11 @@
+import io
+import threading
+
 import matplotlib.pyplot as plt 
 import numpy as np
 
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.patches import Circle, RegularPolygon
 from matplotlib.path import Path
 from matplotlib.projections import register_projection
@@ -33,6 +38,7 @@ def radar_factory(num_vars, frame='polygon'):
             lines = super().plot(*args, **kwargs)
             for line in lines:
                 self._close_line(line)
+            return lines
 
         def _close_line(self, line):
             x, y = line.get_data()
@@ -64,4 +70,53 @@ def radar_factory(num_vars, frame='polygon'):
                 raise ValueError("Unknown frame")
 
     register_projection(RadarAxes)
-    return theta
\ No newline at end of file
+    return theta
+
+
+class RadarChart:
+    """Radar chart of a set of labels. The figure and its projection are built
+    once, only the values are drawn again for every render."""
+
+    def __init__(self, labels, color='#EEC3C3'):
+        self.theta = radar_factory(len(labels), frame='polygon')
+        # Figure outside of pyplot, so that it is not kept in its global state
+        self.figure = Figure(figsize=(4, 4))
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(projection='radar')
+        values = np.zeros(len(labels))
+        self.line, = self.ax.plot(self.theta, values, color=color)
+        self.polygon, = self.ax.fill(self.theta, values, color=color, alpha=0.9)
+        self.ax.set_varlabels(labels)
+        self.ax.set_theta_direction(-1)
+        self.ax.set_title("")
+        self.ax.yaxis.grid(True, linestyle="--", linewidth=0.8, color="gray")  # lingkaran
+        self.ax.xaxis.grid(True, linestyle=":", linewidth=0.8, color="gray")
+        self.lock = threading.Lock()
+
+    def render(self, values):
+        """Return the png of the chart of the values"""
+        values = np.asarray(values, dtype=float)
+        with self.lock:
+            self.line.set_data(np.append(self.theta, self.theta[0]), np.append(values, values[0]))
+            self.polygon.set_xy(np.column_stack([self.theta, values]))
+            self.ax.relim()
+            self.ax.autoscale_view()
+            self.ax.set_rmax(values.max() + 1)
+            buffer = io.BytesIO()
+            self.figure.savefig(buffer, format='png', bbox_inches='tight', transparent=True)
+        return buffer.getvalue()
+
+
+_radar_charts = {}
+_radar_charts_lock = threading.Lock()
+
+
+def render_radar_chart(labels, values):
+    """Return the png of the radar chart of the values, with the chart of the
+    labels of the worker"""
+    labels = tuple(labels)
+    with _radar_charts_lock:
+        chart = _radar_charts.get(labels)
+        if chart is None:
+            chart = _radar_charts[labels] = RadarChart(labels)
+    return chart.render(values)
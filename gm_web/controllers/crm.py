@@ -41,7 +41,7 @@ class CrmPersonalizedController(http.Controller):
         if not crm_leads:
             return request.redirect('/perfume-journey/create')
         formula = crm_leads.purchased_formula_ids.sorted(key=lambda x: x.id, reverse=True)
-        fragrance = {fragrance.name.lower(): fragrance.color for fragrance in request.env['fragrance.family'].sudo().search([], order='id asc')}
+        fragrance = request.env['fragrance.family'].sudo()._get_fragrance_colors()
         _logger.info("fragrance data: %s", fragrance)
         values = {
             'page_name': 'all_formulas',
@@ -66,7 +66,7 @@ class CrmPersonalizedController(http.Controller):
         formula = crm_leads.purchased_formula_ids.sudo().search([('id', '=', formula_id)], limit=1)
         if not formula:
             return request.redirect('/my/formula/all')
-        fragrance = {fragrance.name.lower(): fragrance.color for fragrance in request.env['fragrance.family'].sudo().search([], order='id asc')}
+        fragrance = request.env['fragrance.family'].sudo()._get_fragrance_colors()
         _logger.info("fragrance data: %s", fragrance)
         values = {
             'page_name': 'formula_detail',
@@ -86,7 +86,7 @@ class CrmPersonalizedController(http.Controller):
         if not crm_leads:
             return request.redirect('/perfume-journey/create')
         formula = crm_leads.purchase_history_ids.sorted(key=lambda x: x.id, reverse=True)
-        fragrance = {fragrance.name.lower(): fragrance.color for fragrance in request.env['fragrance.family'].sudo().search([], order='id asc')}
+        fragrance = request.env['fragrance.family'].sudo()._get_fragrance_colors()
         _logger.info("fragrance data: %s", fragrance)
         values = {
             'page_name': 'all_formulas',
@@ -108,7 +108,7 @@ class CrmPersonalizedController(http.Controller):
         formula = crm_leads.purchase_history_ids.sudo().search([('id', '=', formula_id)], limit=1)
         if not formula:
             return request.redirect('/my/formula/all')
-        fragrance = {fragrance.name.lower(): fragrance.color for fragrance in request.env['fragrance.family'].sudo().search([], order='id asc')}
+        fragrance = request.env['fragrance.family'].sudo()._get_fragrance_colors()
         _logger.info("fragrance data: %s", fragrance)
         values = {
             'page_name': 'formula_detail',
@@ -171,7 +171,7 @@ class CrmPersonalizedController(http.Controller):
         formula = crm_leads.purchased_formula_ids.sudo().search([('id', '=', formula_id)], limit=1)
         if not formula:
             return request.redirect('/my/formula/all')
-        flashcard = request.env['info.card'].sudo().search([('name','=','bottling_page')], limit=1)
+        flashcard = request.env['info.card'].sudo()._get_card('bottling_page')
         values = {
             'page_name': 'bottling_start',
             'user': request.env.user,
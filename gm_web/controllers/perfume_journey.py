@@ -99,8 +99,9 @@ class PerfumeJourneyController(http.Controller):
             return None, 'Please select a fragrance category'
         
         scent_code = str(scent_code).strip().upper()
-        fragrance_id = request.env['fragrance.family'].sudo().search([('name', 'ilike', category)], limit=1)
-        perfume = request.env['perfume.details'].sudo().search([('name_code', '=', scent_code), ('main_category_id', '=', fragrance_id.id)], limit=1)
+        fragrance_id = request.env['fragrance.family'].sudo()._get_fragrance_families(category)[:1]
+        oil = request.env['perfume.details'].sudo()._get_catalogue().get(scent_code)
+        perfume = request.env['perfume.details'].sudo().browse(oil['id'] if oil and oil['main_category_id'] == fragrance_id.id else None)
         
         if not perfume:
             return None, f'Invalid scent code: {scent_code}'
@@ -145,13 +146,14 @@ class PerfumeJourneyController(http.Controller):
         
         # Organize oils by fragrance family
         fragrance_oils = {'citrus': [], 'fresh': [], 'floral': [], 'woody': [], 'oriental': []}
+        oil_records = request.env['perfume.details'].sudo()._get_by_codes(
+            [oil_code for value in oil_added.values() for oil_code in value])
         
         for key, value in oil_added.items():
             if key in fragrance_oils:
                 for oil_code, drop_count in value.items():
-                    oil_record = request.env['perfume.details'].sudo().search([('name_code', '=', oil_code)], limit=1)
-                    if oil_record:
-                        fragrance_oils[key].append(oil_record.id)
+                    if oil_code in oil_records:
+                        fragrance_oils[key].append(oil_records[oil_code].id)
 
         formula_vals = {
             'lead_id': crm_lead.id,
@@ -172,21 +174,22 @@ class PerfumeJourneyController(http.Controller):
 
     def _create_team_building_drops(self, formula_record, crm_lead, oil_added):
         """Create team building drop records"""
-        for fragrance_type, oils in oil_added.items():
-            formula_drop = request.env['crm.lead.purchased.formula.drop'].sudo().create({
-                'formula_id': formula_record.id,
-                'lead_id': crm_lead.id,
-            })
-            
-            data_oil = []
+        oil_records = request.env['perfume.details'].sudo()._get_by_codes(
+            [oil_code for oils in oil_added.values() for oil_code in oils])
+        formula_drops = request.env['crm.lead.purchased.formula.drop'].sudo().create([{
+            'formula_id': formula_record.id,
+            'lead_id': crm_lead.id,
+        } for fragrance_type in oil_added])
+
+        data_oil = []
+        for formula_drop, oils in zip(formula_drops, oil_added.values()):
             for oil_code, drop_count in oils.items():
-                oil_id = request.env['perfume.details'].sudo().search([('name_code', '=', oil_code)], limit=1)
                 data_oil.append({
                     'drop_count': drop_count,
-                    'oil_id': oil_id.id,
+                    'oil_id': oil_records[oil_code].id if oil_code in oil_records else False,
                     'purchase_formula_id': formula_drop.id,
                 })
-            request.env['crm.lead.purchased.formula.drop.line'].sudo().create(data_oil)
+        request.env['crm.lead.purchased.formula.drop.line'].sudo().create(data_oil)
 
     def _clean_session(self):
         """Clean up session data"""
@@ -277,7 +280,7 @@ class PerfumeJourneyController(http.Controller):
         self._set_language_context()
         crm_lead_id = request.session.get('crm_lead_id') or self._get_crm_lead().id
         crm_lead = request.env['crm.lead'].sudo().browse(crm_lead_id)
-        flashcard_id = request.env['info.card'].sudo().search([('name', '=', 'intro_app')], limit=1)
+        flashcard_id = request.env['info.card'].sudo()._get_card('intro_app')
         values = {
             'avatar': self._get_avatar(crm_lead),
             'location': request.session.get('location', ''),
@@ -287,7 +290,7 @@ class PerfumeJourneyController(http.Controller):
 
     def _create_intro_page_values(self, card_name, page_name=None):
         """Create standardized values for introduction pages"""
-        flashcard = request.env['info.card'].sudo().search([('name', '=', card_name)], limit=1)
+        flashcard = request.env['info.card'].sudo()._get_card(card_name)
         value = {
             'flashcard': flashcard.with_context(bin_size=False),
             'avatar': self._get_avatar(self._get_crm_lead()),
@@ -493,10 +496,10 @@ class PerfumeJourneyController(http.Controller):
         if not kwargs.get('code') or not kwargs.get('category'):
             return request.render('http_routing.404', {})
             
-        perfume_data = request.env['perfume.details'].sudo().search([('name_code', '=', kwargs.get('code'))], limit=1)
+        perfume_data = request.env['perfume.details'].sudo()._get_by_code(kwargs.get('code'))
         category = kwargs.get('category')
         crm_lead = self._get_crm_lead_by_uuid(request.session.get('uuid', ''))
-        fragrance_families = request.env['fragrance.family'].sudo().search([('name', 'ilike', category)], order='name asc')
+        fragrance_families = request.env['fragrance.family'].sudo()._get_fragrance_families(category)
         
         oil_added_count, oil_max, oil_max_all, oil_added_all = self._get_oil_counts(category, request.session.get('location'))
         oil_added_fragrance = request.session.get('oil_added', {}).get(category.lower(), {})
@@ -527,7 +530,7 @@ class PerfumeJourneyController(http.Controller):
             return request.render('http_routing.404', {})
             
         crm_lead = self._get_crm_lead_by_uuid(request.session.get('uuid', ''))
-        fragrance_families = request.env['fragrance.family'].sudo().search([('name', 'ilike', category)], order='name asc')
+        fragrance_families = request.env['fragrance.family'].sudo()._get_fragrance_families(category)
         
         oil_added_count, oil_max, oil_max_all, oil_added_all = self._get_oil_counts(category, request.session.get('location'))
         oil_added_fragrance = request.session.get('oil_added', {}).get(category.lower(), {})
@@ -581,7 +584,7 @@ class PerfumeJourneyController(http.Controller):
                 pass
         request.session['oil_remain'] = value
         
-        oil_data = request.env['perfume.details'].sudo().search([('name_code', '=', kwargs.get('oil_code'))], limit=1)
+        oil_data = request.env['perfume.details'].sudo()._get_by_code(kwargs.get('oil_code'))
         
         values = {
             'fragrance_name': kwargs.get('category', 'Citrus'),
@@ -706,7 +709,7 @@ class PerfumeJourneyController(http.Controller):
         if oil_added_count == oil_max:
             return request.redirect(f'/perfume-journey/oil-maxed?category={fragranceName}')
         if location == "scentzania":
-            flashcard_id = request.env['info.card'].sudo().search([('name', '=', 'oil_added')], limit=1)
+            flashcard_id = request.env['info.card'].sudo()._get_card('oil_added')
             values['flashcard_id'] = flashcard_id.with_context(bin_size=False)
             
         return request.render('gm_web.oil_drop_added_template', values)
@@ -946,9 +949,11 @@ class PerfumeJourneyController(http.Controller):
             'oriental': 'sample_oriental',
         }
         update_data = {}
+        oil_records = request.env['perfume.details'].sudo()._get_by_codes(
+            [oil_code for fragrance_type in sample_fields for oil_code in oil_added.get(fragrance_type, {})])
         for fragrance_type, field in sample_fields.items():
             oil_codes = oil_added.get(fragrance_type, {}).keys()
-            oils = request.env['perfume.details'].sudo().search([('name_code', 'in', list(oil_codes))])
+            oils = request.env['perfume.details'].sudo().concat(*(oil_records[code] for code in oil_codes if code in oil_records))
             update_data[field] = [(6, 0, oils.ids)]
             log.info(f"Updating {field} with oils: {oils.read()}")
         
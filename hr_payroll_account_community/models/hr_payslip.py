@@ -46,14 +46,15 @@ class HrPayslip(models.Model):
                               help="Accounting entry associated with "
                                    "this record")
 
-    @api.model
-    def create(self, vals):
-        """Create a new payroll slip.This method is called when creating a
-            new payroll slip.It checks if 'journal_id' is present in the
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Create new payroll slips.This method is called when creating
+            payroll slips.It checks if 'journal_id' is present in the
             context and, if so, sets the 'journal_id' field in the values."""
         if 'journal_id' in self.env.context:
-            vals['journal_id'] = self.env.context.get('journal_id')
-        return super(HrPayslip, self).create(vals)
+            for vals in vals_list:
+                vals['journal_id'] = self.env.context.get('journal_id')
+        return super(HrPayslip, self).create(vals_list)
 
     @api.onchange('contract_id')
     def onchange_contract_id(self):
@@ -74,6 +75,11 @@ class HrPayslip(models.Model):
         first uncanceled, then all moves are unlinked. Finally, the method
         calls the parent class's action_payslip_cancel method."""
         moves = self.mapped('move_id')
+        if self.search_count([('move_id', 'in', moves.ids),
+                              ('id', 'not in', self.ids)], limit=1):
+            raise UserError(
+                _("The accounting entry of a consolidated payslip batch is "
+                  "shared by all its payslips, cancel them together."))
         moves.filtered(lambda x: x.state == 'posted').button_cancel()
         moves.unlink()
         return super(HrPayslip, self).action_payslip_cancel()
@@ -81,102 +87,171 @@ class HrPayslip(models.Model):
     def action_payslip_done(self):
         """Finalize and post the payroll slip, creating accounting entries.This
          method is called when marking a payroll slip as done. It calculates
-         the accounting entries based on the salary details, creates a move
-         (journal entry),and posts it. If necessary, adjustment entries are
-         added to balance the debit and credit amounts."""
+         the accounting entries based on the salary details, creates the
+         moves (journal entries) of all the payslips at once and posts them
+         together. If necessary, adjustment entries are added to balance the
+         debit and credit amounts. The payslips of a batch with a
+         consolidated accounting entry share one move per journal and
+         date."""
         res = super(HrPayslip, self).action_payslip_done()
-        for slip in self:
-            line_ids = []
-            debit_sum = 0.0
-            credit_sum = 0.0
+        move_vals = []
+        move_slips = []
+        for slips in self.grouped(
+                lambda slip: slip._get_account_move_key()).values():
+            move_vals.append(slips._prepare_account_move_vals())
+            move_slips.append(slips)
+        moves = self.env['account.move'].create(move_vals)
+        for move, slips in zip(moves, move_slips):
+            for date, date_slips in slips.grouped(
+                    lambda slip: slip.date or slip.date_to).items():
+                date_slips.write({'move_id': move.id, 'date': date})
+        moves.action_post()
+        return res
+
+    def _get_account_move_key(self):
+        """Return the key grouping the payslips in one accounting entry: the
+        payslip itself, or its journal, date and batch when the batch has a
+        consolidated accounting entry."""
+        self.ensure_one()
+        if self.payslip_run_id.move_consolidation:
+            return (self.journal_id, self.date or self.date_to,
+                    self.payslip_run_id)
+        return self
+
+    def _prepare_account_move_vals(self):
+        """Return the values of the accounting entry of the payslips, which
+        share their journal and date. With several payslips, the lines are
+        aggregated per account and partner."""
+        slip = self[0]
+        journal = slip.journal_id
+        date = slip.date or slip.date_to
+        currency = slip.company_id.currency_id
+        line_vals = []
+        for payslip in self:
+            line_vals += payslip._prepare_account_move_line_vals()
+        if len(self) > 1:
+            line_vals = self._aggregate_account_move_line_vals(line_vals)
+            name = _('Payslips of %s') % slip.payslip_run_id.name
+            ref = slip.payslip_run_id.name
+        else:
             name = _('Payslip of %s') % slip.employee_id.name
-            move_dict = {
-                'narration': name,
-                'ref': slip.number,
-                'journal_id': slip.journal_id.id,
-                'date': slip.date or slip.date_to,
-            }
-            for line in slip.details_by_salary_rule_category_ids:
-                amount = slip.company_id.currency_id.round(
-                    slip.credit_note and -line.total or line.total)
-                if slip.company_id.currency_id.is_zero(amount):
-                    continue
-                debit_account_id = line.salary_rule_id.account_debit_id.id
-                credit_account_id = line.salary_rule_id.account_credit_id.id
-                if debit_account_id:
-                    debit_line = (0, 0, {
-                        'name': line.name,
-                        'partner_id': line._get_partner_id(
-                            credit_account=False),
-                        'account_id': debit_account_id,
-                        'journal_id': slip.journal_id.id,
-                        'date': slip.date or slip.date_to,
-                        'debit': amount > 0.0 and amount or 0.0,
-                        'credit': amount < 0.0 and -amount or 0.0,
-                        'tax_line_id': line.salary_rule_id.account_tax_id.id,
-                    })
-                    line_ids.append(debit_line)
-                    debit_sum += debit_line[2]['debit'] - debit_line[2][
-                        'credit']
-                if credit_account_id:
-                    credit_line = (0, 0, {
-                        'name': line.name,
-                        'partner_id': line._get_partner_id(credit_account=True),
-                        'account_id': credit_account_id,
-                        'journal_id': slip.journal_id.id,
-                        'date': slip.date or slip.date_to,
-                        'debit': amount < 0.0 and -amount or 0.0,
-                        'credit': amount > 0.0 and amount or 0.0,
-                        'tax_line_id': line.salary_rule_id.account_tax_id.id,
-                    })
-                    line_ids.append(credit_line)
-                    credit_sum += credit_line[2]['credit'] - credit_line[2][
-                        'debit']
-            if slip.company_id.currency_id.compare_amounts(
-                    credit_sum, debit_sum) == -1:
-                acc_id = slip.journal_id.default_account_id.id
-                if not acc_id:
-                    raise UserError(
-                        _('The Expense Journal "%s" has not properly '
-                          'configured the Credit Account!') % (
-                            slip.journal_id.name))
-                adjust_credit = (0, 0, {
-                    'name': _('Adjustment Entry'),
-                    'partner_id': False,
-                    'account_id': acc_id,
-                    'journal_id': slip.journal_id.id,
-                    'date': slip.date or slip.date_to,
-                    'debit': 0.0,
-                    'credit':  slip.company_id.currency_id.round(
-                        debit_sum - credit_sum),
+            ref = slip.number
+        if not line_vals:
+            raise UserError(
+                _("As you installed the payroll accounting module you have"
+                  " to choose Debit and Credit account for at least one "
+                  "salary rule in the chosen Salary Structure."))
+        debit_sum = 0.0
+        credit_sum = 0.0
+        for vals in line_vals:
+            vals.update({
+                'journal_id': journal.id,
+                'date': date,
+            })
+            if vals.pop('debit_side'):
+                debit_sum += vals['debit'] - vals['credit']
+            else:
+                credit_sum += vals['credit'] - vals['debit']
+        if currency.compare_amounts(credit_sum, debit_sum) == -1:
+            acc_id = journal.default_account_id.id
+            if not acc_id:
+                raise UserError(
+                    _('The Expense Journal "%s" has not properly '
+                      'configured the Credit Account!') % (journal.name))
+            line_vals.append({
+                'name': _('Adjustment Entry'),
+                'partner_id': False,
+                'account_id': acc_id,
+                'journal_id': journal.id,
+                'date': date,
+                'debit': 0.0,
+                'credit': currency.round(debit_sum - credit_sum),
+            })
+        elif currency.compare_amounts(debit_sum, credit_sum) == -1:
+            acc_id = journal.default_account_id.id
+            if not acc_id:
+                raise UserError(
+                    _('The Expense Journal "%s" has not properly '
+                      'configured the Debit Account!') % (journal.name))
+            line_vals.append({
+                'name': _('Adjustment Entry'),
+                'partner_id': False,
+                'account_id': acc_id,
+                'journal_id': journal.id,
+                'date': date,
+                'debit': currency.round(credit_sum - debit_sum),
+                'credit': 0.0,
+            })
+        return {
+            'narration': name,
+            'ref': ref,
+            'journal_id': journal.id,
+            'date': date,
+            'line_ids': [(0, 0, vals) for vals in line_vals],
+        }
+
+    def _prepare_account_move_line_vals(self):
+        """Return the values of the debit and credit move lines of the
+        payslip, with a 'debit_side' key telling on which side of the
+        salary rule they are."""
+        self.ensure_one()
+        currency = self.company_id.currency_id
+        line_vals = []
+        for line in self.details_by_salary_rule_category_ids:
+            amount = currency.round(
+                self.credit_note and -line.total or line.total)
+            if currency.is_zero(amount):
+                continue
+            rule = line.salary_rule_id
+            if rule.account_debit_id:
+                line_vals.append({
+                    'name': line.name,
+                    'partner_id': line._get_partner_id(credit_account=False),
+                    'account_id': rule.account_debit_id.id,
+                    'debit': amount > 0.0 and amount or 0.0,
+                    'credit': amount < 0.0 and -amount or 0.0,
+                    'tax_line_id': rule.account_tax_id.id,
+                    'debit_side': True,
                 })
-                line_ids.append(adjust_credit)
-            elif slip.company_id.currency_id.compare_amounts(
-                    debit_sum, credit_sum) == -1:
-                acc_id = slip.journal_id.default_account_id.id
-                if not acc_id:
-                    raise UserError(
-                        _('The Expense Journal "%s" has not properly '
-                          'configured the Debit Account!') % (
-                            slip.journal_id.name))
-                adjust_debit = (0, 0, {
-                    'name': _('Adjustment Entry'),
-                    'partner_id': False,
-                    'account_id': acc_id,
-                    'journal_id': slip.journal_id.id,
-                    'date': slip.date or slip.date_to,
-                    'debit':  slip.company_id.currency_id.round(
-                        credit_sum - debit_sum),
-                    'credit': 0.0,
+            if rule.account_credit_id:
+                line_vals.append({
+                    'name': line.name,
+                    'partner_id': line._get_partner_id(credit_account=True),
+                    'account_id': rule.account_credit_id.id,
+                    'debit': amount < 0.0 and -amount or 0.0,
+                    'credit': amount > 0.0 and amount or 0.0,
+                    'tax_line_id': rule.account_tax_id.id,
+                    'debit_side': False,
                 })
-                line_ids.append(adjust_debit)
-            move_dict['line_ids'] = line_ids
-            move = self.env['account.move'].create(move_dict)
-            slip.write({'move_id': move.id, 'date': slip.date or slip.date_to})
-            if not move.line_ids:
-                raise UserError(
-                    _("As you installed the payroll accounting module you have"
-                      " to choose Debit and Credit account for at least one "
-                      "salary rule in the chosen Salary Structure."))
-            move.action_post()
+        return line_vals
+
+    def _aggregate_account_move_line_vals(self, line_vals):
+        """Return the move lines values summed per side, account, partner
+        and tax. The aggregated lines keep the name of their lines when
+        they all have the same, else they take the name of the account."""
+        currency = self[0].company_id.currency_id
+        aggregated = {}
+        for vals in line_vals:
+            key = (vals['debit_side'], vals['account_id'],
+                   vals['partner_id'], vals['tax_line_id'])
+            if key not in aggregated:
+                aggregated[key] = dict(vals, debit=0.0, credit=0.0)
+            elif aggregated[key]['name'] != vals['name']:
+                aggregated[key]['name'] = False
+            aggregated[key]['debit'] += vals['debit']
+            aggregated[key]['credit'] += vals['credit']
+        accounts = self.env['account.account'].browse(
+            [vals['account_id'] for vals in aggregated.values()])
+        names = dict(zip(accounts.ids, accounts.mapped('name')))
+        res = []
+        for vals in aggregated.values():
+            balance = currency.round(vals['debit'] - vals['credit'])
+            if currency.is_zero(balance):
+                continue
+            vals.update({
+                'name': vals['name'] or names[vals['account_id']],
+                'debit': balance > 0.0 and balance or 0.0,
+                'credit': balance < 0.0 and -balance or 0.0,
+            })
+            res.append(vals)
         return res
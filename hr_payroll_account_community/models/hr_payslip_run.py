@@ -38,3 +38,15 @@ class HrPayslipRun(models.Model):
                                      'account.journal'].search(
                                      [('type', '=', 'general')],
                                      limit=1))
+    move_consolidation = fields.Boolean(
+        string='Consolidated Accounting Entry',
+        help="Post a single accounting entry for the payslips of the batch "
+             "sharing the same journal and date, with their lines summed "
+             "per account and partner, instead of one entry per payslip")
+
+    def _generate_payslips(self, employees):
+        """Create the payslips of the batch in its journal, also when they
+        are generated in background jobs, which do not get the context of
+        the wizard."""
+        return super(HrPayslipRun, self.with_context(
+            journal_id=self.journal_id.id))._generate_payslips(employees)
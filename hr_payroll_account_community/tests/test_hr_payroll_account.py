@@ -23,6 +23,7 @@ import time
 from datetime import datetime, timedelta
 from dateutil import relativedelta
 from odoo import fields, tools
+from odoo.exceptions import UserError
 from odoo.modules.module import get_module_resource
 from odoo.tests import common
 
@@ -146,3 +147,44 @@ class TestHrPayrollAccount(common.TransactionCase):
 
         # I verify that the payslip is in done state.
         self.assertEqual(self.hr_payslip.state, 'done', 'State not changed!')
+
+    def test_01_hr_payslip_run_consolidated(self):
+        """ checking the consolidated accounting entry of a batch. """
+        date_from = time.strftime('%Y-%m-01')
+        date_to = str(datetime.now() + relativedelta.relativedelta(
+            months=+1, day=1, days=-1))[:10]
+        payslip_run = self.env['hr.payslip.run'].create({
+            'name': 'Payslip Batch',
+            'date_start': date_from,
+            'date_end': date_to,
+            'journal_id': self.ref(
+                'hr_payroll_account_community.expenses_journal'),
+            'move_consolidation': True,
+        })
+        payslips = self.env['hr.payslip'].create([{
+            'employee_id': self.hr_employee_john.id,
+            'contract_id': self.hr_contract_john.id,
+            'struct_id': self.hr_structure_softwaredeveloper.id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'payslip_run_id': payslip_run.id,
+            'journal_id': self.ref(
+                'hr_payroll_account_community.expenses_journal'),
+        } for i in range(2)])
+        payslips.action_compute_sheet()
+
+        # Confirm the payslips together
+        payslips.action_payslip_done()
+
+        # I verify that the payslips share one balanced accounting entry.
+        move = payslips.move_id
+        self.assertEqual(len(move), 1, 'Accounting Entry not shared!')
+        self.assertEqual(move.state, 'posted', 'Accounting Entry not posted!')
+        self.assertAlmostEqual(sum(move.line_ids.mapped('debit')),
+                               sum(move.line_ids.mapped('credit')))
+
+        # I verify that the payslips of the entry are cancelled together.
+        with self.assertRaises(UserError):
+            payslips[0].action_payslip_cancel()
+        payslips.action_payslip_cancel()
+        self.assertFalse(move.exists(), 'Accounting Entry not removed!')
@@ -36,7 +36,7 @@
     'company': 'Cybrosys Techno Solutions',
     'maintainer': 'Cybrosys Techno Solutions',
     'website': 'https://www.openhrms.com',
-    'depends': ['hr_contract', 'hr_holidays'],
+    'depends': ['hr_contract', 'hr_holidays', 'queue_job'],
     'data': [
         'security/hr_payroll_community_security.xml',
         'security/ir.model.access.csv',
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+import os
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import content_disposition, request
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv;charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+            '.sheet',
+}
+
+
+class HrPayrollCommunity(http.Controller):
+    """Controller for exporting the payslip details of a batch"""
+
+    @http.route('/hr_payroll_community/payslip_run/<int:payslip_run_id>'
+                '/details.<string:export_format>', type='http', auth='user')
+    def export_payslip_run_details(self, payslip_run_id, export_format):
+        """Function for downloading the details by salary rule category of
+        the payslips of a batch. The export is written in a temporary file
+        which is streamed to the client, so that the memory used does not
+        grow with the size of the batch"""
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return request.not_found()
+        payslip_run = request.env['hr.payslip.run'].browse(
+            payslip_run_id).exists()
+        if not payslip_run:
+            return request.not_found()
+        payslip_run.check_access('read')
+        fileobj = tempfile.TemporaryFile()
+        try:
+            payslip_run._write_export_details(fileobj, export_format)
+        except Exception:
+            fileobj.close()
+            raise
+        size = fileobj.tell()
+        fileobj.seek(0, os.SEEK_SET)
+        filename = '%s.%s' % (payslip_run.name, export_format)
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, fileobj),
+            headers=[
+                ('Content-Type', EXPORT_CONTENT_TYPES[export_format]),
+                ('Content-Length', size),
+                ('Content-Disposition', content_disposition(filename)),
+            ])
+        response.direct_passthrough = True
+        return response
@@ -46,3 +46,9 @@ class HrEmployee(models.Model):
             payslip_data)
         for employee in self:
             employee.payslip_count = result.get(employee.id, 0)
+
+    def _generate_batch_payslips(self, payslip_run):
+        """Function for generating the payslips of the employees in a
+        payslip batch, used by the background jobs. The employees which
+        already have a payslip in the batch are skipped"""
+        return payslip_run._generate_payslips(self)
@@ -20,10 +20,13 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
-from datetime import date, datetime, time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
 from dateutil.relativedelta import relativedelta
 from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.safe_eval import check_values
 from pytz import timezone
 import babel
 
@@ -31,6 +34,126 @@ import babel
 ROUNDING_FACTOR = 16
 
 
+class PayslipHistory(object):
+    """Sums of the done payslips of employees, used by the sum() helpers of
+    the salary rules. The payslips, inputs and worked days of all the
+    employees computed together are loaded with one query each, the first
+    time a rule needs them, and the sums are computed from prefix sums
+    indexed by date. A sum starting before the loaded dates only loads the
+    missing dates, a new employee only loads its own payslips."""
+
+    _queries = {
+        'inputs': """
+            SELECT hp.employee_id, pi.code, hp.date_from, hp.date_to,
+                   sum(pi.amount)
+            FROM hr_payslip as hp, hr_payslip_input as pi
+            WHERE hp.employee_id IN %s AND hp.state = 'done'
+            AND hp.date_from >= %s AND hp.date_from < %s
+            AND hp.id = pi.payslip_id
+            GROUP BY hp.employee_id, pi.code, hp.date_from, hp.date_to""",
+        'worked_days': """
+            SELECT hp.employee_id, pi.code, hp.date_from, hp.date_to,
+                   sum(number_of_days), sum(number_of_hours)
+            FROM hr_payslip as hp, hr_payslip_worked_days as pi
+            WHERE hp.employee_id IN %s AND hp.state = 'done'
+            AND hp.date_from >= %s AND hp.date_from < %s
+            AND hp.id = pi.payslip_id
+            GROUP BY hp.employee_id, pi.code, hp.date_from, hp.date_to""",
+        'lines': """
+            SELECT hp.employee_id, pl.code, hp.date_from, hp.date_to,
+                   sum(case when hp.credit_note = False then (pl.total)
+                       else (-pl.total) end)
+            FROM hr_payslip as hp, hr_payslip_line as pl
+            WHERE hp.employee_id IN %s AND hp.state = 'done'
+            AND hp.date_from >= %s AND hp.date_from < %s
+            AND hp.id = pl.slip_id
+            GROUP BY hp.employee_id, pl.code, hp.date_from, hp.date_to""",
+    }
+
+    def __init__(self, env, employee_ids):
+        """Function for getting env and the ids of the employees"""
+        self.env = env
+        self.employee_ids = set(employee_ids)
+        # oldest date_from loaded, by table
+        self.loaded_from = {}
+        # (table, employee_id, code): rows (date_from, date_to, values)
+        self.rows = defaultdict(list)
+        # (table, employee_id, code): index of the rows, see _build_index
+        self.indexes = {}
+
+    def sum(self, table, employee_id, code, from_date, to_date):
+        """
+        @return: returns the tuple of the sums of the values of the done
+        payslips of the employee from from_date to to_date for the given
+        code, or None if there is no such payslip
+        """
+        from_date = fields.Date.to_date(from_date)
+        to_date = fields.Date.to_date(to_date)
+        if employee_id not in self.employee_ids:
+            self.employee_ids.add(employee_id)
+            for loaded_table, loaded_from in self.loaded_from.items():
+                self._load(loaded_table, [employee_id], loaded_from)
+        if table not in self.loaded_from:
+            self._load(table, self.employee_ids, from_date)
+            self.loaded_from[table] = from_date
+        elif from_date < self.loaded_from[table]:
+            self._load(table, self.employee_ids, from_date,
+                       self.loaded_from[table])
+            self.loaded_from[table] = from_date
+        key = (table, employee_id, code)
+        if key not in self.rows:
+            return None
+        if key not in self.indexes:
+            self.indexes[key] = self._build_index(self.rows[key])
+        index = self.indexes[key]
+        dates_from, prefix_sums, dates_to, by_date_to = index
+        start = bisect_left(dates_from, from_date)
+        end = bisect_right(dates_from, to_date)
+        if start >= end:
+            return None
+        result = [total - prefix_sums[start][position] for position, total
+                  in enumerate(prefix_sums[end])]
+        # payslips starting in the period but ending after it
+        for date_to, date_from, values in by_date_to[
+                bisect_right(dates_to, to_date):]:
+            if from_date <= date_from <= to_date:
+                result = [total - value for total, value in
+                          zip(result, values)]
+        return tuple(result)
+
+    def _load(self, table, employee_ids, from_date, to_date=date.max):
+        """Function for loading the done payslips of the employees starting
+        from from_date and before to_date, and merging them in the rows"""
+        self.env.cr.execute(self._queries[table],
+                            (tuple(employee_ids), from_date, to_date))
+        for employee_id, code, date_from, date_to, *values in \
+                self.env.cr.fetchall():
+            key = (table, employee_id, code)
+            self.rows[key].append(
+                (date_from, date_to, tuple(value or 0.0 for value in values)))
+            # the index is built again with the new rows
+            self.indexes.pop(key, None)
+
+    @staticmethod
+    def _build_index(rows):
+        """
+        @return: returns the dates_from of the rows in ascending order with
+        the prefix sums of their values, and the rows by ascending date_to
+        """
+        rows = sorted(rows)
+        dates_from = [date_from for date_from, date_to, values in rows]
+        prefix_sums = [(0.0,) * len(rows[0][2])]
+        for date_from, date_to, values in rows:
+            prefix_sums.append(tuple(
+                total + value for total, value in
+                zip(prefix_sums[-1], values)))
+        by_date_to = sorted(
+            (date_to, date_from, values)
+            for date_from, date_to, values in rows)
+        dates_to = [date_to for date_to, date_from, values in by_date_to]
+        return dates_from, prefix_sums, dates_to, by_date_to
+
+
 class HrPayslip(models.Model):
     """Create new model for getting total Payroll Sheet for an Employee"""
     _name = 'hr.payslip'
@@ -111,6 +234,11 @@ class HrPayslip(models.Model):
     payslip_count = fields.Integer(compute='_compute_payslip_count',
                                    string="Payslip Computation Details",
                                    help="Set Payslip Count")
+    compute_snapshot = fields.Json(string='Computation Snapshot',
+                                   copy=False, readonly=True,
+                                   help="What the payslip lines were computed "
+                                        "from, to compute again only the "
+                                        "rules depending on what changed")
 
     def _compute_details_by_salary_rule_category_ids(self):
         """Compute function for Salary Rule Category for getting
@@ -189,6 +317,14 @@ class HrPayslip(models.Model):
         @return: returns the ids of all the contracts for the given employee
         that need to be considered for the given dates
         """
+        clause_final = [('employee_id', '=', employee.id)] + \
+            self._get_contract_domain(date_from, date_to)
+        return self.env['hr.contract'].search(clause_final).ids
+
+    @api.model
+    def _get_contract_domain(self, date_from, date_to):
+        """Function for getting the domain of the running contracts
+        between the given dates"""
         # a contract is valid if it ends between the given dates
         clause_1 = ['&', ('date_end', '<=', date_to),
                     ('date_end', '>=', date_from)]
@@ -199,29 +335,159 @@ class HrPayslip(models.Model):
         # date_end (or never finish)
         clause_3 = ['&', ('date_start', '<=', date_from), '|',
                     ('date_end', '=', False), ('date_end', '>=', date_to)]
-        clause_final = [('employee_id', '=', employee.id),
-                        ('state', '=', 'open'), '|',
-                        '|'] + clause_1 + clause_2 + clause_3
-        return self.env['hr.contract'].search(clause_final).ids
+        return [('state', '=', 'open'), '|',
+                '|'] + clause_1 + clause_2 + clause_3
+
+    @api.model
+    def _get_contracts_by_employee(self, employees, date_from, date_to):
+        """
+        Same as get_contract for several employees, with a single search
+        @return: returns a dict with the ids of the contracts of each
+        employee, in the order of get_contract
+        """
+        contract_ids = {employee.id: [] for employee in employees}
+        if not employees:
+            return contract_ids
+        contracts = self.env['hr.contract'].search(
+            [('employee_id', 'in', employees.ids)] +
+            self._get_contract_domain(date_from, date_to))
+        for contract in contracts:
+            contract_ids[contract.employee_id.id].append(contract.id)
+        return contract_ids
 
     def action_compute_sheet(self):
         """Function for compute Payslip sheet"""
+        # set the list of contract for which the rules have to be applied
+        # if we don't give the contract, then the rules to apply should be
+        # for all current contracts of the employee
+        contract_ids_by_payslip = {}
+        for (date_from, date_to), payslips in self.grouped(
+                lambda payslip: (payslip.date_from, payslip.date_to)).items():
+            contract_ids_by_employee = self._get_contracts_by_employee(
+                payslips.filtered(
+                    lambda payslip: not payslip.contract_id).employee_id,
+                date_from, date_to)
+            for payslip in payslips:
+                contract_ids_by_payslip[payslip.id] = \
+                    payslip.contract_id.ids or \
+                    contract_ids_by_employee[payslip.employee_id.id]
+        # the structures, rules and records read by the rules are
+        # shared by all the payslips of the batch
+        batch_cache = {
+            'payslips': self,
+            'contracts': self.env['hr.contract'].browse(
+                {contract_id for contract_ids in
+                 contract_ids_by_payslip.values()
+                 for contract_id in contract_ids}),
+        }
+        line_values = []
+        lines_to_unlink = self.env['hr.payslip.line']
         for payslip in self:
-            number = payslip.number or self.env['ir.sequence'].next_by_code(
-                'salary.slip')
-            # delete old payslip lines
-            payslip.line_ids.unlink()
-            # set the list of contract for which the rules have to be applied
-            # if we don't give the contract, then the rules to apply should be
-            # for all current contracts of the employee
-            contract_ids = payslip.contract_id.ids or \
-                           self.get_contract(payslip.employee_id,
-                                             payslip.date_from, payslip.date_to)
-            lines = [(0, 0, line) for line in
-                     self._get_payslip_lines(contract_ids, payslip.id)]
-            payslip.write({'line_ids': lines, 'number': number})
+            if not payslip.number:
+                payslip.number = self.env['ir.sequence'].next_by_code(
+                    'salary.slip')
+            # the lines are updated in place, only the rules depending on
+            # what changed since the last computation are computed again
+            new_line_values, old_lines = payslip._update_payslip_lines(
+                self._get_payslip_lines(contract_ids_by_payslip[payslip.id],
+                                        payslip.id, batch_cache=batch_cache,
+                                        incremental=True))
+            line_values += new_line_values
+            lines_to_unlink |= old_lines
+            payslip.compute_snapshot = batch_cache['snapshots'][payslip.id]
+        lines_to_unlink.unlink()
+        self.env['hr.payslip.line'].create(line_values)
         return True
 
+    def _update_payslip_lines(self, line_values):
+        """
+        @param line_values: the values of the lines computed for the payslip
+        @return: returns the values of the lines to create and the lines to
+        delete, once the existing lines of the same rules code and contract
+        are updated with the values which changed
+        """
+        self.ensure_one()
+        lines_by_key = {}
+        old_lines = self.env['hr.payslip.line']
+        for line in self.line_ids:
+            key = (line.code, line.contract_id.id)
+            if key in lines_by_key:
+                old_lines |= line
+            else:
+                lines_by_key[key] = line
+        new_line_values = []
+        for values in line_values:
+            line = lines_by_key.pop((values['code'], values['contract_id']),
+                                    None)
+            if not line:
+                new_line_values.append(dict(values, slip_id=self.id))
+                continue
+            changed_values = {}
+            for name, value in values.items():
+                # compare the values as stored, the floats being rounded
+                field = line._fields[name]
+                if field.convert_to_record(
+                        field.convert_to_cache(value, line), line) != \
+                        line[name]:
+                    changed_values[name] = value
+            if changed_values:
+                line.write(changed_values)
+        for line in lines_by_key.values():
+            old_lines |= line
+        return new_line_values, old_lines
+
+    def _get_compute_snapshot(self, contracts, rules):
+        """
+        @param contracts: the contracts of the payslip, rules: the rules
+        applied to them
+        @return: returns what the lines of the payslip are computed from, as
+        json: the records followed by their date of last update, and the
+        inputs and worked days by code
+        """
+        self.ensure_one()
+        categories = rules.category_id
+        while categories.parent_id - categories:
+            categories |= categories.parent_id
+        inputs = {}
+        for input_line in self.input_line_ids:
+            inputs[input_line.code] = input_line.amount
+        worked_days = {}
+        for worked_days_line in self.worked_days_line_ids:
+            worked_days[worked_days_line.code] = [
+                worked_days_line.number_of_days,
+                worked_days_line.number_of_hours]
+        return {
+            'records': [
+                contracts.ids, self.struct_id.id, self.employee_id.id,
+                str(self.date_from), str(self.date_to), bool(self.credit_note),
+                [str(date) for date in contracts.mapped('write_date')],
+                str(self.employee_id.write_date), rules.ids,
+                str(max(rules.mapped('write_date') +
+                        categories.mapped('write_date'), default='')),
+            ],
+            'inputs': inputs,
+            'worked_days': worked_days,
+        }
+
+    def _get_compute_changes(self, snapshot):
+        """
+        @param snapshot: the snapshot of the payslip to compute
+        @return: returns the set of the ('inputs', code) and ('worked_days',
+        code) which changed since the last computation of the payslip, or
+        None when it has to be computed entirely
+        """
+        self.ensure_one()
+        previous = self.compute_snapshot
+        if not previous or 'lines' not in previous or \
+                previous['records'] != snapshot['records']:
+            return None
+        changes = set()
+        for name in ('inputs', 'worked_days'):
+            for code in set(previous[name]) | set(snapshot[name]):
+                if previous[name].get(code) != snapshot[name].get(code):
+                    changes.add((name, code))
+        return changes
+
     @api.model
     def get_worked_day_lines(self, contracts, date_from, date_to):
         """
@@ -229,85 +495,119 @@ class HrPayslip(models.Model):
         @return: returns a list of dict containing the input that should be
         applied for the given contract between date_from and date_to
         """
-        res = []
+        lines_by_contract = self._get_worked_day_lines_batch(
+            contracts, date_from, date_to)
+        return [line for contract in contracts
+                for line in lines_by_contract.get(contract.id, [])]
+
+    @api.model
+    def _get_worked_day_lines_batch(self, contracts, date_from, date_to):
+        """
+        @param contracts: Browse record of contracts, date_from, date_to
+        @return: returns a dict {contract.id: list of dict} of the worked
+        days of get_worked_day_lines, computed at once for the contracts
+        sharing the same working schedule
+        """
+        res = {}
+        day_from = datetime.combine(fields.Date.from_string(date_from),
+                                    time.min)
+        day_to = datetime.combine(fields.Date.from_string(date_to),
+                                  time.max)
         # fill only if the contract as a working schedule linked
-        for contract in contracts.filtered(
-                lambda contract: contract.resource_calendar_id):
-            day_from = datetime.combine(fields.Date.from_string(date_from),
-                                        time.min)
-            day_to = datetime.combine(fields.Date.from_string(date_to),
-                                      time.max)
-            # compute leave days
-            leaves = {}
-            calendar = contract.resource_calendar_id
+        contracts_by_calendar = contracts.filtered(
+            lambda contract: contract.resource_calendar_id).grouped(
+            'resource_calendar_id')
+        for calendar, calendar_contracts in contracts_by_calendar.items():
             tz = timezone(calendar.tz)
-            day_leave_intervals = contract.employee_id.list_leaves(
-                day_from, day_to, calendar=contract.resource_calendar_id)
-            multi_leaves = []
-            for day, hours, leave in day_leave_intervals:
-                work_hours = calendar.get_work_hours_count(
-                    tz.localize(datetime.combine(day, time.min)),
-                    tz.localize(datetime.combine(day, time.max)),
-                    compute_leaves=False,
-                )
-                if len(leave) > 1:
-                    for each in leave:
-                        if each.holiday_id:
-                            multi_leaves.append(each.holiday_id)
-                else:
-                    holiday = leave.holiday_id
-                    current_leave_struct = leaves.setdefault(
-                        holiday.holiday_status_id, {
-                            'name': holiday.holiday_status_id.name or _(
-                                'Global Leaves'),
-                            'sequence': 5,
-                            'code': holiday.holiday_status_id.code or 'GLOBAL',
-                            'number_of_days': 0.0,
-                            'number_of_hours': 0.0,
-                            'contract_id': contract.id,
-                        })
-                    current_leave_struct['number_of_hours'] += hours
-                    if work_hours:
-                        current_leave_struct[
-                            'number_of_days'] += hours / work_hours
-            # compute worked days
-            work_data = contract.employee_id.get_work_days_data(
-                day_from, day_to, calendar=contract.resource_calendar_id)
-            attendances = {
-                'name': _("Normal Working Days paid at 100%"),
-                'sequence': 1,
-                'code': 'WORK100',
-                'number_of_days': work_data['days'],
-                'number_of_hours': work_data['hours'],
-                'contract_id': contract.id,
-            }
-            res.append(attendances)
-            uniq_leaves = [*set(multi_leaves)]
-            c_leaves = {}
-            for rec in uniq_leaves:
-                duration = rec.duration_display.replace("days", "").strip()
-                duration_in_hours = float(duration) * 24
-                c_leaves.setdefault(rec.holiday_status_id,
-                                    {'hours': duration_in_hours})
-            for item in c_leaves:
-                if not leaves or item not in leaves:
-                    data = {
-                        'name': item.name,
-                        'sequence': 20,
-                        'code': item.code or 'LEAVES',
-                        'number_of_hours': c_leaves[item]['hours'],
-                        'number_of_days': c_leaves[item][
-                                              'hours'] / work_hours,
+            # attendances and leaves of all the employees of the calendar
+            work_data_by_employee = \
+                calendar_contracts.employee_id._get_work_days_data_batch(
+                    day_from, day_to, calendar)
+            # working hours of the calendar per day, to convert the hours of
+            # leave in days
+            day_work_hours = defaultdict(float)
+            for start, stop, meta in calendar._attendance_intervals_batch(
+                    tz.localize(day_from - timedelta(days=1)),
+                    tz.localize(day_to + timedelta(days=1)))[False]:
+                day_work_hours[start.date()] += \
+                    (stop - start).total_seconds() / 3600
+            for contract in calendar_contracts:
+                work_data = work_data_by_employee[contract.employee_id.id]
+                res[contract.id] = self._get_contract_worked_day_lines(
+                    contract, work_data, day_work_hours)
+        return res
+
+    @api.model
+    def _get_contract_worked_day_lines(self, contract, work_data,
+                                       day_work_hours):
+        """
+        @param work_data: the worked days and leaves of the employee of the
+        contract, day_work_hours: the working hours of its calendar per day
+        @return: returns the list of dict of the worked days of the contract
+        """
+        res = []
+        # compute leave days
+        leaves = {}
+        day_leave_intervals = work_data['leaves']
+        multi_leaves = []
+        for day, hours, leave in day_leave_intervals:
+            work_hours = day_work_hours.get(day, 0.0)
+            if len(leave) > 1:
+                for each in leave:
+                    if each.holiday_id:
+                        multi_leaves.append(each.holiday_id)
+            else:
+                holiday = leave.holiday_id
+                current_leave_struct = leaves.setdefault(
+                    holiday.holiday_status_id, {
+                        'name': holiday.holiday_status_id.name or _(
+                            'Global Leaves'),
+                        'sequence': 5,
+                        'code': holiday.holiday_status_id.code or 'GLOBAL',
+                        'number_of_days': 0.0,
+                        'number_of_hours': 0.0,
                         'contract_id': contract.id,
-                    }
-                    res.append(data)
-                for time_off in leaves:
-                    if item == time_off:
-                        leaves[item]['number_of_hours'] += c_leaves[item][
-                            'hours']
-                        leaves[item]['number_of_days'] \
-                            += c_leaves[item]['hours'] / work_hours
-            res.extend(leaves.values())
+                    })
+                current_leave_struct['number_of_hours'] += hours
+                if work_hours:
+                    current_leave_struct[
+                        'number_of_days'] += hours / work_hours
+        # compute worked days
+        attendances = {
+            'name': _("Normal Working Days paid at 100%"),
+            'sequence': 1,
+            'code': 'WORK100',
+            'number_of_days': work_data['days'],
+            'number_of_hours': work_data['hours'],
+            'contract_id': contract.id,
+        }
+        res.append(attendances)
+        uniq_leaves = [*set(multi_leaves)]
+        c_leaves = {}
+        for rec in uniq_leaves:
+            duration = rec.duration_display.replace("days", "").strip()
+            duration_in_hours = float(duration) * 24
+            c_leaves.setdefault(rec.holiday_status_id,
+                                {'hours': duration_in_hours})
+        for item in c_leaves:
+            if not leaves or item not in leaves:
+                data = {
+                    'name': item.name,
+                    'sequence': 20,
+                    'code': item.code or 'LEAVES',
+                    'number_of_hours': c_leaves[item]['hours'],
+                    'number_of_days': c_leaves[item][
+                                          'hours'] / work_hours,
+                    'contract_id': contract.id,
+                }
+                res.append(data)
+            for time_off in leaves:
+                if item == time_off:
+                    leaves[item]['number_of_hours'] += c_leaves[item][
+                        'hours']
+                    leaves[item]['number_of_days'] \
+                        += c_leaves[item]['hours'] / work_hours
+        res.extend(leaves.values())
         return res
 
     @api.model
@@ -334,8 +634,18 @@ class HrPayslip(models.Model):
         return res
 
     @api.model
-    def _get_payslip_lines(self, contract_ids, payslip_id):
-        """Function for getting Payslip Lines"""
+    def _get_payslip_lines(self, contract_ids, payslip_id, batch_cache=None,
+                           incremental=False):
+        """Function for getting Payslip Lines
+
+        batch_cache is a dict shared by the payslips computed together, to
+        compute the rules of their structures and load the history of their
+        employees only once. The snapshot of what the lines are computed
+        from is stored in it, by payslip. When incremental is set, the rules
+        which do not depend on what changed since the snapshot of the last
+        computation reuse its results"""
+        if batch_cache is None:
+            batch_cache = {}
 
         def _sum_salary_rule_category(localdict, category, amount):
             """Function for getting total sum of Salary Rule Category"""
@@ -371,15 +681,9 @@ class HrPayslip(models.Model):
                  from_date,to_date fields"""
                 if to_date is None:
                     to_date = fields.Date.today()
-                self.env.cr.execute("""
-                    SELECT sum(amount) as sum
-                    FROM hr_payslip as hp, hr_payslip_input as pi
-                    WHERE hp.employee_id = %s AND hp.state = 'done'
-                    AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
-                    pi.payslip_id AND pi.code = %s""",
-                                    (self.employee_id, from_date, to_date,
-                                        code))
-                return self.env.cr.fetchone()[0] or 0.0
+                res = history.sum('inputs', self.employee_id, code,
+                                  from_date, to_date)
+                return res and res[0] or 0.0
 
         class WorkedDays(BrowsableObject):
             """a class that will be used into the python code, mainly for
@@ -390,16 +694,8 @@ class HrPayslip(models.Model):
                  from_date,to_date fields"""
                 if to_date is None:
                     to_date = fields.Date.today()
-                self.env.cr.execute("""
-                    SELECT sum(number_of_days) as number_of_days, 
-                    sum(number_of_hours) as number_of_hours
-                    FROM hr_payslip as hp, hr_payslip_worked_days as pi
-                    WHERE hp.employee_id = %s AND hp.state = 'done'
-                    AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
-                    pi.payslip_id AND pi.code = %s""",
-                                    (self.employee_id, from_date, to_date,
-                                        code))
-                return self.env.cr.fetchone()
+                return history.sum('worked_days', self.employee_id, code,
+                                   from_date, to_date)
 
             def sum(self, code, from_date, to_date=None):
                 """Function for getting sum of Payslip with respect to
@@ -422,16 +718,8 @@ class HrPayslip(models.Model):
                  from_date,to_date fields"""
                 if to_date is None:
                     to_date = fields.Date.today()
-                self.env.cr.execute("""SELECT sum(case when hp.credit_note = 
-                False then (pl.total) else (-pl.total) end)
-                FROM hr_payslip as hp, hr_payslip_line as pl
-                WHERE hp.employee_id = %s AND hp.state = 'done'
-                AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id 
-                = pl.slip_id AND pl.code = %s""",
-                                    (
-                                        self.employee_id, from_date, to_date,
-                                        code))
-                res = self.env.cr.fetchone()
+                res = history.sum('lines', self.employee_id, code,
+                                  from_date, to_date)
                 return res and res[0] or 0.0
 
         # we keep a dict with the result because a value can be overwritten
@@ -442,6 +730,14 @@ class HrPayslip(models.Model):
         inputs_dict = {}
         blacklist = []
         payslip = self.env['hr.payslip'].browse(payslip_id)
+        if 'payslips' in batch_cache:
+            payslip = payslip.with_prefetch(batch_cache['payslips']._prefetch_ids)
+        # the history of all the employees of the batch is loaded at once
+        if 'history' not in batch_cache:
+            batch_cache['history'] = PayslipHistory(
+                self.env, batch_cache['payslips'].employee_id.ids
+                if 'payslips' in batch_cache else payslip.employee_id.ids)
+        history = batch_cache['history']
         for worked_days_line in payslip.worked_days_line_ids:
             worked_days_dict[worked_days_line.code] = worked_days_line
         for input_line in payslip.input_line_ids:
@@ -458,32 +754,84 @@ class HrPayslip(models.Model):
         # get the ids of the structures on the contracts and their
         # parent id as well
         contracts = self.env['hr.contract'].browse(contract_ids)
+        if 'contracts' in batch_cache:
+            contracts = contracts.with_prefetch(
+                batch_cache['contracts']._prefetch_ids)
         if len(contracts) == 1 and payslip.struct_id:
             structure_ids = list(
                 set(payslip.struct_id._get_parent_structure().ids))
         else:
             structure_ids = contracts.get_all_structures()
-        # get the rules of the structure and thier children
-        rule_ids = self.env['hr.payroll.structure'].browse(
-            structure_ids).get_all_rules()
-        # run the rules by sequence
-        sorted_rule_ids = [id for id, sequence in
-                           sorted(rule_ids, key=lambda x: x[1])]
-        sorted_rules = self.env['hr.salary.rule'].browse(sorted_rule_ids)
+        sorted_rules_cache = batch_cache.setdefault('sorted_rules', {})
+        structures_key = tuple(sorted(structure_ids))
+        if structures_key not in sorted_rules_cache:
+            # get the rules of the structure and thier children
+            rule_ids = self.env['hr.payroll.structure'].browse(
+                structure_ids).get_all_rules()
+            # run the rules by sequence
+            sorted_rule_ids = [id for id, sequence in
+                               sorted(rule_ids, key=lambda x: x[1])]
+            sorted_rules_cache[structures_key] = self.env[
+                'hr.salary.rule'].browse(sorted_rule_ids)
+        sorted_rules = sorted_rules_cache[structures_key]
+        children_rules_cache = batch_cache.setdefault('children_rules', {})
+        snapshot = payslip._get_compute_snapshot(contracts, sorted_rules)
+        # values which changed since the last computation, and the rules and
+        # categories of the rules computed again, None to compute all rules
+        dirty = None
+        previous_results = {}
+        if incremental:
+            dirty = payslip._get_compute_changes(snapshot)
+            if dirty is not None:
+                previous_results = payslip.compute_snapshot['lines']
         for contract in contracts:
             employee = contract.employee_id
             localdict = dict(baselocaldict, employee=employee,
                              contract=contract)
+            # the checks of safe_eval on its context, done once for all the
+            # rules, see hr.salary.rule._eval_expression
+            check_values(localdict)
             for rule in sorted_rules:
                 key = rule.code + '-' + str(contract.id)
                 localdict['result'] = None
                 localdict['result_qty'] = 1.0
                 localdict['result_rate'] = 100
-                # check if the rule can be applied
-                if rule._satisfy_condition(
-                        localdict) and rule.id not in blacklist:
-                    # compute the amount of the rule
-                    amount, qty, rate = rule._compute_rule(localdict)
+                # reuse the previous result of the rule when it does not
+                # depend on anything which changed, nor its parent rule, if
+                # it is not overwritten by another rule with the same code.
+                # The rules without result are checked again, their parent
+                # rule may be satisfied now.
+                previous_result = previous_results.get(key)
+                unchanged = dirty is not None and \
+                    rule.id not in blacklist and \
+                    bool(previous_result) and \
+                    previous_result[0] == rule.id and \
+                    ('rule_ids', rule.parent_rule_id.id) not in dirty
+                if unchanged:
+                    dependencies = rule._get_dependencies()
+                    unchanged = dependencies is not None and \
+                        not dependencies & dirty
+                if unchanged:
+                    satisfied = True
+                else:
+                    # check if the rule can be applied
+                    satisfied = rule._satisfy_condition(
+                        localdict) and rule.id not in blacklist
+                    if dirty is not None:
+                        # the rules reading this one and its children are
+                        # computed again
+                        dirty.add(('rules', rule.code))
+                        dirty.add(('rule_ids', rule.id))
+                        category = rule.category_id
+                        while category:
+                            dirty.add(('categories', category.code))
+                            category = category.parent_id
+                if satisfied:
+                    if unchanged:
+                        amount, qty, rate = previous_result[1:]
+                    else:
+                        # compute the amount of the rule
+                        amount, qty, rate = rule._compute_rule(localdict)
                     # check if there is already a rule computed with that code
                     previous_amount = rule.code in localdict and localdict[
                         rule.code] or 0.0
@@ -522,8 +870,16 @@ class HrPayslip(models.Model):
                     }
                 else:
                     # blacklist this rule and its children
-                    blacklist += [id for id, seq in
-                                  rule._recursive_search_of_rules()]
+                    if rule.id not in children_rules_cache:
+                        children_rules_cache[rule.id] = [
+                            id for id, seq in
+                            rule._recursive_search_of_rules()]
+                    blacklist += children_rules_cache[rule.id]
+        snapshot['lines'] = {
+            key: [values['salary_rule_id'], values['amount'],
+                  values['quantity'], values['rate']]
+            for key, values in result_dict.items()}
+        batch_cache.setdefault('snapshots', {})[payslip_id] = snapshot
         return list(result_dict.values())
 
     # YTI
@@ -533,6 +889,31 @@ class HrPayslip(models.Model):
     def onchange_employee_id(self, date_from, date_to, employee_id=False,
                              contract_id=False):
         """Function for return worked days when changing onchange_employee_id"""
+        if (not employee_id) or (not date_from) or (not date_to):
+            return self._get_employee_payslip_data(False, date_from, date_to,
+                                                   [])
+        employee = self.env['hr.employee'].browse(employee_id)
+        if not self.env.context.get('contract'):
+            # fill with the first contract of the employee
+            contract_ids = self.get_contract(employee, date_from, date_to)
+        else:
+            if contract_id:
+                # set the list of contract for which the input have to be filled
+                contract_ids = [contract_id]
+            else:
+                # if we don't give the contract, then the input to fill
+                # should be for all current contracts of the employee
+                contract_ids = self.get_contract(employee, date_from, date_to)
+        return self._get_employee_payslip_data(employee, date_from, date_to,
+                                               contract_ids)
+
+    def _get_employee_payslip_data(self, employee, date_from, date_to,
+                                   contract_ids, worked_days=None):
+        """Function for return the values of onchange_employee_id for
+        contracts which are already known, so that the contracts of
+        several employees can be searched at once. worked_days is the
+        result of _get_worked_day_lines_batch for these contracts, when it
+        is computed for several employees at once"""
         # defaults
         res = {
             'value': {
@@ -545,10 +926,9 @@ class HrPayslip(models.Model):
                 'struct_id': False,
             }
         }
-        if (not employee_id) or (not date_from) or (not date_to):
+        if (not employee) or (not date_from) or (not date_to):
             return res
         ttyme = datetime.combine(fields.Date.from_string(date_from), time.min)
-        employee = self.env['hr.employee'].browse(employee_id)
         locale = self.env.context.get('lang') or 'en_US'
         res['value'].update({
             'name': _('Salary Slip of %s for %s') % (
@@ -557,17 +937,6 @@ class HrPayslip(models.Model):
                                             locale=locale))),
             'company_id': employee.company_id.id,
         })
-        if not self.env.context.get('contract'):
-            # fill with the first contract of the employee
-            contract_ids = self.get_contract(employee, date_from, date_to)
-        else:
-            if contract_id:
-                # set the list of contract for which the input have to be filled
-                contract_ids = [contract_id]
-            else:
-                # if we don't give the contract, then the input to fill
-                # should be for all current contracts of the employee
-                contract_ids = self.get_contract(employee, date_from, date_to)
         if not contract_ids:
             return res
         contract = self.env['hr.contract'].browse(contract_ids[0])
@@ -582,8 +951,13 @@ class HrPayslip(models.Model):
         })
         # computation of the salary input
         contracts = self.env['hr.contract'].browse(contract_ids)
-        worked_days_line_ids = self.get_worked_day_lines(contracts, date_from,
-                                                         date_to)
+        if worked_days is None:
+            worked_days_line_ids = self.get_worked_day_lines(
+                contracts, date_from, date_to)
+        else:
+            worked_days_line_ids = [
+                line for contract in contracts
+                for line in worked_days.get(contract.id, [])]
         input_line_ids = self.get_inputs(contracts, date_from, date_to)
         res['value'].update({
             'worked_days_line_ids': worked_days_line_ids,
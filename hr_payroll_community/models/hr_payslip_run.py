@@ -20,9 +20,24 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
+import csv
+import io
+import logging
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
-from odoo import fields, models
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Number of payslips of which the details are read at once when exported
+EXPORT_CHUNK_SIZE = 500
 
 
 class HrPayslipRun(models.Model):
@@ -55,6 +70,36 @@ class HrPayslipRun(models.Model):
                                  help="If its checked, indicates that all"
                                       "payslips generated from here are refund"
                                       "payslips.")
+    generation_state = fields.Selection([
+        ('in_progress', 'In Progress'),
+        ('done', 'Done'),
+    ], string='Generation Status', readonly=True, copy=False,
+        help="Status of the payslips generated in background jobs")
+    generation_target_count = fields.Integer(
+        string='Expected Payslips', readonly=True, copy=False,
+        help="Number of payslips of the batch once the background "
+             "generation is done")
+    generation_graph_uuid = fields.Char(
+        string='Generation Jobs', readonly=True, copy=False,
+        help="Identifier of the background jobs generating the payslips")
+    generation_progress = fields.Float(
+        string='Generation Progress',
+        compute='_compute_generation_progress',
+        help="Percentage of the payslips generated in background jobs")
+
+    def _compute_generation_progress(self):
+        """Compute function for the progress of the generation, the jobs
+        do not update the batch so that they do not conflict"""
+        counts = dict(self.env['hr.payslip']._read_group(
+            [('payslip_run_id', 'in', self.ids)],
+            ['payslip_run_id'], ['__count']))
+        for payslip_run in self:
+            if not payslip_run.generation_target_count:
+                payslip_run.generation_progress = 0.0
+                continue
+            payslip_run.generation_progress = min(
+                100.0, 100.0 * counts.get(payslip_run, 0) /
+                payslip_run.generation_target_count)
 
     def action_payslip_run(self):
         """Function for state change"""
@@ -63,3 +108,162 @@ class HrPayslipRun(models.Model):
     def close_payslip_run(self):
         """Function for state change"""
         return self.write({'state': 'close'})
+
+    def _get_employees_to_generate(self, employees):
+        """Function for getting the employees which have no payslip in the
+        batch for its dates yet, so that generating the payslips again
+        after a partial failure does not duplicate them"""
+        self.ensure_one()
+        return employees - self.slip_ids.filtered(
+            lambda slip: slip.date_from == self.date_start and
+            slip.date_to == self.date_end).employee_id
+
+    def _generate_payslips(self, employees):
+        """Function for creating and computing the payslips of the
+        employees in the batch"""
+        self.ensure_one()
+        employees = self._get_employees_to_generate(employees)
+        payslips = self.env['hr.payslip']
+        # search the contracts of all the employees at once
+        contract_ids_by_employee = payslips._get_contracts_by_employee(
+            employees, self.date_start, self.date_end)
+        # and compute their worked days together, by working schedule
+        contracts = self.env['hr.contract'].browse(
+            [contract_id for contract_ids in contract_ids_by_employee.values()
+             for contract_id in contract_ids])
+        worked_days = payslips._get_worked_day_lines_batch(
+            contracts, self.date_start, self.date_end)
+        values = []
+        for employee in employees:
+            slip_data = payslips._get_employee_payslip_data(
+                employee, self.date_start, self.date_end,
+                contract_ids_by_employee[employee.id], worked_days)
+            values.append({
+                'employee_id': employee.id,
+                'name': slip_data['value'].get('name'),
+                'struct_id': slip_data['value'].get('struct_id'),
+                'contract_id': slip_data['value'].get('contract_id'),
+                'payslip_run_id': self.id,
+                'input_line_ids': [(0, 0, x) for x in
+                                   slip_data['value'].get('input_line_ids')],
+                'worked_days_line_ids': [(0, 0, x) for x in
+                                         slip_data['value'].get(
+                                             'worked_days_line_ids')],
+                'date_from': self.date_start,
+                'date_to': self.date_end,
+                'credit_note': self.credit_note,
+                'company_id': employee.company_id.id,
+            })
+        payslips = payslips.create(values)
+        payslips.action_compute_sheet()
+        return payslips
+
+    def _generate_payslips_async(self, employees):
+        """Function for generating the payslips of the employees in
+        parallel jobs of payslip_generation_chunk_size employees, followed
+        by a job closing the generation"""
+        self.ensure_one()
+        employees = self._get_employees_to_generate(employees)
+        if not employees:
+            return
+        self.write({
+            'generation_state': 'in_progress',
+            'generation_target_count': len(self.slip_ids) + len(employees),
+        })
+        chunk_size = self.env.company.payslip_generation_chunk_size or 100
+        generation = employees.delayable(
+            description=_("Generate payslips of %s") % self.name,
+        )._generate_batch_payslips(self).split(chunk_size)
+        finish = self.delayable(
+            description=_("Finish the generation of %s") % self.name,
+        )._finish_payslip_generation()
+        generation.on_done(finish)
+        generation.delay()
+        self.generation_graph_uuid = finish._generated_job.graph_uuid
+
+    def _finish_payslip_generation(self):
+        """Function for closing the generation of the payslips, once all
+        the jobs generating them are done"""
+        for payslip_run in self:
+            _logger.info("%d payslips generated in batch %s",
+                         len(payslip_run.slip_ids), payslip_run.name)
+        self.write({'generation_state': 'done'})
+
+    def action_reset_generation(self):
+        """Function for resetting the generation of the payslips when one
+        of its jobs failed or was cancelled, the closing job then waits
+        forever. The jobs not started yet are cancelled, so that the
+        payslips of the remaining employees can be generated again"""
+        payslip_runs = self.filtered(
+            lambda run: run.generation_state == 'in_progress')
+        for payslip_run in payslip_runs:
+            jobs = self.env['queue.job'].sudo()
+            if payslip_run.generation_graph_uuid:
+                jobs = jobs.search([
+                    ('graph_uuid', '=', payslip_run.generation_graph_uuid)])
+            if jobs and not jobs.filtered(
+                    lambda job: job.state in ('failed', 'cancelled')):
+                raise UserError(
+                    _("The payslips of %s are still being generated.")
+                    % payslip_run.name)
+            jobs.filtered(
+                lambda job: job.state in ('wait_dependencies', 'pending')
+            ).button_cancelled()
+        return payslip_runs.write({
+            'generation_state': False,
+            'generation_target_count': 0,
+            'generation_graph_uuid': False,
+        })
+
+    def action_export_details(self):
+        """Function for downloading the details by salary rule category of
+        the payslips of the batch, in the export_format of the context"""
+        self.ensure_one()
+        export_format = self.env.context.get('export_format', 'csv')
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/hr_payroll_community/payslip_run/%s/details.%s' % (
+                self.id, export_format),
+            'target': 'download',
+        }
+
+    def _get_export_details_rows(self):
+        """Function for generating the rows of the details by salary rule
+        category of the payslips of the batch. The details are computed
+        by chunks of payslips, so that large batches are exported without
+        loading all their payslips in memory"""
+        self.ensure_one()
+        report = self.env['report.hr_payroll_community.report_payslipdetails']
+        yield [_('Reference'), _('Employee'), _('Code'),
+               _('Salary Rule Category'), _('Level'), _('Total')]
+        for payslip_ids in split_every(EXPORT_CHUNK_SIZE, self.slip_ids.ids):
+            payslips = self.env['hr.payslip'].browse(payslip_ids)
+            details = report._get_details_by_rule_category(payslip_ids)
+            for payslip in payslips:
+                for detail in details.get(payslip.id, []):
+                    yield [payslip.number or '', payslip.employee_id.name,
+                           detail['code'] or '', detail['rule_category'],
+                           detail['level'], detail['total']]
+            self.env.invalidate_all()
+
+    def _write_export_details(self, fileobj, export_format):
+        """Function for writing the details by salary rule category of the
+        payslips of the batch in the binary file object, in csv or xlsx"""
+        self.ensure_one()
+        if export_format == 'csv':
+            writer = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+            csv.writer(writer).writerows(self._get_export_details_rows())
+            # leave fileobj open for the caller
+            writer.detach()
+        elif export_format == 'xlsx':
+            if xlsxwriter is None:
+                raise UserError(
+                    _("The Python library xlsxwriter is required to export "
+                      "in xlsx."))
+            workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+            worksheet = workbook.add_worksheet(_('Payslip Details'))
+            for row, values in enumerate(self._get_export_details_rows()):
+                worksheet.write_row(row, 0, values)
+            workbook.close()
+        else:
+            raise UserError(_("Unsupported export format %s.") % export_format)
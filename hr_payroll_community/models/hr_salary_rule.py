@@ -20,10 +20,88 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
-from odoo import api, fields, models, _
+import ast
+from odoo import api, fields, models, tools, _
 from odoo.addons import decimal_precision as dp
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools.safe_eval import safe_eval
+from odoo.tools.safe_eval import _BUILTINS, _SAFE_OPCODES, test_expr, \
+    unsafe_eval
+
+# Objects of the rule context giving access to the values by code, see
+# hr.payslip._get_payslip_lines
+TRACKED_OBJECTS = ('categories', 'rules', 'inputs', 'worked_days')
+# Methods and attributes of these objects which are not values by code
+UNTRACKED_ATTRIBUTES = ('dict', 'env', 'employee_id', 'sum', 'sum_hours',
+                        '_sum')
+# Variables the rule code may set
+RESULT_NAMES = ('result', 'result_qty', 'result_rate')
+# Records of the rule context which are not followed value by value, the
+# payslip is computed again when they change. Their related records are not
+# followed, the rules reading them are always computed again
+CONTEXT_NAMES = ('employee', 'contract')
+
+
+class RuleDependencyVisitor(ast.NodeVisitor):
+    """Collect the (object, code) values read by a rule expression, or
+    flag it as untracked when it reads anything else"""
+
+    def __init__(self):
+        """Function for initializing the dependencies"""
+        self.dependencies = set()
+        self.tracked = True
+
+    def visit_Attribute(self, node):
+        """Function for collecting the values read by code"""
+        if isinstance(node.value, ast.Name) and \
+                node.value.id in TRACKED_OBJECTS:
+            if node.attr in UNTRACKED_ATTRIBUTES or \
+                    not isinstance(node.ctx, ast.Load):
+                self.tracked = False
+            else:
+                self.dependencies.add((node.value.id, node.attr))
+            return
+        if self._is_context_value(node.value):
+            # a value of a record related to the employee or the contract
+            self.tracked = False
+            return
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        """Function for flagging the values read from the related records
+        of the context"""
+        if self._is_context_value(node.value):
+            self.tracked = False
+            return
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        """Function for flagging the methods called on the records of the
+        context, they may read any related record"""
+        if isinstance(node.func, ast.Attribute) and \
+                self._is_context_value(node.func):
+            self.tracked = False
+            return
+        self.generic_visit(node)
+
+    @staticmethod
+    def _is_context_value(node):
+        """Function for checking whether the node reads a value of the
+        employee or the contract"""
+        return isinstance(node, (ast.Attribute, ast.Subscript)) and \
+            isinstance(node.value, ast.Name) and \
+            node.value.id in CONTEXT_NAMES
+
+    def visit_Name(self, node):
+        """Function for collecting the rule codes read by name"""
+        if not isinstance(node.ctx, ast.Load):
+            if node.id not in RESULT_NAMES:
+                # the variable would leak to the rules computed after
+                self.tracked = False
+        elif node.id in TRACKED_OBJECTS or node.id == 'payslip':
+            self.tracked = False
+        elif node.id not in RESULT_NAMES + CONTEXT_NAMES and \
+                node.id not in _BUILTINS:
+            self.dependencies.add(('rules', node.id))
 
 
 class HrSalaryRule(models.Model):
@@ -169,6 +247,76 @@ class HrSalaryRule(models.Model):
             children_rules += rule.child_ids._recursive_search_of_rules()
         return [(rule.id, rule.sequence) for rule in self] + children_rules
 
+    @api.model
+    @tools.ormcache('expr', 'mode')
+    def _compile_expression(self, expr, mode):
+        """
+        Validate and compile a rule expression the way safe_eval does, once
+        per worker. The source is the cache key, so a rule is compiled again
+        as soon as one of its expressions is edited.
+        """
+        return test_expr(expr, _SAFE_OPCODES, mode=mode)
+
+    @api.model
+    def _eval_expression(self, expr, localdict, mode='eval'):
+        """
+        Evaluate a rule expression with the same restrictions as safe_eval,
+        from its compiled code. In 'exec' mode, the variables set by the
+        code are written in localdict.
+        safe_eval refuses code objects, so the code is run the way safe_eval
+        runs it: validated against _SAFE_OPCODES by test_expr, with only
+        _BUILTINS available. The values of localdict are checked once by
+        hr.payslip._get_payslip_lines with check_values, the rules can not
+        add any module to it since the import opcodes are refused.
+        """
+        code = self._compile_expression(expr, mode)
+        localdict['__builtins__'] = dict(_BUILTINS)
+        try:
+            return unsafe_eval(code, localdict)
+        finally:
+            del localdict['__builtins__']
+
+    @api.model
+    @tools.ormcache('expressions')
+    def _parse_dependencies(self, expressions):
+        """
+        @param expressions: tuple of (expression, mode) of a rule
+        @return: returns a frozenset of the (object, code) the expressions
+        read, the object being 'rules', 'categories', 'inputs' or
+        'worked_days', or None when they read other values of the payslip
+        """
+        visitor = RuleDependencyVisitor()
+        for expr, mode in expressions:
+            if not isinstance(expr, str):
+                return None
+            try:
+                visitor.visit(ast.parse(expr.strip(), mode=mode))
+            except SyntaxError:
+                return None
+            if not visitor.tracked:
+                return None
+        return frozenset(visitor.dependencies)
+
+    def _get_dependencies(self):
+        """
+        @return: returns the values read by the condition and the amount of
+        the rule, see _parse_dependencies
+        """
+        self.ensure_one()
+        expressions = []
+        if self.condition_select == 'range':
+            expressions.append((self.condition_range, 'eval'))
+        elif self.condition_select == 'python':
+            expressions.append((self.condition_python, 'exec'))
+        if self.amount_select == 'fix':
+            expressions.append((self.quantity, 'eval'))
+        elif self.amount_select == 'percentage':
+            expressions.append((self.amount_percentage_base, 'eval'))
+            expressions.append((self.quantity, 'eval'))
+        else:
+            expressions.append((self.amount_python_compute, 'exec'))
+        return self._parse_dependencies(tuple(expressions))
+
     # TODO should add some checks on the type of result (should be float)
     def _compute_rule(self, localdict):
         """
@@ -183,7 +331,7 @@ class HrSalaryRule(models.Model):
             if rec.amount_select == 'fix':
                 try:
                     return rec.amount_fix, float(
-                        safe_eval(rec.quantity, localdict)), 100.0
+                        rec._eval_expression(rec.quantity, localdict)), 100.0
                 except:
                     raise UserError(
                         _('Wrong quantity defined for salary rule %s (%s).') % (
@@ -191,8 +339,9 @@ class HrSalaryRule(models.Model):
             elif rec.amount_select == 'percentage':
                 try:
                     return (
-                        float(safe_eval(rec.amount_percentage_base, localdict)),
-                        float(safe_eval(rec.quantity, localdict)),
+                        float(rec._eval_expression(rec.amount_percentage_base,
+                                                   localdict)),
+                        float(rec._eval_expression(rec.quantity, localdict)),
                         rec.amount_percentage)
                 except:
                     raise UserError(
@@ -201,8 +350,8 @@ class HrSalaryRule(models.Model):
                             rec.name, rec.code))
             else:
                 try:
-                    safe_eval(rec.amount_python_compute, localdict, mode='exec',
-                              nocopy=True)
+                    rec._eval_expression(rec.amount_python_compute, localdict,
+                                         mode='exec')
                     return (float(localdict['result']),
                             'result_qty' in localdict and
                             localdict['result_qty'] or 1.0, 'result_rate'
@@ -224,7 +373,7 @@ class HrSalaryRule(models.Model):
             return True
         elif self.condition_select == 'range':
             try:
-                result = safe_eval(self.condition_range, localdict)
+                result = self._eval_expression(self.condition_range, localdict)
                 return (
                             self.condition_range_min <= result <= self.condition_range_max or False)
             except:
@@ -234,8 +383,8 @@ class HrSalaryRule(models.Model):
                         self.name, self.code))
         else:  # python code
             try:
-                safe_eval(self.condition_python, localdict, mode='exec',
-                          nocopy=True)
+                self._eval_expression(self.condition_python, localdict,
+                                      mode='exec')
                 return 'result' in localdict and localdict['result'] or False
             except:
                 raise UserError(
@@ -35,3 +35,11 @@ class ResConfigSettings(models.TransientModel):
                                                help="Is Belgium Payroll")
     module_l10n_in_hr_payroll = fields.Boolean(string='Indian Payroll',
                                                help="Is Indian Payroll")
+    payslip_generation_async = fields.Boolean(
+        related='company_id.payslip_generation_async', readonly=False,
+        string='Generate Payslips in Background',
+        help="Generate the payslips of the batches in background jobs")
+    payslip_generation_chunk_size = fields.Integer(
+        related='company_id.payslip_generation_chunk_size', readonly=False,
+        string='Employees per Job',
+        help="Number of employees whose payslips are generated by each job")
@@ -48,8 +48,27 @@ class ResourceMixin(models.AbstractModel):
             Returns a dict {'days': n, 'hours': h} containing the
             quantity of working time expressed as days and as hours.
         """
-        resource = self.resource_id
         calendar = calendar or self.resource_calendar_id
+        data = self._get_work_days_data_batch(
+            from_datetime, to_datetime, calendar,
+            compute_leaves=compute_leaves, domain=domain)[self.id]
+        return {
+            'days': data['days'],
+            'hours': data['hours'],
+        }
+
+    def _get_work_days_data_batch(self, from_datetime, to_datetime, calendar,
+                                  compute_leaves=True, domain=None):
+        """
+            Same as get_work_days_data, for all the records of self working
+            with the given calendar: the attendances and the leaves of all
+            their resources are computed together.
+
+            Returns a dict {record.id: {'days': n, 'hours': h, 'leaves': l}}
+            where l is the list of leave intervals (day, hours, leaves) like
+            list_leaves returns, empty when compute_leaves is False.
+        """
+        resources = self.resource_id
         # naive datetime are made explicit in UTC
         if not from_datetime.tzinfo:
             from_datetime = from_datetime.replace(tzinfo=utc)
@@ -59,30 +78,42 @@ class ResourceMixin(models.AbstractModel):
         # in order to compute the total hours on the first and last days
         from_full = from_datetime - timedelta(days=1)
         to_full = to_datetime + timedelta(days=1)
-        intervals = calendar._attendance_intervals_batch(from_full, to_full,
-                                                         resource)
-        day_total = defaultdict(float)
-        for start, stop, meta in intervals[resource.id]:
-            day_total[start.date()] += (stop - start).total_seconds() / 3600
-        # actual hours per day
+        full_intervals = calendar._attendance_intervals_batch(
+            from_full, to_full, resources)
+        # actual hours per day, the attendances minus the leaves as in
+        # calendar._work_intervals_batch
+        attendance_intervals = calendar._attendance_intervals_batch(
+            from_datetime, to_datetime, resources)
         if compute_leaves:
-            intervals = calendar._work_intervals_batch(from_datetime,
-                                                       to_datetime, resource,
-                                                       domain)
-        else:
-            intervals = calendar._attendance_intervals_batch(from_datetime,
-                                                             to_datetime,
-                                                             resource)
-        day_hours = defaultdict(float)
-        for start, stop, meta in intervals[resource.id]:
-            day_hours[start.date()] += (stop - start).total_seconds() / 3600
-        # compute number of days as quarters
-        days = sum(
-            float_utils.round(ROUNDING_FACTOR * day_hours[day] / day_total[
-                day]) / ROUNDING_FACTOR
-            for day in day_hours
-        )
-        return {
-            'days': days,
-            'hours': sum(day_hours.values()),
-        }
+            leave_intervals = calendar._leave_intervals_batch(
+                from_datetime, to_datetime, resources, domain)
+        res = {}
+        for record in self:
+            resource = record.resource_id
+            day_total = defaultdict(float)
+            for start, stop, meta in full_intervals[resource.id]:
+                day_total[start.date()] += (stop - start).total_seconds() / 3600
+            intervals = attendance_intervals[resource.id]
+            leaves = []
+            if compute_leaves:
+                for start, stop, leave in (leave_intervals[resource.id] &
+                                           intervals):
+                    leaves.append((start.date(),
+                                   (stop - start).total_seconds() / 3600,
+                                   leave))
+                intervals = intervals - leave_intervals[resource.id]
+            day_hours = defaultdict(float)
+            for start, stop, meta in intervals:
+                day_hours[start.date()] += (stop - start).total_seconds() / 3600
+            # compute number of days as quarters
+            days = sum(
+                float_utils.round(ROUNDING_FACTOR * day_hours[day] / day_total[
+                    day]) / ROUNDING_FACTOR
+                for day in day_hours
+            )
+            res[record.id] = {
+                'days': days,
+                'hours': sum(day_hours.values()),
+                'leaves': leaves,
+            }
+        return res
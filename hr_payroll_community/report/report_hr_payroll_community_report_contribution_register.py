@@ -34,20 +34,43 @@ class ReportHrPayrollCommunityReportContributionRegister(models.AbstractModel):
     def _get_payslip_lines(self, register_ids, date_from, date_to):
         """Function for getting Payslip Lines to Contribution Register Report"""
         result = {}
+        if not register_ids:
+            return result
         self.env.cr.execute("""
-            SELECT pl.id from hr_payslip_line as pl
+            SELECT pl.register_id, array_agg(pl.id ORDER BY pl.slip_id,
+                                             pl.sequence)
+            FROM hr_payslip_line as pl
             LEFT JOIN hr_payslip AS hp on (pl.slip_id = hp.id)
             WHERE (hp.date_from >= %s) AND (hp.date_to <= %s)
             AND pl.register_id in %s
             AND hp.state = 'done'
-            ORDER BY pl.slip_id, pl.sequence""",
+            GROUP BY pl.register_id""",
                             (date_from, date_to, tuple(register_ids)))
-        line_ids = [x[0] for x in self.env.cr.fetchall()]
-        for line in self.env['hr.payslip.line'].browse(line_ids):
-            result.setdefault(line.register_id.id, self.env['hr.payslip.line'])
-            result[line.register_id.id] += line
+        line_ids_by_register = dict(self.env.cr.fetchall())
+        # the lines of all the registers are read together when printed
+        prefetch_ids = [line_id for line_ids in line_ids_by_register.values()
+                        for line_id in line_ids]
+        for register_id, line_ids in line_ids_by_register.items():
+            result[register_id] = self.env['hr.payslip.line'].browse(
+                line_ids).with_prefetch(prefetch_ids)
         return result
 
+    def _get_payslip_lines_total(self, register_ids, date_from, date_to):
+        """Function for getting the total of the Payslip Lines of each
+        Contribution Register, summed by the database"""
+        if not register_ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT pl.register_id, sum(pl.total)
+            FROM hr_payslip_line as pl
+            LEFT JOIN hr_payslip AS hp on (pl.slip_id = hp.id)
+            WHERE (hp.date_from >= %s) AND (hp.date_to <= %s)
+            AND pl.register_id in %s
+            AND hp.state = 'done'
+            GROUP BY pl.register_id""",
+                            (date_from, date_to, tuple(register_ids)))
+        return dict(self.env.cr.fetchall())
+
     @api.model
     def _get_report_values(self, docids, data=None):
         """Function for getting Contribution Register Values"""
@@ -64,11 +87,11 @@ class ReportHrPayrollCommunityReportContributionRegister(models.AbstractModel):
                                                                       days=-1))[
                                    :10])
         lines_data = self._get_payslip_lines(register_ids, date_from, date_to)
+        totals = self._get_payslip_lines_total(register_ids, date_from,
+                                               date_to)
         lines_total = {}
         for register in contrib_registers:
-            lines = lines_data.get(register.id)
-            lines_total[register.id] = lines and sum(
-                lines.mapped('total')) or 0.0
+            lines_total[register.id] = totals.get(register.id) or 0.0
         return {
             'doc_ids': docids,
             'doc_model': 'hr.contribution.register',
@@ -30,85 +30,151 @@ class ReportHrPayrollCommunityReportPayslipDetails(models.AbstractModel):
 
     def get_details_by_rule_category(self, payslip_lines):
         """Function for get Salary Rule Categories"""
-        PayslipLine = self.env['hr.payslip.line']
-        RuleCateg = self.env['hr.salary.rule.category']
+        return self._get_details_by_rule_category(
+            payslip_lines.mapped('slip_id').ids, payslip_lines.ids)
 
-        def get_recursive_parent(current_rule_category, rule_categories=None):
-            """Function for return Rule Categories with respect to Parent
-            Category"""
-            if rule_categories:
-                rule_categories = current_rule_category | rule_categories
-            else:
-                rule_categories = current_rule_category
-            if current_rule_category.parent_id:
-                return get_recursive_parent(current_rule_category.parent_id,
-                                            rule_categories)
-            else:
-                return rule_categories
+    def _get_details_by_rule_category(self, payslip_ids, line_ids=None):
+        """Function for get Salary Rule Categories of the payslips, of
+        their lines appearing on payslip or of line_ids when given. The
+        totals of the categories are summed by the database and their
+        parents are fetched with one recursive query"""
         res = {}
+        if not payslip_ids:
+            return res
+        lang = self.env.lang or 'en_US'
+        if line_ids is None:
+            condition = 'pl.appears_on_payslip AND pl.category_id IS NOT NULL'
+            params = (lang, tuple(payslip_ids))
+        elif not line_ids:
+            return res
+        else:
+            condition = 'pl.id IN %s'
+            params = (lang, tuple(payslip_ids), tuple(line_ids))
+        self.env.cr.execute("""
+            SELECT pl.slip_id, pl.category_id,
+                   COALESCE(pl.name->>%s, pl.name->>'en_US'), pl.code,
+                   pl.total,
+                   sum(pl.total) OVER (PARTITION BY pl.slip_id, pl.category_id)
+            FROM hr_payslip_line as pl
+            LEFT JOIN hr_salary_rule_category AS rc on
+            (pl.category_id = rc.id)
+            WHERE pl.slip_id in %s AND """ + condition + """
+            ORDER BY pl.sequence, rc.parent_id, pl.id""", params)
         result = {}
-        if payslip_lines:
-            self.env.cr.execute("""
-                SELECT pl.id, pl.category_id, pl.slip_id FROM 
-                hr_payslip_line as pl
-                LEFT JOIN hr_salary_rule_category AS rc on 
-                (pl.category_id = rc.id)
-                WHERE pl.id in %s
-                GROUP BY rc.parent_id, pl.sequence, pl.id, pl.category_id
-                ORDER BY pl.sequence, rc.parent_id""",
-                                (tuple(payslip_lines.ids),))
-            for x in self.env.cr.fetchall():
-                result.setdefault(x[2], {})
-                result[x[2]].setdefault(x[1], [])
-                result[x[2]][x[1]].append(x[0])
-            for payslip_id, lines_dict in result.items():
-                res.setdefault(payslip_id, [])
-                for rule_categ_id, line_ids in lines_dict.items():
-                    rule_categories = RuleCateg.browse(rule_categ_id)
-                    lines = PayslipLine.browse(line_ids)
-                    level = 0
-                    for parent in get_recursive_parent(rule_categories):
-                        res[payslip_id].append({
-                            'rule_category': parent.name,
-                            'name': parent.name,
-                            'code': parent.code,
-                            'level': level,
-                            'total': sum(lines.mapped('total')),
-                        })
-                        level += 1
-                    for line in lines:
-                        res[payslip_id].append({
-                            'rule_category': line.name,
-                            'name': line.name,
-                            'code': line.code,
-                            'total': line.total,
-                            'level': level
-                        })
+        category_totals = {}
+        for slip_id, category_id, name, code, total, category_total in \
+                self.env.cr.fetchall():
+            result.setdefault(slip_id, {})
+            result[slip_id].setdefault(category_id, []).append(
+                (name, code, total))
+            category_totals[slip_id, category_id] = category_total
+        parents = self._get_rule_category_parents(
+            {category_id for lines_dict in result.values()
+             for category_id in lines_dict})
+        for payslip_id, lines_dict in result.items():
+            res.setdefault(payslip_id, [])
+            for rule_categ_id, lines in lines_dict.items():
+                level = 0
+                for name, code in parents[rule_categ_id]:
+                    res[payslip_id].append({
+                        'rule_category': name,
+                        'name': name,
+                        'code': code,
+                        'level': level,
+                        'total': category_totals[payslip_id, rule_categ_id],
+                    })
+                    level += 1
+                for name, code, total in lines:
+                    res[payslip_id].append({
+                        'rule_category': name,
+                        'name': name,
+                        'code': code,
+                        'total': total,
+                        'level': level
+                    })
         return res
 
+    def _get_rule_category_parents(self, category_ids):
+        """Function for return the name and code of the Rule Categories
+        with their Parent Categories, from the root to the category"""
+        parents = {category_id: [] for category_id in category_ids}
+        if not category_ids:
+            return parents
+        self.env.cr.execute("""
+            WITH RECURSIVE category_parents(category_id, parent_id, depth) AS (
+                SELECT id, id, 0 FROM hr_salary_rule_category
+                WHERE id in %s
+                UNION ALL
+                SELECT cp.category_id, rc.parent_id, cp.depth + 1
+                FROM category_parents AS cp
+                JOIN hr_salary_rule_category AS rc on (rc.id = cp.parent_id)
+                WHERE rc.parent_id IS NOT NULL
+            )
+            SELECT cp.category_id, COALESCE(rc.name->>%s, rc.name->>'en_US'),
+                   rc.code
+            FROM category_parents AS cp
+            JOIN hr_salary_rule_category AS rc on (rc.id = cp.parent_id)
+            ORDER BY cp.category_id, cp.depth DESC""",
+                            (tuple(category_ids), self.env.lang or 'en_US'))
+        for category_id, name, code in self.env.cr.fetchall():
+            parents[category_id].append((name, code))
+        return parents
+
     def get_lines_by_contribution_register(self, payslip_lines):
         """Function for getting Contribution Register Lines"""
-        result = {}
+        return self._get_lines_by_contribution_register(
+            payslip_lines.mapped('slip_id').ids, payslip_lines.ids)
+
+    def _get_lines_by_contribution_register(self, payslip_ids, line_ids=None):
+        """Function for getting Contribution Register Lines of the
+        payslips, of their lines appearing on payslip or of line_ids when
+        given, with one query"""
         res = {}
-        for line in payslip_lines.filtered('register_id'):
-            result.setdefault(line.slip_id.id, {})
-            result[line.slip_id.id].setdefault(line.register_id, line)
-            result[line.slip_id.id][line.register_id] |= line
+        if not payslip_ids:
+            return res
+        lang = self.env.lang or 'en_US'
+        if line_ids is None:
+            condition = 'pl.appears_on_payslip'
+            params = (lang, tuple(payslip_ids))
+        elif not line_ids:
+            return res
+        else:
+            condition = 'pl.id IN %s'
+            params = (lang, tuple(payslip_ids), tuple(line_ids))
+        self.env.cr.execute("""
+            SELECT pl.slip_id, pl.register_id, r.name,
+                   COALESCE(pl.name->>%s, pl.name->>'en_US'), pl.code,
+                   pl.quantity, pl.amount, pl.total
+            FROM hr_payslip_line as pl
+            JOIN hr_contribution_register AS r on (pl.register_id = r.id)
+            WHERE pl.slip_id in %s AND """ + condition + """
+            ORDER BY pl.slip_id, pl.contract_id, pl.sequence, pl.id""",
+                            params)
+        result = {}
+        for slip_id, register_id, register_name, name, code, quantity, \
+                amount, total in self.env.cr.fetchall():
+            result.setdefault(slip_id, {})
+            register = result[slip_id].setdefault(register_id, {
+                'register_name': register_name,
+                'total': 0.0,
+                'lines': [],
+            })
+            register['total'] += total
+            register['lines'].append({
+                'name': name,
+                'code': code,
+                'quantity': quantity,
+                'amount': amount,
+                'total': total,
+            })
         for payslip_id, lines_dict in result.items():
             res.setdefault(payslip_id, [])
-            for register, lines in lines_dict.items():
+            for register in lines_dict.values():
                 res[payslip_id].append({
-                    'register_name': register.name,
-                    'total': sum(lines.mapped('total')),
+                    'register_name': register['register_name'],
+                    'total': register['total'],
                 })
-                for line in lines:
-                    res[payslip_id].append({
-                        'name': line.name,
-                        'code': line.code,
-                        'quantity': line.quantity,
-                        'amount': line.amount,
-                        'total': line.total,
-                    })
+                res[payslip_id] += register['lines']
         return res
 
     @api.model
@@ -120,11 +186,8 @@ class ReportHrPayrollCommunityReportPayslipDetails(models.AbstractModel):
             'doc_model': 'hr.payslip',
             'docs': payslips,
             'data': data,
-            'get_details_by_rule_category': self.get_details_by_rule_category(
-                payslips.mapped('details_by_salary_rule_category_ids').filtered(
-                    lambda r: r.appears_on_payslip)),
+            'get_details_by_rule_category':
+                self._get_details_by_rule_category(payslips.ids),
             'get_lines_by_contribution_register':
-                self.get_lines_by_contribution_register(
-                payslips.mapped('line_ids').filtered(
-                    lambda r: r.appears_on_payslip)),
+                self._get_lines_by_contribution_register(payslips.ids),
         }
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+from datetime import date, timedelta
+from unittest.mock import patch
+from odoo.tests import common
+
+
+class TestHrPayslip(common.TransactionCase):
+    def setUp(self):
+        super(TestHrPayslip, self).setUp()
+        self.rule_bonus = self.env['hr.salary.rule'].create({
+            'name': 'Bonus',
+            'code': 'TBONUS',
+            'sequence': 10,
+            'category_id': self.ref('hr_payroll_community.ALW'),
+            'condition_select': 'python',
+            'condition_python':
+                'result = inputs.TBONUS and inputs.TBONUS.amount > 0',
+            'amount_select': 'code',
+            'amount_python_compute': 'result = inputs.TBONUS.amount',
+            'input_ids': [(0, 0, {'name': 'Bonus', 'code': 'TBONUS'})],
+        })
+        self.rule_bonus_extra = self.env['hr.salary.rule'].create({
+            'name': 'Bonus Extra',
+            'code': 'TBONUSX',
+            'sequence': 11,
+            'category_id': self.ref('hr_payroll_community.ALW'),
+            'parent_rule_id': self.rule_bonus.id,
+            'amount_select': 'fix',
+            'amount_fix': 100.0,
+        })
+        self.rule_fix = self.env['hr.salary.rule'].create({
+            'name': 'Fixed Allowance',
+            'code': 'TFIX',
+            'sequence': 12,
+            'category_id': self.ref('hr_payroll_community.ALW'),
+            'amount_select': 'fix',
+            'amount_fix': 50.0,
+        })
+        self.structure = self.env['hr.payroll.structure'].create({
+            'name': 'Bonus Structure',
+            'code': 'TBS',
+            'company_id': self.ref('base.main_company'),
+            'rule_ids': [(6, 0, (self.rule_bonus | self.rule_fix).ids)],
+        })
+        self.employee = self.env['hr.employee'].create({'name': 'Jane'})
+        self.contract = self.env['hr.contract'].create({
+            'name': 'Contract for Jane',
+            'date_start': date(2024, 1, 1),
+            'wage': 5000.0,
+            'employee_id': self.employee.id,
+            'struct_id': self.structure.id,
+        })
+        self.payslip = self.env['hr.payslip'].create({
+            'employee_id': self.employee.id,
+            'contract_id': self.contract.id,
+            'struct_id': self.structure.id,
+            'date_from': date(2024, 1, 1),
+            'date_to': date(2024, 1, 31),
+            'input_line_ids': [(0, 0, {
+                'name': 'Bonus',
+                'code': 'TBONUS',
+                'contract_id': self.contract.id,
+                'amount': 0.0,
+            })],
+        })
+
+    def _get_line_codes(self):
+        """Function for getting the codes of the payslip lines"""
+        return set(self.payslip.line_ids.mapped('code'))
+
+    def _get_line(self, code):
+        """Function for getting the payslip line of a rule"""
+        return self.payslip.line_ids.filtered(lambda line: line.code == code)
+
+    def _compute_sheet(self):
+        """Function for computing the payslip, returning the codes of the
+        rules computed again"""
+        model = self.registry['hr.salary.rule']
+        with patch.object(model, '_compute_rule', autospec=True,
+                          side_effect=model._compute_rule) as compute_rule:
+            self.payslip.action_compute_sheet()
+        return {call.args[0].code for call in compute_rule.call_args_list}
+
+    def _write_later(self, records, vals):
+        """Function for writing records as in a later transaction, the
+        write_date only changes between transactions"""
+        records.write(dict(vals, write_date=max(
+            records.mapped('write_date')) + timedelta(seconds=1)))
+
+    def test_00_incremental_compute_child_rule(self):
+        """ checking the child rules follow the condition of their parent
+        between two incremental computations. """
+        self.payslip.action_compute_sheet()
+        self.assertFalse({'TBONUS', 'TBONUSX'} & self._get_line_codes())
+
+        # The condition of the parent rule is now satisfied.
+        self.payslip.input_line_ids.amount = 10.0
+        self.payslip.action_compute_sheet()
+        self.assertTrue({'TBONUS', 'TBONUSX'} <= self._get_line_codes())
+        self.assertEqual(self.payslip.line_ids.filtered(
+            lambda line: line.code == 'TBONUSX').total, 100.0)
+
+        # The condition of the parent rule is not satisfied anymore.
+        self.payslip.input_line_ids.amount = 0.0
+        self.payslip.action_compute_sheet()
+        self.assertFalse({'TBONUS', 'TBONUSX'} & self._get_line_codes())
+
+    def test_01_incremental_compute_input(self):
+        """ checking changing an input computes again only the rules
+        reading it, and updates the lines in place. """
+        self.payslip.input_line_ids.amount = 10.0
+        self.assertEqual(self._compute_sheet(), {'TBONUS', 'TBONUSX', 'TFIX'})
+        line_ids = {line.code: line.id for line in self.payslip.line_ids}
+
+        self.payslip.input_line_ids.amount = 20.0
+        self.assertEqual(self._compute_sheet(), {'TBONUS', 'TBONUSX'})
+        self.assertEqual(
+            {line.code: line.id for line in self.payslip.line_ids}, line_ids)
+        self.assertEqual(self._get_line('TBONUS').total, 20.0)
+        self.assertEqual(self._get_line('TFIX').total, 50.0)
+
+        # Nothing changed, nothing is computed again.
+        self.assertEqual(self._compute_sheet(), set())
+        self.assertEqual(
+            {line.code: line.id for line in self.payslip.line_ids}, line_ids)
+
+    def test_02_incremental_compute_records(self):
+        """ checking changing the contract, the employee or a rule
+        computes the payslip entirely. """
+        self.payslip.input_line_ids.amount = 10.0
+        self._compute_sheet()
+        all_rules = {'TBONUS', 'TBONUSX', 'TFIX'}
+
+        self._write_later(self.contract, {'wage': 6000.0})
+        self.assertEqual(self._compute_sheet(), all_rules)
+
+        self._write_later(self.employee, {'name': 'Jane Doe'})
+        self.assertEqual(self._compute_sheet(), all_rules)
+
+        self._write_later(self.rule_fix, {'amount_fix': 60.0})
+        self.assertEqual(self._compute_sheet(), all_rules)
+        self.assertEqual(self._get_line('TFIX').total, 60.0)
+
+    def test_03_incremental_compute_related_record(self):
+        """ checking the rules reading a record related to the contract
+        are always computed again. """
+        calendar = self.env['resource.calendar'].create({
+            'name': 'Calendar for Jane',
+            'hours_per_day': 8.0,
+        })
+        self.contract.resource_calendar_id = calendar
+        rule_hours = self.env['hr.salary.rule'].create({
+            'name': 'Hours per Day',
+            'code': 'THOURS',
+            'sequence': 13,
+            'category_id': self.ref('hr_payroll_community.ALW'),
+            'amount_select': 'code',
+            'amount_python_compute':
+                'result = contract.resource_calendar_id.hours_per_day',
+        })
+        self.assertIsNone(rule_hours._get_dependencies())
+        self.structure.rule_ids |= rule_hours
+        self._compute_sheet()
+        self.assertEqual(self._get_line('THOURS').total, 8.0)
+
+        # The calendar changes, not the contract.
+        calendar.hours_per_day = 7.0
+        self.assertEqual(self._compute_sheet(), {'THOURS'})
+        self.assertEqual(self._get_line('THOURS').total, 7.0)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+from datetime import date
+from odoo.exceptions import UserError
+from odoo.tests import common
+
+
+class TestHrPayslipRun(common.TransactionCase):
+    def setUp(self):
+        super(TestHrPayslipRun, self).setUp()
+        self.employees = self.env['hr.employee'].create([
+            {'name': 'Jane'}, {'name': 'Joe'}])
+        self.env['hr.contract'].create([{
+            'name': 'Contract for %s' % employee.name,
+            'date_start': date(2024, 1, 1),
+            'wage': 5000.0,
+            'employee_id': employee.id,
+            'struct_id': self.ref('hr_payroll_community.structure_base'),
+            'state': 'open',
+        } for employee in self.employees])
+        self.payslip_run = self.env['hr.payslip.run'].create({
+            'name': 'Payslip Batch',
+            'date_start': date(2024, 1, 1),
+            'date_end': date(2024, 1, 31),
+        })
+
+    def test_00_reset_failed_generation(self):
+        """ checking the generation of the payslips is reset once one of
+        its jobs failed. """
+        self.env.company.payslip_generation_chunk_size = 1
+        self.payslip_run._generate_payslips_async(self.employees)
+        self.assertEqual(self.payslip_run.generation_state, 'in_progress')
+        jobs = self.env['queue.job'].search([
+            ('graph_uuid', '=', self.payslip_run.generation_graph_uuid)])
+        self.assertEqual(len(jobs), 3)
+
+        # The generation can not be reset while its jobs are running.
+        with self.assertRaises(UserError):
+            self.payslip_run.action_reset_generation()
+
+        # One of the jobs generating the payslips fails.
+        generation_jobs = jobs.filtered(
+            lambda job: job.method_name == '_generate_batch_payslips')
+        generation_jobs[0].state = 'failed'
+        self.payslip_run.action_reset_generation()
+        self.assertFalse(self.payslip_run.generation_state)
+        self.assertEqual(generation_jobs[1].state, 'cancelled')
+        self.assertEqual(jobs.filtered(
+            lambda job: job.method_name == '_finish_payslip_generation'
+        ).state, 'cancelled')
+
+    def test_01_generate_after_reset(self):
+        """ checking the payslips are generated again only for the
+        employees without payslip once the generation is reset. """
+        self.env.company.payslip_generation_chunk_size = 1
+        self.payslip_run._generate_payslips_async(self.employees)
+        jobs = self.env['queue.job'].search([
+            ('graph_uuid', '=', self.payslip_run.generation_graph_uuid)])
+        generation_jobs = jobs.filtered(
+            lambda job: job.method_name == '_generate_batch_payslips')
+
+        # The payslip of the first employee is generated, the job of the
+        # second one fails.
+        self.employees[0]._generate_batch_payslips(self.payslip_run)
+        generation_jobs[0].state = 'done'
+        generation_jobs[1].state = 'failed'
+        self.payslip_run.action_reset_generation()
+        self.assertEqual(self.payslip_run.slip_ids.employee_id,
+                         self.employees[0])
+
+        self.payslip_run._generate_payslips_async(self.employees)
+        self.assertEqual(self.payslip_run.generation_target_count, 2)
+        jobs = self.env['queue.job'].search([
+            ('graph_uuid', '=', self.payslip_run.generation_graph_uuid),
+            ('method_name', '=', '_generate_batch_payslips')])
+        self.assertEqual(len(jobs), 1)
+
+        # Generating the payslips of all the employees creates the missing
+        # one only.
+        self.payslip_run._generate_payslips(self.employees)
+        self.assertEqual(len(self.payslip_run.slip_ids), 2)
+        self.assertEqual(self.payslip_run.slip_ids.employee_id,
+                         self.employees)
+
+        # Nothing is left to generate.
+        jobs.button_cancelled()
+        self.payslip_run.action_reset_generation()
+        self.payslip_run._generate_payslips_async(self.employees)
+        self.assertFalse(self.payslip_run.generation_state)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+from odoo.tests import common
+from odoo.tools.safe_eval import safe_eval
+
+
+class TestHrSalaryRule(common.TransactionCase):
+    def test_00_eval_expression(self):
+        """ checking the compiled rule expressions give the same results
+        as safe_eval. """
+        rule = self.env['hr.salary.rule']
+        expr = 'result = BASIC * 0.1 if GROSS > 1000 else 0.0'
+        for basic, gross in ((1000.0, 1500.0), (1000.0, 900.0)):
+            localdict = {'BASIC': basic, 'GROSS': gross}
+            safe_eval(expr, localdict, mode='exec', nocopy=True)
+            compiled_localdict = {'BASIC': basic, 'GROSS': gross}
+            rule._eval_expression(expr, compiled_localdict, mode='exec')
+            self.assertEqual(compiled_localdict['result'],
+                             localdict['result'])
+            self.assertNotIn('__builtins__', compiled_localdict)
+        self.assertEqual(rule._eval_expression('BASIC * 2', {'BASIC': 3.0}),
+                         safe_eval('BASIC * 2', {'BASIC': 3.0}))
+
+    def test_01_eval_expression_restricted(self):
+        """ checking the compiled rule expressions keep the restrictions
+        of safe_eval. """
+        rule = self.env['hr.salary.rule']
+        with self.assertRaises(ValueError):
+            rule._eval_expression('import os', {}, mode='exec')
+        with self.assertRaises(NameError):
+            rule._eval_expression('open("/etc/passwd")', {})
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2024-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+import csv
+import io
+from datetime import date
+from odoo.tests import common
+
+
+class TestPayslipDetailsReport(common.TransactionCase):
+    def setUp(self):
+        super(TestPayslipDetailsReport, self).setUp()
+        category_root = self.env['hr.salary.rule.category'].create({
+            'name': 'Test Root', 'code': 'TROOT'})
+        category_child = self.env['hr.salary.rule.category'].create({
+            'name': 'Test Child', 'code': 'TCHILD',
+            'parent_id': category_root.id})
+        self.register = self.env['hr.contribution.register'].create({
+            'name': 'Test Register'})
+        rules = self.env['hr.salary.rule'].create([{
+            'name': 'Rule %s' % code,
+            'code': code,
+            'sequence': sequence,
+            'category_id': category.id,
+            'amount_select': 'fix',
+            'amount_fix': amount,
+            'register_id': register.id,
+            'appears_on_payslip': appears_on_payslip,
+        } for code, sequence, category, amount, register, appears_on_payslip
+            in (
+            ('TR1', 20, category_child, 100.0, self.register, True),
+            ('TR2', 21, category_root, 50.0, self.env[
+                'hr.contribution.register'], True),
+            ('TR3', 22, category_child, 30.0, self.register, True),
+            ('TR4', 23, category_child, 7.0, self.register, False),
+        )])
+        structure = self.env['hr.payroll.structure'].create({
+            'name': 'Report Structure',
+            'code': 'TRS',
+            'company_id': self.ref('base.main_company'),
+            'rule_ids': [(6, 0, rules.ids)],
+        })
+        employee = self.env['hr.employee'].create({'name': 'Jane'})
+        contract = self.env['hr.contract'].create({
+            'name': 'Contract for Jane',
+            'date_start': date(2024, 1, 1),
+            'wage': 5000.0,
+            'employee_id': employee.id,
+            'struct_id': structure.id,
+        })
+        self.payslip_run = self.env['hr.payslip.run'].create({
+            'name': 'Payslip Batch',
+            'date_start': date(2024, 1, 1),
+            'date_end': date(2024, 1, 31),
+        })
+        self.payslip = self.env['hr.payslip'].create({
+            'employee_id': employee.id,
+            'contract_id': contract.id,
+            'struct_id': structure.id,
+            'date_from': date(2024, 1, 1),
+            'date_to': date(2024, 1, 31),
+            'payslip_run_id': self.payslip_run.id,
+        })
+        self.payslip.action_payslip_done()
+
+    def test_00_details_by_rule_category(self):
+        """ checking the details by salary rule category, as computed
+        before with the ORM: the parent categories from the root, with
+        the total of the lines of the category, then its lines. """
+        report = self.env['report.hr_payroll_community.report_payslipdetails']
+        details = report._get_details_by_rule_category(self.payslip.ids)
+        self.assertEqual(
+            [(detail['code'], detail['level'], detail['total'])
+             for detail in details[self.payslip.id]],
+            [('TROOT', 0, 130.0), ('TCHILD', 1, 130.0), ('TR1', 2, 100.0),
+             ('TR3', 2, 30.0), ('TROOT', 0, 50.0), ('TR2', 1, 50.0)])
+        self.assertEqual(details[self.payslip.id][0]['rule_category'],
+                         'Test Root')
+        self.assertEqual(details[self.payslip.id][2]['name'], 'Rule TR1')
+        # the lines given are used instead of the lines on payslip
+        lines = self.payslip.line_ids.filtered(
+            lambda line: line.code in ('TR2', 'TR4'))
+        self.assertEqual(
+            [(detail['code'], detail['level'], detail['total'])
+             for detail in report.get_details_by_rule_category(
+                lines)[self.payslip.id]],
+            [('TROOT', 0, 50.0), ('TR2', 1, 50.0), ('TROOT', 0, 7.0),
+             ('TCHILD', 1, 7.0), ('TR4', 2, 7.0)])
+
+    def test_01_lines_by_contribution_register(self):
+        """ checking the lines by contribution register, with the total of
+        the register first. """
+        report = self.env['report.hr_payroll_community.report_payslipdetails']
+        registers = report._get_lines_by_contribution_register(
+            self.payslip.ids)
+        self.assertEqual(registers[self.payslip.id], [
+            {'register_name': 'Test Register', 'total': 130.0},
+            {'name': 'Rule TR1', 'code': 'TR1', 'quantity': 1.0,
+             'amount': 100.0, 'total': 100.0},
+            {'name': 'Rule TR3', 'code': 'TR3', 'quantity': 1.0,
+             'amount': 30.0, 'total': 30.0},
+        ])
+        report = self.env[
+            'report.hr_payroll_community.report_contributionregister']
+        lines = report._get_payslip_lines(
+            self.register.ids, date(2024, 1, 1), date(2024, 1, 31))
+        self.assertEqual(lines[self.register.id].mapped('code'),
+                         ['TR1', 'TR3', 'TR4'])
+        self.assertEqual(report._get_payslip_lines_total(
+            self.register.ids, date(2024, 1, 1), date(2024, 1, 31)),
+            {self.register.id: 137.0})
+
+    def test_02_export_details(self):
+        """ checking the export of the details of a payslip batch. """
+        fileobj = io.BytesIO()
+        self.payslip_run._write_export_details(fileobj, 'csv')
+        rows = list(csv.reader(io.StringIO(
+            fileobj.getvalue().decode('utf-8'))))
+        number = self.payslip.number
+        self.assertEqual(rows, [
+            ['Reference', 'Employee', 'Code', 'Salary Rule Category',
+             'Level', 'Total'],
+            [number, 'Jane', 'TROOT', 'Test Root', '0', '130.0'],
+            [number, 'Jane', 'TCHILD', 'Test Child', '1', '130.0'],
+            [number, 'Jane', 'TR1', 'Rule TR1', '2', '100.0'],
+            [number, 'Jane', 'TR3', 'Rule TR3', '2', '30.0'],
+            [number, 'Jane', 'TROOT', 'Test Root', '0', '50.0'],
+            [number, 'Jane', 'TR2', 'Rule TR2', '1', '50.0'],
+        ])
@@ -17,7 +17,8 @@ from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
 
 from ..delay import chain, group
 from ..exception import FailedJobError, RetryableJobError
-from ..job import ENQUEUED, Job
+from ..job import ENQUEUED, PENDING, Job
+from ..relay import relay_job_notifications
 
 _logger = logging.getLogger(__name__)
 
@@ -83,7 +84,59 @@ class RunJobController(http.Controller):
     def runjob(self, db, job_uuid, **kw):
         http.request.session.db = db
         env = http.request.env(user=SUPERUSER_ID)
+        self._runjob(env, job_uuid)
+        return ""
+
+    @http.route(
+        "/queue_job/runjobs",
+        type="http",
+        auth="none",
+        methods=["POST"],
+        csrf=False,
+        save_session=False,
+        readonly=False,
+    )
+    def runjobs(self, db, job_uuids, time_budget=None, **kw):
+        """Run several enqueued jobs sequentially in the same request.
+
+        ``job_uuids`` is a comma separated list of uuids. Each job is
+        committed on its own, and a failing job does not prevent the next
+        ones to run. When ``time_budget`` (in seconds) is exhausted, the
+        jobs that have not been started yet are set back to pending so the
+        job runner dispatches them again.
+        """
+        http.request.session.db = db
+        env = http.request.env(user=SUPERUSER_ID)
+        job_uuids = [job_uuid for job_uuid in job_uuids.split(",") if job_uuid]
+        deadline = None
+        if time_budget:
+            deadline = time.monotonic() + float(time_budget)
+        for index, job_uuid in enumerate(job_uuids):
+            if deadline and time.monotonic() > deadline:
+                self._requeue_jobs(env, job_uuids[index:])
+                break
+            try:
+                self._runjob(env, job_uuid)
+            except Exception:
+                # the failure has already been stored on the job
+                env.cr.rollback()
+                env.clear()
+        return ""
+
+    def _requeue_jobs(self, env, job_uuids):
+        env.cr.execute(
+            "UPDATE queue_job SET state=%s, "
+            "date_enqueued=NULL, date_started=NULL "
+            "WHERE uuid IN %s AND state=%s",
+            (PENDING, tuple(job_uuids), ENQUEUED),
+        )
+        relay_job_notifications(env.cr, job_uuids)
+        env.cr.commit()
+        _logger.info(
+            "time budget exhausted, %d jobs set back to %s", len(job_uuids), PENDING
+        )
 
+    def _runjob(self, env, job_uuid):
         def retry_postpone(job, message, seconds=None):
             job.env.clear()
             with Registry(job.env.cr.dbname).cursor() as new_cr:
@@ -104,7 +157,7 @@ class RunJobController(http.Controller):
                 job_uuid,
                 ENQUEUED,
             )
-            return ""
+            return
 
         job = Job.load(env, job_uuid)
         assert job and job.state == ENQUEUED
@@ -129,7 +182,7 @@ class RunJobController(http.Controller):
             # traceback in the logs we should have the traceback when all
             # retries are exhausted
             env.cr.rollback()
-            return ""
+            return
 
         except (FailedJobError, Exception) as orig_exception:
             buff = StringIO()
@@ -149,8 +202,6 @@ class RunJobController(http.Controller):
         self._enqueue_dependent_jobs(env, job)
         _logger.debug("%s enqueue depends done", job)
 
-        return ""
-
     def _get_failure_values(self, job, traceback_txt, orig_exception):
         """Collect relevant data from exception."""
         exception_name = orig_exception.__class__.__name__
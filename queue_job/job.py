@@ -484,12 +484,16 @@ class Job:
             WHERE
             queue_job.id = jobs.id
             AND %s = ALL(jobs.parent_states)
-            AND state = %s;
+            AND state = %s
+            RETURNING queue_job.uuid;
         """
 
     def enqueue_waiting(self):
         sql = self._get_common_dependent_jobs_query()
         self.env.cr.execute(sql, (PENDING, self.uuid, DONE, WAIT_DEPENDENCIES))
+        self.env["queue.job"]._relay_job_notifications(
+            [uuid for (uuid,) in self.env.cr.fetchall()]
+        )
         self.env["queue.job"].invalidate_model(["state"])
 
     def cancel_dependent_jobs(self):
@@ -2,9 +2,10 @@
 # Copyright 2015-2016 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 import logging
-from collections import namedtuple
+import sys
+import time
+from collections import Counter, deque, namedtuple
 from functools import total_ordering
-from heapq import heappop, heappush
 from weakref import WeakValueDictionary
 
 from ..exception import ChannelNotFound
@@ -12,6 +13,8 @@ from ..job import CANCELLED, DONE, ENQUEUED, FAILED, PENDING, STARTED, WAIT_DEPE
 
 NOT_DONE = (WAIT_DEPENDENCIES, PENDING, ENQUEUED, STARTED, FAILED)
 JobSortingKey = namedtuple("SortingKey", "eta priority date_created seq")
+DEFAULT_BATCH_TIME_BUDGET = 10  # seconds
+WAIT_TIME_SAMPLES = 1000  # number of recent wait times kept by channel
 
 _logger = logging.getLogger(__name__)
 
@@ -22,6 +25,10 @@ class PriorityQueue:
     Adding an object already in the queue is a no op.
     Popping an empty queue returns None.
 
+    It is a binary heap which keeps track of the position of every object,
+    so removing an object is done in O(log n) and removed objects do not
+    linger in the heap.
+
     >>> q = PriorityQueue()
     >>> q.add(2)
     >>> q.add(3)
@@ -46,62 +53,156 @@ class PriorityQueue:
     >>> q.add(2)
     >>> q.pop()
     2
+
+    Removing objects from the middle of the heap keeps it ordered.
+
+    >>> q = PriorityQueue()
+    >>> for i in (5, 9, 1, 7, 3, 8, 2, 6, 4):
+    ...     q.add(i)
+    >>> q.remove(7)
+    >>> q.remove(1)
+    >>> q.remove(10)
+    >>> 7 in q, 8 in q, len(q._heap)
+    (False, True, 7)
+    >>> [q.pop() for i in range(8)]
+    [2, 3, 4, 5, 6, 8, 9, None]
     """
 
     def __init__(self):
         self._heap = []
-        self._known = set()  # all objects in the heap (including removed)
-        self._removed = set()  # all objects that have been removed
+        self._index = {}  # position of each object in the heap
 
     def __len__(self):
-        return len(self._known) - len(self._removed)
+        return len(self._heap)
 
     def __getitem__(self, i):
-        if i != 0:
+        if i != 0 or not self._heap:
             raise IndexError()
-        while True:
-            if not self._heap:
-                raise IndexError()
-            o = self._heap[0]
-            if o in self._removed:
-                o2 = heappop(self._heap)
-                assert o2 == o
-                self._removed.remove(o)
-                self._known.remove(o)
-            else:
-                return o
+        return self._heap[0]
 
     def __contains__(self, o):
-        return o in self._known and o not in self._removed
+        return o in self._index
 
     def add(self, o):
         if o is None:
             raise ValueError()
-        self._removed.discard(o)
-        if o in self._known:
+        if o in self._index:
             return
-        self._known.add(o)
-        heappush(self._heap, o)
+        self._heap.append(o)
+        self._sift_up(len(self._heap) - 1)
 
     def remove(self, o):
         if o is None:
             raise ValueError()
-        if o not in self._known:
+        pos = self._index.pop(o, None)
+        if pos is None:
             return
-        self._removed.add(o)
+        last = self._heap.pop()
+        if pos < len(self._heap):
+            # move the last object in the hole and restore the heap order
+            self._heap[pos] = last
+            if pos and last < self._heap[(pos - 1) >> 1]:
+                self._sift_up(pos)
+            else:
+                self._sift_down(pos)
 
     def pop(self):
-        while True:
-            try:
-                o = heappop(self._heap)
-            except IndexError:
-                # queue is empty
-                return None
-            self._known.remove(o)
-            if o in self._removed:
-                self._removed.remove(o)
-            else:
-                return o
+        if not self._heap:
+            # queue is empty
+            return None
+        o = self._heap[0]
+        self.remove(o)
+        return o
+
+    def _sift_up(self, pos):
+        heap, index = self._heap, self._index
+        o = heap[pos]
+        while pos:
+            parent_pos = (pos - 1) >> 1
+            parent = heap[parent_pos]
+            if not o < parent:
+                break
+            heap[pos] = parent
+            index[parent] = pos
+            pos = parent_pos
+        heap[pos] = o
+        index[o] = pos
+
+    def _sift_down(self, pos):
+        heap, index = self._heap, self._index
+        size = len(heap)
+        o = heap[pos]
+        child_pos = 2 * pos + 1
+        while child_pos < size:
+            right_pos = child_pos + 1
+            if right_pos < size and heap[right_pos] < heap[child_pos]:
+                child_pos = right_pos
+            child = heap[child_pos]
+            if not child < o:
+                break
+            heap[pos] = child
+            index[child] = pos
+            pos = child_pos
+            child_pos = 2 * pos + 1
+        heap[pos] = o
+        index[o] = pos
+
+
+def _uncount(counter, key):
+    counter[key] -= 1
+    if not counter[key]:
+        del counter[key]
+
+
+class JobSet(set):
+    """A set of jobs which keeps count of its jobs by database, and of the
+    capacity slots they use: the jobs of a batch use a single slot.
+
+    >>> s = JobSet()
+    >>> j1 = ChannelJob('db1', None, 1,
+    ...                 seq=0, date_created=1, priority=9, eta=None)
+    >>> j2 = ChannelJob('db2', None, 2,
+    ...                 seq=0, date_created=2, priority=9, eta=None)
+    >>> s.add(j1)
+    >>> s.add(j1)
+    >>> s.add(j2)
+    >>> dict(s.count_by_db)
+    {'db1': 1, 'db2': 1}
+    >>> s.discard(j1)
+    >>> s.discard(j1)
+    >>> len(s), dict(s.count_by_db)
+    (1, {'db2': 1})
+    >>> j3 = ChannelJob('db2', None, 3,
+    ...                 seq=0, date_created=3, priority=9, eta=None)
+    >>> j4 = ChannelJob('db2', None, 4,
+    ...                 seq=0, date_created=4, priority=9, eta=None)
+    >>> j3.batch = j4.batch = (j3, j4)
+    >>> s.add(j3)
+    >>> s.add(j4)
+    >>> len(s), s.slot_count
+    (3, 2)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.count_by_db = Counter()
+        self.count_by_slot = Counter()
+
+    @property
+    def slot_count(self):
+        return len(self.count_by_slot)
+
+    def add(self, job):
+        if job not in self:
+            super().add(job)
+            self.count_by_db[job.db_name] += 1
+            self.count_by_slot[job.slot] += 1
+
+    def discard(self, job):
+        if job in self:
+            super().discard(job)
+            _uncount(self.count_by_db, job.db_name)
+            _uncount(self.count_by_slot, job.slot)
 
 
 @total_ordering
@@ -179,13 +280,27 @@ class ChannelJob:
 
     """
 
-    __slots__ = ("db_name", "channel", "uuid", "_sorting_key", "__weakref__")
+    __slots__ = (
+        "db_name",
+        "channel",
+        "uuid",
+        "_sorting_key",
+        "queued_at",
+        "batch",
+        "__weakref__",
+    )
 
     def __init__(self, db_name, channel, uuid, seq, date_created, priority, eta):
-        self.db_name = db_name
+        # the same few database names are shared by all the jobs
+        self.db_name = sys.intern(db_name) if db_name else db_name
         self.channel = channel
         self.uuid = uuid
         self._sorting_key = JobSortingKey(eta, priority, date_created, seq)
+        # time when the job has been queued as pending in its channel
+        self.queued_at = None
+        # jobs sent to Odoo in the same request as this one, set when the
+        # job is marked running in its channel
+        self.batch = None
 
     def __repr__(self):
         return f"<ChannelJob {self.uuid}>"
@@ -196,6 +311,12 @@ class ChannelJob:
     def __hash__(self):
         return id(self)
 
+    @property
+    def slot(self):
+        """The job using the capacity slot of this job: the first job of
+        its batch."""
+        return self.batch[0] if self.batch else self
+
     def set_no_eta(self):
         self._sorting_key = JobSortingKey(None, *self._sorting_key[1:])
 
@@ -315,6 +436,7 @@ class ChannelQueue:
         self._queue = PriorityQueue()
         self._eta_queue = PriorityQueue()
         self.sequential = sequential
+        self.count_by_db = Counter()
 
     def __len__(self):
         return len(self._eta_queue) + len(self._queue)
@@ -323,14 +445,20 @@ class ChannelQueue:
         return o in self._eta_queue or o in self._queue
 
     def add(self, job):
+        if job in self:
+            return
         if job.eta:
             self._eta_queue.add(job)
         else:
             self._queue.add(job)
+        self.count_by_db[job.db_name] += 1
 
     def remove(self, job):
+        if job not in self:
+            return
         self._eta_queue.remove(job)
         self._queue.remove(job)
+        _uncount(self.count_by_db, job.db_name)
 
     def pop(self, now):
         while self._eta_queue and self._eta_queue[0].eta <= now:
@@ -346,7 +474,10 @@ class ChannelQueue:
                 # than the job without eta; since it's a sequential
                 # queue we wait until eta
                 return None
-        return self._queue.pop()
+        job = self._queue.pop()
+        if job:
+            _uncount(self.count_by_db, job.db_name)
+        return job
 
     def get_wakeup_time(self, wakeup_time=0):
         if self._eta_queue:
@@ -404,19 +535,35 @@ class Channel:
     without risking to overflow the system.
     """
 
-    def __init__(self, name, parent, capacity=None, sequential=False, throttle=0):
+    def __init__(
+        self,
+        name,
+        parent,
+        capacity=None,
+        sequential=False,
+        throttle=0,
+        batch_size=1,
+        batch_time_budget=DEFAULT_BATCH_TIME_BUDGET,
+    ):
         self.name = name
         self.parent = parent
         if self.parent:
             self.parent.children[name] = self
         self.children = {}
         self._queue = ChannelQueue()
-        self._running = set()
-        self._failed = set()
+        self._running = JobSet()
+        self._failed = JobSet()
+        # statistics of the jobs dispatched from this channel
+        self.dispatched = 0
+        self.wait_times = deque(maxlen=WAIT_TIME_SAMPLES)
+        self.wait_time_sum = 0.0
+        self.wait_time_count = 0
         self._pause_until = 0  # utc seconds since the epoch
         self.capacity = capacity
         self.throttle = throttle  # seconds
         self.sequential = sequential
+        self.batch_size = batch_size
+        self.batch_time_budget = batch_time_budget  # seconds
 
     @property
     def sequential(self):
@@ -434,13 +581,39 @@ class Channel:
         * capacity
         * sequential
         * throttle
+        * batch_size: number of jobs sent to Odoo in the same request,
+          the jobs of a batch use a single slot of the capacity of the
+          channel and of its parent channels
+        * batch_time_budget: seconds after which a batch stops starting jobs
+
+        >>> c = Channel('sub', None)
+        >>> c.configure({'name': 'sub', 'capacity': 4, 'batch_size': '20'})
+        >>> c.batch_size, c.batch_time_budget
+        (20, 10)
+        >>> c.configure({'name': 'sub', 'capacity': 4, 'batch_size': '0'})
+        Traceback (most recent call last):
+         ...
+        ValueError: The batch size of a channel must be at least 1
+        >>> c.configure({'name': 'sub', 'capacity': 4, 'batch_size': '20',
+        ...              'batch_time_budget': '0'})
+        Traceback (most recent call last):
+         ...
+        ValueError: The batch time budget of a channel must be positive
         """
         assert self.fullname.endswith(config["name"])
         self.capacity = config.get("capacity", None)
         self.sequential = bool(config.get("sequential", False))
         self.throttle = int(config.get("throttle", 0))
+        self.batch_size = int(config.get("batch_size", 1))
+        self.batch_time_budget = int(
+            config.get("batch_time_budget", DEFAULT_BATCH_TIME_BUDGET)
+        )
         if self.sequential and self.capacity != 1:
             raise ValueError("A sequential channel must have a capacity of 1")
+        if self.batch_size < 1:
+            raise ValueError("The batch size of a channel must be at least 1")
+        if self.batch_time_budget <= 0:
+            raise ValueError("The batch time budget of a channel must be positive")
 
     @property
     def fullname(self):
@@ -486,6 +659,7 @@ class Channel:
         from parent channels queues.
         """
         if job not in self._queue:
+            job.queued_at = time.time()
             self._queue.add(job)
             self._running.discard(job)
             self._failed.discard(job)
@@ -516,6 +690,18 @@ class Channel:
                 self.parent.remove(job)
             _logger.debug("job %s marked failed in channel %s", job.uuid, self)
 
+    def record_dispatch(self, job, now):
+        """Record the dispatch of one of the jobs of the channel.
+
+        ``now`` is the current time in seconds since the epoch.
+        """
+        self.dispatched += 1
+        if job.queued_at:
+            wait_time = max(now - job.queued_at, 0.0)
+            self.wait_times.append(wait_time)
+            self.wait_time_sum += wait_time
+            self.wait_time_count += 1
+
     def has_capacity(self):
         if self.sequential and self._failed:
             # a sequential queue blocks on failed jobs
@@ -523,14 +709,30 @@ class Channel:
         if not self.capacity:
             # unlimited capacity
             return True
-        return len(self._running) < self.capacity
+        return self._running.slot_count < self.capacity
+
+    def _pop_batch(self, job, now):
+        """Pop the jobs of the channel queue sent to Odoo in the same
+        request as ``job``, up to ``batch_size`` jobs of its database."""
+        jobs = [job]
+        while len(jobs) < self.batch_size:
+            next_job = self._queue.pop(now)
+            if not next_job:
+                break
+            if next_job.db_name != job.db_name or next_job.channel is not self:
+                self._queue.add(next_job)
+                break
+            jobs.append(next_job)
+        return tuple(jobs)
 
     def get_jobs_to_run(self, now):
         """Get jobs that are ready to run in channel.
 
         This works by enqueuing jobs that are ready to run in children
         channels, then yielding jobs from the channel queue until
-        ``capacity`` jobs are marked running in the channel.
+        ``capacity`` jobs are marked running in the channel. In channels
+        with a ``batch_size``, each slot of the capacity runs a batch of
+        jobs, which then uses a single slot in the parent channels too.
 
         If the ``throttle`` option is set on the channel, then it yields
         no job until at least throttle seconds have elapsed since the previous
@@ -566,9 +768,22 @@ class Channel:
             job = self._queue.pop(now)
             if not job:
                 return
-            self._running.add(job)
-            _logger.debug("job %s marked running in channel %s", job.uuid, self)
-            yield job
+            if job.channel is self:
+                job.batch = None
+                if self.batch_size > 1:
+                    batch = self._pop_batch(job, now)
+                    for batch_job in batch:
+                        batch_job.batch = batch
+            elif job.batch:
+                # the other jobs of the batch wait in the queue too
+                for batch_job in job.batch:
+                    self._queue.remove(batch_job)
+            for batch_job in job.batch or (job,):
+                self._running.add(batch_job)
+                _logger.debug(
+                    "job %s marked running in channel %s", batch_job.uuid, self
+                )
+                yield batch_job
             if self.throttle:
                 self._pause_until = now + self.throttle
                 _logger.debug("pausing channel %s until %s", self, self._pause_until)
@@ -799,6 +1014,43 @@ class ChannelManager:
     >>> cm.notify(db, 'S', 'S3', 3, 0, 10, None, 'done')
     >>> pp(list(cm.get_jobs_to_run(now=105)))
     []
+
+    Test batches: the jobs of a batch use a single slot of the capacity
+    of their channel and of the parent channels.
+
+    >>> cm = ChannelManager()
+    >>> cm.simple_configure('root:2,B:2:batch_size=3')
+    >>> for i in range(8):
+    ...     cm.notify(db, 'B', f'B{i}', i, 0, 10, None, 'pending')
+    >>> cm.notify(db, 'root', 'R1', 9, 0, 10, None, 'pending')
+    >>> jobs = list(cm.get_jobs_to_run(now=100))
+    >>> pp(jobs)
+    [<ChannelJob B0>,
+     <ChannelJob B1>,
+     <ChannelJob B2>,
+     <ChannelJob B3>,
+     <ChannelJob B4>,
+     <ChannelJob B5>]
+    >>> [len(job.batch) for job in jobs]
+    [3, 3, 3, 3, 3, 3]
+
+    The slot of a batch is released once all its jobs are done.
+
+    >>> cm.notify(db, 'B', 'B0', 0, 0, 10, None, 'done')
+    >>> cm.notify(db, 'B', 'B1', 1, 0, 10, None, 'done')
+    >>> pp(list(cm.get_jobs_to_run(now=101)))
+    []
+    >>> cm.notify(db, 'B', 'B2', 2, 0, 10, None, 'done')
+    >>> jobs = list(cm.get_jobs_to_run(now=102))
+    >>> pp(jobs)
+    [<ChannelJob B6>, <ChannelJob B7>]
+    >>> [len(job.batch) for job in jobs]
+    [2, 2]
+    >>> cm.notify(db, 'B', 'B3', 3, 0, 10, None, 'done')
+    >>> cm.notify(db, 'B', 'B4', 4, 0, 10, None, 'done')
+    >>> cm.notify(db, 'B', 'B5', 5, 0, 10, None, 'done')
+    >>> pp(list(cm.get_jobs_to_run(now=103)))
+    [<ChannelJob R1>]
     """
 
     def __init__(self):
@@ -1075,8 +1327,45 @@ class ChannelManager:
                 job.channel.remove(job)
                 del self._jobs_by_uuid[job.uuid]
 
+    def get_active_job_uuids(self, db_name):
+        """Return the uuids of the jobs of a database which are not
+        waiting in the queue of their channel (running or failed).
+
+        >>> cm = ChannelManager()
+        >>> cm.simple_configure('root:1')
+        >>> cm.notify('db', 'root', 'J1', 1, 0, 10, None, 'pending')
+        >>> cm.notify('db', 'root', 'J2', 2, 0, 10, None, 'started')
+        >>> cm.notify('db', 'root', 'J3', 3, 0, 10, None, 'failed')
+        >>> cm.notify('db2', 'root', 'J4', 4, 0, 10, None, 'started')
+        >>> sorted(cm.get_active_job_uuids('db'))
+        ['J2', 'J3']
+        """
+        return {
+            job.uuid
+            for job in self._jobs_by_uuid.values()
+            if job.db_name == db_name and job not in job.channel._queue
+        }
+
+    def get_channels(self):
+        """Return all the channels, parents before their children.
+
+        It only relies on atomic copies of the channel structures, so it
+        can be called from another thread than the runner's one.
+        """
+        channels = []
+        to_visit = [self._root_channel]
+        while to_visit:
+            channel = to_visit.pop(0)
+            channels.append(channel)
+            to_visit += sorted(
+                list(channel.children.values()), key=lambda c: c.name
+            )
+        return channels
+
     def get_jobs_to_run(self, now):
-        return self._root_channel.get_jobs_to_run(now)
+        for job in self._root_channel.get_jobs_to_run(now):
+            job.channel.record_dispatch(job, time.time())
+            yield job
 
     def get_wakeup_time(self):
         return self._root_channel.get_wakeup_time()
@@ -0,0 +1,285 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Metrics of the job runner, in the Prometheus text format.
+
+The metrics are served by the runner process itself, on
+``http://<metrics_interface>:<metrics_port>/metrics``, when the
+``ODOO_QUEUE_JOB_METRICS_PORT`` environment variable or the ``metrics_port``
+option of the ``[queue_job]`` section is set. They are computed from the
+in-memory state of the channels and of the dispatcher, without any database
+query.
+"""
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _escape(value):
+    """Escape a label value.
+
+    >>> print(_escape('a "b"\\\\c'))
+    a \\"b\\"\\\\c
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    """Format labels.
+
+    >>> _labels(channel="root.sub", db="prod")
+    '{channel="root.sub",db="prod"}'
+    >>> _labels()
+    ''
+    """
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def _quantile(sorted_values, q):
+    """Return the q-quantile of sorted values (nearest rank).
+
+    >>> _quantile([1, 2, 3, 4], 0.5)
+    2
+    >>> _quantile([1, 2, 3, 4], 0.99)
+    4
+    >>> _quantile([], 0.5)
+    """
+    if not sorted_values:
+        return None
+    rank = max(int(round(q * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class _MetricsWriter:
+    """Collect samples, grouped by metric family"""
+
+    def __init__(self):
+        self._families = {}
+
+    def add(self, name, metric_type, doc, labels, value, suffix=""):
+        if value is None:
+            return
+        __, __, samples = self._families.setdefault(name, (metric_type, doc, []))
+        samples.append(f"{name}{suffix}{_labels(**labels)} {value}")
+
+    def text(self):
+        lines = []
+        for name, (metric_type, doc, samples) in self._families.items():
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines += samples
+        return "\n".join(lines) + "\n"
+
+
+def format_metrics(channel_manager, dispatch_stats=None, db_names=()):
+    """Return the metrics of the runner in the Prometheus text format.
+
+    >>> from .channels import ChannelManager
+    >>> cm = ChannelManager()
+    >>> cm.simple_configure('root:2,A:1')
+    >>> cm.notify('db', 'A', 'A1', 1, 0, 10, None, 'pending')
+    >>> cm.notify('db', 'A', 'A2', 2, 0, 10, None, 'pending')
+    >>> jobs = list(cm.get_jobs_to_run(now=100))
+    >>> print(format_metrics(cm, db_names=['db']))  # doctest: +ELLIPSIS
+    # HELP queue_job_runner_databases Databases served by the job runner.
+    # TYPE queue_job_runner_databases gauge
+    queue_job_runner_databases 1
+    # HELP queue_job_channel_capacity Capacity of the channel, absent when unlimited.
+    # TYPE queue_job_channel_capacity gauge
+    queue_job_channel_capacity{channel="root"} 2
+    queue_job_channel_capacity{channel="root.A"} 1
+    # HELP queue_job_channel_utilization Ratio of the capacity of the channel in use.
+    # TYPE queue_job_channel_utilization gauge
+    queue_job_channel_utilization{channel="root"} 0.5
+    queue_job_channel_utilization{channel="root.A"} 1.0
+    # HELP queue_job_channel_jobs Jobs of the channel by database and state.
+    # TYPE queue_job_channel_jobs gauge
+    queue_job_channel_jobs{channel="root",db="db",state="running"} 1
+    queue_job_channel_jobs{channel="root.A",db="db",state="queued"} 1
+    queue_job_channel_jobs{channel="root.A",db="db",state="running"} 1
+    # HELP queue_job_channel_dispatched_total Jobs dispatched from the channel.
+    # TYPE queue_job_channel_dispatched_total counter
+    queue_job_channel_dispatched_total{channel="root.A"} 1
+    # HELP queue_job_channel_wait_seconds Time spent by jobs in the channel queue.
+    # TYPE queue_job_channel_wait_seconds summary
+    queue_job_channel_wait_seconds{channel="root.A",quantile="0.5"} ...
+    queue_job_channel_wait_seconds{channel="root.A",quantile="0.9"} ...
+    queue_job_channel_wait_seconds{channel="root.A",quantile="0.99"} ...
+    queue_job_channel_wait_seconds_sum{channel="root.A"} ...
+    queue_job_channel_wait_seconds_count{channel="root.A"} 1
+    <BLANKLINE>
+    """
+    writer = _MetricsWriter()
+    writer.add(
+        "queue_job_runner_databases",
+        "gauge",
+        "Databases served by the job runner.",
+        {},
+        len(db_names),
+    )
+    for channel in channel_manager.get_channels():
+        name = channel.fullname
+        running = channel._running.slot_count
+        if channel.capacity:
+            writer.add(
+                "queue_job_channel_capacity",
+                "gauge",
+                "Capacity of the channel, absent when unlimited.",
+                {"channel": name},
+                channel.capacity,
+            )
+            writer.add(
+                "queue_job_channel_utilization",
+                "gauge",
+                "Ratio of the capacity of the channel in use.",
+                {"channel": name},
+                running / channel.capacity,
+            )
+        for state, counts in (
+            ("queued", channel._queue.count_by_db),
+            ("running", channel._running.count_by_db),
+            ("failed", channel._failed.count_by_db),
+        ):
+            # dict() is an atomic copy, the runner thread may update
+            # the counts meanwhile
+            for db_name, count in sorted(dict(counts).items()):
+                writer.add(
+                    "queue_job_channel_jobs",
+                    "gauge",
+                    "Jobs of the channel by database and state.",
+                    {"channel": name, "db": db_name, "state": state},
+                    count,
+                )
+        if not channel.dispatched:
+            continue
+        writer.add(
+            "queue_job_channel_dispatched_total",
+            "counter",
+            "Jobs dispatched from the channel.",
+            {"channel": name},
+            channel.dispatched,
+        )
+        wait_times = sorted(list(channel.wait_times))
+        wait_doc = "Time spent by jobs in the channel queue."
+        for q in QUANTILES:
+            writer.add(
+                "queue_job_channel_wait_seconds",
+                "summary",
+                wait_doc,
+                {"channel": name, "quantile": q},
+                _quantile(wait_times, q),
+            )
+        writer.add(
+            "queue_job_channel_wait_seconds",
+            "summary",
+            wait_doc,
+            {"channel": name},
+            channel.wait_time_sum,
+            suffix="_sum",
+        )
+        writer.add(
+            "queue_job_channel_wait_seconds",
+            "summary",
+            wait_doc,
+            {"channel": name},
+            channel.wait_time_count,
+            suffix="_count",
+        )
+    if dispatch_stats is not None:
+        writer.add(
+            "queue_job_dispatch_in_flight",
+            "gauge",
+            "Requests sent to Odoo and not answered yet.",
+            {},
+            dispatch_stats.in_flight,
+        )
+        for (db_name, channel_name), values in sorted(
+            dispatch_stats.by_key().items(), key=lambda item: str(item[0])
+        ):
+            labels = {"db": db_name, "channel": channel_name or ""}
+            writer.add(
+                "queue_job_dispatch_requests_total",
+                "counter",
+                "Requests sent to Odoo to run jobs.",
+                labels,
+                values["count"],
+            )
+            writer.add(
+                "queue_job_dispatch_timeouts_total",
+                "counter",
+                "Requests to run jobs which timed out.",
+                labels,
+                values["timeouts"],
+            )
+            writer.add(
+                "queue_job_dispatch_errors_total",
+                "counter",
+                "Requests to run jobs which failed.",
+                labels,
+                values["errors"],
+            )
+            writer.add(
+                "queue_job_dispatch_latency_seconds_total",
+                "counter",
+                "Total time spent dispatching requests to run jobs.",
+                labels,
+                values["latency"],
+            )
+    return writer.text()
+
+
+class MetricsServer:
+    """Serve the metrics on ``/metrics`` from a background thread.
+
+    ``render`` is a callable returning the metrics as text.
+    """
+
+    def __init__(self, interface, port, render):
+        self.interface = interface
+        self.port = port
+        self.render = render
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        render = self.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render().encode()
+                except Exception:
+                    _logger.exception("error rendering the job runner metrics")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                _logger.debug("metrics: " + format, *args)
+
+        self._server = ThreadingHTTPServer((self.interface, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="queue_job_metrics", daemon=True
+        )
+        self._thread.start()
+        _logger.info("job runner metrics served on %s:%s", self.interface, self.port)
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -15,8 +15,30 @@ How does it work?
   added or updated in the queue_job table.
 * It maintains an in-memory priority queue of jobs that
   is populated from the queue_job tables in all databases.
+  At startup, the jobs taking capacity in the channels are loaded first,
+  then the pending jobs are loaded by chunks, by order of priority, while
+  the runner already dispatches the jobs loaded so far.
+* With the ``notify_payload = full`` option, the notifications carry
+  the properties of the jobs needed to schedule them, so the runner does
+  not have to read the jobs back from the database. The option is applied
+  when queue_job is installed or updated.
+* By default, the runner keeps one connection listening to each database.
+  With the ``notify_database`` option, Odoo relays the notifications of
+  the jobs it changes to this single database after each commit, and the
+  runner only listens to it. The connections to the other databases are
+  opened when jobs are read or updated, and a few of them are kept open
+  for reuse. As jobs changed by SQL queries are not relayed, the jobs of
+  each database are also reloaded every 5 minutes. The database must exist
+  (for instance ``postgres``) and be the same for Odoo and the runner.
 * It does not run jobs itself, but asks Odoo to run them through an
   anonymous ``/queue_job/runjob`` HTTP request. [1]_
+* Channels configured with a ``batch_size`` greater than 1 send their ready
+  jobs by groups to ``/queue_job/runjobs``, which runs them one after the
+  other in the same Odoo request, for instance
+  ``root:4,root.fast:2:batch_size=50:batch_time_budget=30``. A batch uses
+  a single slot of the capacity of its channel and of the parent channels
+  until all its jobs are done, so ``root.fast`` runs up to 2 batches of 50
+  jobs at once.
 
 How to use it?
 --------------
@@ -31,6 +53,18 @@ How to use it?
   - ``ODOO_QUEUE_JOB_PORT=443``, default ``http_port`` or 8069 if unset.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_USER=jobrunner``, default empty.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD=s3cr3t``, default empty.
+  - ``ODOO_QUEUE_JOB_HTTP_MAX_IN_FLIGHT=20``, maximum number of
+    concurrent ``/queue_job/runjob`` requests, default 10.
+  - ``ODOO_QUEUE_JOB_NOTIFY_PAYLOAD=full``, default ``uuid``.
+  - ``ODOO_QUEUE_JOB_METRICS_PORT=9187``, port on which the runner serves
+    its metrics in the Prometheus format on ``/metrics``, default empty
+    (disabled).
+  - ``ODOO_QUEUE_JOB_METRICS_INTERFACE=0.0.0.0``, default ``127.0.0.1``.
+  - ``ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL=300``, delay in seconds between
+    two lookups for new or dropped databases, default 60, ``0`` disables
+    the lookups.
+  - ``ODOO_QUEUE_JOB_NOTIFY_DATABASE=postgres``, default empty (one
+    connection listening to each database).
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_HOST=master-db``, default ``db_host``
     or ``False`` if unset.
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_PORT=5432``, default ``db_port``
@@ -52,6 +86,12 @@ How to use it?
   port = 443
   http_auth_user = jobrunner
   http_auth_password = s3cr3t
+  http_max_in_flight = 20
+  notify_payload = full
+  metrics_port = 9187
+  metrics_interface = 0.0.0.0
+  db_discovery_interval = 300
+  notify_database = postgres
   jobrunner_db_host = master-db
   jobrunner_db_port = 5432
   jobrunner_db_user = userdb
@@ -111,8 +151,10 @@ How to use it?
 Caveat
 ------
 
-* After creating a new database or installing queue_job on an
-  existing database, Odoo must be restarted for the runner to detect it.
+* The runner looks for new databases, or databases on which queue_job has
+  been installed, every ``db_discovery_interval`` seconds, so it can take
+  up to a minute with the default settings before their jobs start. The
+  databases which have been dropped are detached at the same time.
 
 * When Odoo shuts down normally, it waits for running jobs to finish.
   However, when the Odoo server crashes or is otherwise force-stopped,
@@ -139,27 +181,43 @@ Caveat
        of running Odoo is obviously not for production purposes.
 """
 
+import collections
 import datetime
+import json
 import logging
 import os
+import random
 import selectors
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing, contextmanager
 
 import psycopg2
 import requests
+import requests.adapters
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
 import odoo
 from odoo.tools import config
 
 from . import queue_job_config
-from .channels import ENQUEUED, NOT_DONE, PENDING, ChannelManager
+from .channels import ENQUEUED, FAILED, PENDING, STARTED, ChannelManager
+from .metrics import MetricsServer, format_metrics
 
 SELECT_TIMEOUT = 60
 ERROR_RECOVERY_DELAY = 5
 PG_ADVISORY_LOCK_ID = 2293787760715711918
+DEFAULT_HTTP_MAX_IN_FLIGHT = 10
+DISPATCH_TIMEOUT = 1
+BACKLOG_CHUNK_SIZE = 5000
+DEFAULT_DB_DISCOVERY_INTERVAL = 60
+RELAY_CHANNEL = "queue_job_relay"
+RELAY_RESYNC_INTERVAL = 300
+# uuids per relayed notification, to stay below the 8000 bytes of pg_notify
+RELAY_CHUNK_SIZE = 150
+POOL_MAX_IDLE = 8
+POOL_IDLE_TIMEOUT = 60
 
 _logger = logging.getLogger(__name__)
 
@@ -197,6 +255,32 @@ def _odoo_now():
     return _datetime_to_epoch(dt)
 
 
+def _parse_notification(payload):
+    """Return the job data carried by a notification payload.
+
+    Returns None when the payload only contains the uuid of the job,
+    in which case the job must be read from the database.
+
+    >>> _parse_notification("2a7d1b57-7a83-4a3e-8ee1-3b1b2b8d8a0f")
+    >>> channel, uuid, seq, date_created, priority, eta, state = (
+    ...     _parse_notification(
+    ...         '["root.sub", "abc", 12, "2024-01-02T03:04:05.000006", 10, null, '
+    ...         '"pending"]'
+    ...     )
+    ... )
+    >>> channel, uuid, seq, priority, eta, state
+    ('root.sub', 'abc', 12, 10, None, 'pending')
+    >>> date_created
+    datetime.datetime(2024, 1, 2, 3, 4, 5, 6)
+    """
+    if not payload.startswith("["):
+        return None
+    channel, uuid, seq, date_created, priority, eta, state = json.loads(payload)
+    if date_created:
+        date_created = datetime.datetime.strptime(date_created, "%Y-%m-%dT%H:%M:%S.%f")
+    return (channel, uuid, seq, date_created, priority, eta, state)
+
+
 def _connection_info_for(db_name):
     db_or_uri, connection_info = odoo.sql_db.connection_info_for(db_name)
 
@@ -211,60 +295,412 @@ def _connection_info_for(db_name):
     return connection_info
 
 
-def _async_http_get(scheme, host, port, user, password, db_name, job_uuid):
-    # Method to set failed job (due to timeout, etc) as pending,
-    # to avoid keeping it as enqueued.
-    def set_job_pending():
-        connection_info = _connection_info_for(db_name)
-        conn = psycopg2.connect(**connection_info)
+def _http_max_in_flight():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_HTTP_MAX_IN_FLIGHT")
+        or queue_job_config.get("http_max_in_flight")
+        or DEFAULT_HTTP_MAX_IN_FLIGHT
+    )
+
+
+def _metrics_address():
+    port = os.environ.get("ODOO_QUEUE_JOB_METRICS_PORT") or queue_job_config.get(
+        "metrics_port"
+    )
+    interface = (
+        os.environ.get("ODOO_QUEUE_JOB_METRICS_INTERFACE")
+        or queue_job_config.get("metrics_interface")
+        or "127.0.0.1"
+    )
+    return interface, int(port) if port else None
+
+
+def _db_discovery_interval():
+    interval = os.environ.get(
+        "ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL"
+    ) or queue_job_config.get("db_discovery_interval")
+    return float(interval) if interval else DEFAULT_DB_DISCOVERY_INTERVAL
+
+
+def _notify_database():
+    return os.environ.get("ODOO_QUEUE_JOB_NOTIFY_DATABASE") or queue_job_config.get(
+        "notify_database"
+    )
+
+
+def _relay_payloads(db_name, job_uuids):
+    """Return the payloads relaying the notifications of jobs.
+
+    >>> _relay_payloads("db", ["A", "B"])
+    ['["db", "A", "B"]']
+    """
+    job_uuids = list(job_uuids)
+    return [
+        json.dumps([db_name] + job_uuids[index : index + RELAY_CHUNK_SIZE])
+        for index in range(0, len(job_uuids), RELAY_CHUNK_SIZE)
+    ]
+
+
+def _relay_notify(notify_database, db_name, job_uuids):
+    # Used by the runner for the jobs it changes itself, Odoo relays
+    # the notifications of the jobs it changes after each commit.
+    conn = psycopg2.connect(**_connection_info_for(notify_database))
+    try:
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with closing(conn.cursor()) as cr:
+            for payload in _relay_payloads(db_name, job_uuids):
+                cr.execute("SELECT pg_notify(%s, %s)", (RELAY_CHANNEL, payload))
+    finally:
+        conn.close()
+
+
+def _set_jobs_pending(db_name, job_uuids, notify_database=None):
+    # Method to set failed jobs (due to timeout, etc) as pending,
+    # to avoid keeping them as enqueued.
+    connection_info = _connection_info_for(db_name)
+    conn = psycopg2.connect(**connection_info)
+    try:
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         with closing(conn.cursor()) as cr:
             cr.execute(
                 "UPDATE queue_job SET state=%s, "
                 "date_enqueued=NULL, date_started=NULL "
-                "WHERE uuid=%s and state=%s "
+                "WHERE uuid IN %s and state=%s "
                 "RETURNING uuid",
-                (PENDING, job_uuid, ENQUEUED),
+                (PENDING, tuple(job_uuids), ENQUEUED),
             )
-            if cr.fetchone():
+            reset_uuids = [job_uuid for (job_uuid,) in cr.fetchall()]
+            for job_uuid in reset_uuids:
                 _logger.warning(
                     "state of job %s was reset from %s to %s",
                     job_uuid,
                     ENQUEUED,
                     PENDING,
                 )
+    finally:
+        conn.close()
+    if notify_database and reset_uuids:
+        _relay_notify(notify_database, db_name, reset_uuids)
+
+
+class DispatchStats:
+    """Counters and latencies of the runjob requests sent by the dispatcher.
+
+    The latency of a request is the time elapsed between the moment the
+    job is handed to the dispatcher and the moment Odoo answers (or the
+    request times out), so it includes the time spent waiting for a free
+    slot in the pool.
+
+    >>> stats = DispatchStats()
+    >>> stats.submitted()
+    >>> stats.submitted()
+    >>> stats.submitted()
+    >>> stats.in_flight
+    3
+    >>> stats.done(0.2)
+    >>> stats.done(1.0, timeout=True)
+    >>> stats.in_flight
+    1
+    >>> stats.done(0.3, error=True)
+    >>> stats.count, stats.timeouts, stats.errors, stats.in_flight
+    (3, 1, 1, 0)
+    >>> round(stats.avg_latency, 2), stats.max_latency
+    (0.5, 1.0)
+    >>> str(stats)
+    'dispatched:3 timeouts:1 errors:1 in flight:0 latency avg:0.500s max:1.000s'
+
+    The requests are also counted by (database, channel) when given.
+
+    >>> stats.submitted()
+    >>> stats.done(0.5, key=("db", "root.sub"), error=True)
+    >>> stats.by_key()
+    {('db', 'root.sub'): {'count': 1, 'timeouts': 0, 'errors': 1, 'latency': 0.5}}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.count = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._by_key = {}
+
+    def __str__(self):
+        return (
+            "dispatched:%d timeouts:%d errors:%d in flight:%d "
+            "latency avg:%.3fs max:%.3fs"
+            % (
+                self.count,
+                self.timeouts,
+                self.errors,
+                self.in_flight,
+                self.avg_latency,
+                self.max_latency,
+            )
+        )
+
+    @property
+    def avg_latency(self):
+        if not self.count:
+            return 0.0
+        return self.total_latency / self.count
+
+    def submitted(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def done(self, latency, key=None, timeout=False, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.count += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if timeout:
+                self.timeouts += 1
+            if error:
+                self.errors += 1
+            if key:
+                key_stats = self._by_key.setdefault(
+                    key, {"count": 0, "timeouts": 0, "errors": 0, "latency": 0.0}
+                )
+                key_stats["count"] += 1
+                key_stats["timeouts"] += timeout
+                key_stats["errors"] += error
+                key_stats["latency"] += latency
+
+    def by_key(self):
+        """Return a copy of the statistics by (database, channel)"""
+        with self._lock:
+            return {key: dict(values) for key, values in self._by_key.items()}
+
+
+class HttpDispatcher:
+    """Ask Odoo to run jobs through a bounded pool of HTTP workers.
+
+    The workers share a ``requests.Session`` so the connections to Odoo are
+    kept alive and reused between jobs, and at most ``max_in_flight``
+    ``/queue_job/runjob`` requests are running at the same time. Jobs
+    dispatched while the pool is busy wait for a free worker.
+    """
+
+    def __init__(
+        self, scheme, host, port, user, password, max_in_flight, notify_database=None
+    ):
+        self.base_url = f"{scheme}://{host}:{port}"
+        self.max_in_flight = max_in_flight
+        self.notify_database = notify_database
+        self.session = requests.Session()
+        if user:
+            self.session.auth = (user, password)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_in_flight
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = DispatchStats()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="queue_job_dispatch"
+        )
+
+    def dispatch(self, db_name, job_uuid, channel_name=None):
+        """Ask Odoo to run one job"""
+        self.stats.submitted()
+        self._executor.submit(
+            self._request,
+            db_name,
+            channel_name,
+            [job_uuid],
+            time.monotonic(),
+            "GET",
+            "/queue_job/runjob",
+            DISPATCH_TIMEOUT,
+            params={"db": db_name, "job_uuid": job_uuid},
+        )
+
+    def dispatch_batch(self, db_name, job_uuids, time_budget, channel_name=None):
+        """Ask Odoo to run several jobs sequentially in one request"""
+        self.stats.submitted()
+        self._executor.submit(
+            self._request,
+            db_name,
+            channel_name,
+            job_uuids,
+            time.monotonic(),
+            "POST",
+            "/queue_job/runjobs",
+            # Odoo stops starting jobs once the time budget is over,
+            # jobs not started before the timeout are set back to pending
+            DISPATCH_TIMEOUT + time_budget,
+            # the database is in the query string, like for runjob, so
+            # that it is known before the request is dispatched
+            params={"db": db_name},
+            data={"job_uuids": ",".join(job_uuids), "time_budget": time_budget},
+        )
 
-    # TODO: better way to HTTP GET asynchronously (grequest, ...)?
-    #       if this was python3 I would be doing this with
-    #       asyncio, aiohttp and aiopg
-    def urlopen():
-        url = f"{scheme}://{host}:{port}/queue_job/runjob?db={db_name}&job_uuid={job_uuid}"
+    def _request(
+        self,
+        db_name,
+        channel_name,
+        job_uuids,
+        submitted_at,
+        method,
+        path,
+        timeout,
+        **kwargs,
+    ):
+        url = self.base_url + path
+        is_timeout = is_error = False
         try:
-            auth = None
-            if user:
-                auth = (user, password)
             # we are not interested in the result, so we set a short timeout
             # but not too short so we trap and log hard configuration errors
-            response = requests.get(url, timeout=1, auth=auth)
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
 
             # raise_for_status will result in either nothing, a Client Error
             # for HTTP Response codes between 400 and 500 or a Server Error
             # for codes between 500 and 600
             response.raise_for_status()
         except requests.Timeout:
-            set_job_pending()
+            is_timeout = True
+            try:
+                _set_jobs_pending(db_name, job_uuids, self.notify_database)
+            except Exception:
+                _logger.exception("could not reset state of jobs %s", job_uuids)
         except Exception:
-            _logger.exception("exception in GET %s", url)
-            set_job_pending()
+            is_error = True
+            _logger.exception("exception in %s %s (db %s)", method, url, db_name)
+            try:
+                _set_jobs_pending(db_name, job_uuids, self.notify_database)
+            except Exception:
+                _logger.exception("could not reset state of jobs %s", job_uuids)
+        finally:
+            self.stats.done(
+                time.monotonic() - submitted_at,
+                key=(db_name, channel_name),
+                timeout=is_timeout,
+                error=is_error,
+            )
+
+    def close(self):
+        # wait for the requests in the pool so the jobs they carry
+        # are either started by Odoo or reset to pending
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        _logger.info("dispatcher closed (%s)", self.stats)
 
-    thread = threading.Thread(target=urlopen)
-    thread.daemon = True
-    thread.start()
 
+class ConnectionPool:
+    """Connections to the databases, opened when jobs are read or updated.
+
+    Connections released by the runner are kept open for reuse, one per
+    database; the least recently used ones are closed beyond ``max_idle``
+    connections or after ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, max_idle=POOL_MAX_IDLE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        # db_name: (connection, time.monotonic() of release)
+        self._idle = collections.OrderedDict()
+
+    @contextmanager
+    def cursor(self, db_name, *args, **kwargs):
+        conn = self._borrow(db_name)
+        try:
+            with closing(conn.cursor(*args, **kwargs)) as cr:
+                yield cr
+        except BaseException:
+            conn.close()
+            raise
+        self._release(db_name, conn)
+
+    def _borrow(self, db_name):
+        self._close_expired()
+        if db_name in self._idle:
+            conn, __ = self._idle.pop(db_name)
+            return conn
+        conn = psycopg2.connect(**_connection_info_for(db_name))
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _release(self, db_name, conn):
+        if db_name in self._idle:
+            conn.close()
+            return
+        self._idle[db_name] = (conn, time.monotonic())
+        while len(self._idle) > self.max_idle:
+            __, (conn, __) = self._idle.popitem(last=False)
+            conn.close()
+
+    def _close_expired(self):
+        expired = time.monotonic() - self.idle_timeout
+        while self._idle:
+            db_name, (conn, released_at) = next(iter(self._idle.items()))
+            if released_at > expired:
+                break
+            del self._idle[db_name]
+            conn.close()
+
+    def discard(self, db_name):
+        if db_name in self._idle:
+            conn, __ = self._idle.pop(db_name)
+            conn.close()
+
+    def close(self):
+        for conn, __ in self._idle.values():
+            conn.close()
+        self._idle.clear()
+
+
+class RelayDatabase:
+    """Connection listening to the notifications of all the databases.
+
+    Odoo relays the notifications of the jobs it changes to
+    ``notify_database``, prefixed with the name of their database. The
+    master runner lock is taken on this database only.
+    """
 
-class Database:
     def __init__(self, db_name):
         self.db_name = db_name
+        self.conn = psycopg2.connect(**_connection_info_for(db_name))
+        try:
+            self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with closing(self.conn.cursor()) as cr:
+                cr.execute("SELECT pg_try_advisory_lock(%s)", (PG_ADVISORY_LOCK_ID,))
+                if not cr.fetchone()[0]:
+                    msg = f"could not acquire master runner lock on {db_name}"
+                    raise MasterElectionLost(msg)
+                cr.execute(f"LISTEN {RELAY_CHANNEL}")
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # pylint: disable=except-pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+    def keep_alive(self):
+        with closing(self.conn.cursor()) as cr:
+            cr.execute("SELECT 1")
+
+
+class Database:
+    def __init__(self, db_name, pool=None):
+        self.db_name = db_name
+        self.pool = pool
+        if pool is not None:
+            # the notifications are relayed, a connection is only borrowed
+            # from the pool when jobs are read or updated
+            self.conn = None
+            self.has_queue_job = self._has_queue_job()
+            if not self.has_queue_job:
+                pool.discard(db_name)
+            return
         connection_info = _connection_info_for(db_name)
         self.conn = psycopg2.connect(**connection_info)
         try:
@@ -283,21 +719,33 @@ class Database:
         # and we don't care, or for any reason but anyway it will be closed on
         # del
         try:
-            self.conn.close()
+            if self.pool is not None:
+                self.pool.discard(self.db_name)
+            else:
+                self.conn.close()
         except Exception:
             pass
         self.conn = None
 
+    @contextmanager
+    def _cursor(self, *args, **kwargs):
+        if self.pool is not None:
+            with self.pool.cursor(self.db_name, *args, **kwargs) as cr:
+                yield cr
+        else:
+            with closing(self.conn.cursor(*args, **kwargs)) as cr:
+                yield cr
+
     def _acquire_master_lock(self):
         """Acquire the master runner lock or raise MasterElectionLost"""
-        with closing(self.conn.cursor()) as cr:
+        with self._cursor() as cr:
             cr.execute("SELECT pg_try_advisory_lock(%s)", (PG_ADVISORY_LOCK_ID,))
             if not cr.fetchone()[0]:
                 msg = f"could not acquire master runner lock on {self.db_name}"
                 raise MasterElectionLost(msg)
 
     def _has_queue_job(self):
-        with closing(self.conn.cursor()) as cr:
+        with self._cursor() as cr:
             cr.execute(
                 "SELECT 1 FROM pg_tables WHERE tablename=%s", ("ir_module_module",)
             )
@@ -326,7 +774,7 @@ class Database:
             return True
 
     def _initialize(self):
-        with closing(self.conn.cursor()) as cr:
+        with self._cursor() as cr:
             cr.execute("LISTEN queue_job")
 
     @contextmanager
@@ -340,24 +788,83 @@ class Database:
             "priority, EXTRACT(EPOCH FROM eta), state "
             f"FROM queue_job WHERE {where}"
         )
-        with closing(self.conn.cursor("select_jobs", withhold=True)) as cr:
+        with self._cursor("select_jobs", withhold=True) as cr:
             cr.execute(query, args)
             yield cr
 
+    def fetch_active_jobs(self):
+        """Return the jobs which take capacity in their channel.
+
+        Pending jobs without priority are returned as well, since
+        :meth:`fetch_pending_jobs` can not page through them.
+        """
+        with self._cursor() as cr:
+            cr.execute(
+                "SELECT channel, uuid, id as seq, date_created, "
+                "priority, EXTRACT(EPOCH FROM eta), state "
+                "FROM queue_job "
+                "WHERE state IN %s OR (state = %s AND priority IS NULL)",
+                ((ENQUEUED, STARTED, FAILED), PENDING),
+            )
+            return cr.fetchall()
+
+    def fetch_pending_jobs(self, after, limit):
+        """Return a chunk of pending jobs, by order of priority.
+
+        ``after`` is the (priority, id) of the last job of the previous
+        chunk, or None to get the first chunk.
+        """
+        where = "state = %s AND priority IS NOT NULL"
+        args = (PENDING,)
+        if after:
+            where += " AND (priority, id) > (%s, %s)"
+            args += tuple(after)
+        with self._cursor() as cr:
+            # pylint: disable=sql-injection
+            cr.execute(
+                "SELECT channel, uuid, id as seq, date_created, "
+                "priority, EXTRACT(EPOCH FROM eta), state "
+                f"FROM queue_job WHERE {where} "
+                "ORDER BY priority, id LIMIT %s",
+                args + (limit,),
+            )
+            return cr.fetchall()
+
+    def fetch_jobs(self, uuids):
+        """Return the scheduling data of the jobs with the given uuids.
+
+        Unlike :meth:`select_jobs`, it uses a client-side cursor, which is
+        cheaper for the small result sets of notifications.
+        """
+        with self._cursor() as cr:
+            cr.execute(
+                "SELECT channel, uuid, id as seq, date_created, "
+                "priority, EXTRACT(EPOCH FROM eta), state "
+                "FROM queue_job WHERE uuid = ANY(%s)",
+                (list(uuids),),
+            )
+            return cr.fetchall()
+
     def keep_alive(self):
         query = "SELECT 1"
-        with closing(self.conn.cursor()) as cr:
+        with self._cursor() as cr:
             cr.execute(query)
 
     def set_job_enqueued(self, uuid):
-        with closing(self.conn.cursor()) as cr:
+        self.set_jobs_enqueued([uuid])
+
+    def set_jobs_enqueued(self, uuids):
+        """Set pending jobs as enqueued, return the uuids of the updated jobs"""
+        with self._cursor() as cr:
             cr.execute(
                 "UPDATE queue_job SET state=%s, "
                 "date_enqueued=date_trunc('seconds', "
                 "                         now() at time zone 'utc') "
-                "WHERE uuid=%s",
-                (ENQUEUED, uuid),
+                "WHERE uuid = ANY(%s) AND state = %s "
+                "RETURNING uuid",
+                (ENQUEUED, list(uuids), PENDING),
             )
+            return [uuid for (uuid,) in cr.fetchall()]
 
 
 class QueueJobRunner:
@@ -369,17 +876,45 @@ class QueueJobRunner:
         user=None,
         password=None,
         channel_config_string=None,
+        http_max_in_flight=DEFAULT_HTTP_MAX_IN_FLIGHT,
+        metrics_interface="127.0.0.1",
+        metrics_port=None,
+        db_discovery_interval=DEFAULT_DB_DISCOVERY_INTERVAL,
+        notify_database=None,
     ):
         self.scheme = scheme
         self.host = host
         self.port = port
         self.user = user
         self.password = password
+        self.http_max_in_flight = http_max_in_flight
+        self.metrics_interface = metrics_interface
+        self.metrics_port = metrics_port
+        self.db_discovery_interval = db_discovery_interval
+        self.notify_database = notify_database
+        # created when the runner starts, so that the pool threads and
+        # connections belong to the process that actually runs it
+        self.dispatcher = None
+        self.metrics_server = None
         self.channel_manager = ChannelManager()
         if channel_config_string is None:
             channel_config_string = _channels()
         self.channel_manager.simple_configure(channel_config_string)
         self.db_by_name = {}
+        # with notify_database, the connection listening to the relayed
+        # notifications and the pool of connections to the databases
+        self.relay = None
+        self.pool = None
+        # time.monotonic() after which to reload the jobs, by database
+        # whose notifications are relayed
+        self._resync_times = {}
+        # (priority, id) of the last pending job loaded, by database
+        # which still has pending jobs to load
+        self._backlog_keys = {}
+        # databases closed while keeping their jobs in memory
+        self._detached_db_names = set()
+        # time.monotonic() after which to look for new or dropped databases
+        self._next_db_discovery = None
         self._stop = False
         self._stop_pipe = os.pipe()
 
@@ -415,12 +950,18 @@ class QueueJobRunner:
         password = os.environ.get(
             "ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD"
         ) or queue_job_config.get("http_auth_password")
+        metrics_interface, metrics_port = _metrics_address()
         runner = cls(
             scheme=scheme or "http",
             host=host or "localhost",
             port=port or 8069,
             user=user,
             password=password,
+            http_max_in_flight=_http_max_in_flight(),
+            metrics_interface=metrics_interface,
+            metrics_port=metrics_port,
+            db_discovery_interval=_db_discovery_interval(),
+            notify_database=_notify_database(),
         )
         return runner
 
@@ -436,42 +977,210 @@ class QueueJobRunner:
             try:
                 if remove_jobs:
                     self.channel_manager.remove_db(db_name)
+                else:
+                    self._detached_db_names.add(db_name)
                 db.close()
             except Exception:
                 _logger.warning("error closing database %s", db_name, exc_info=True)
         self.db_by_name = {}
+        self._backlog_keys = {}
+        self._resync_times = {}
+        if self.relay is not None:
+            self.relay.close()
+            self.relay = None
+            self.pool.close()
+            self.pool = None
 
     def initialize_databases(self):
+        if self.notify_database:
+            # listen before loading the jobs so no change is missed
+            self.relay = RelayDatabase(self.notify_database)
+            self.pool = ConnectionPool()
         for db_name in sorted(self.get_db_names()):
             # sorting is important to avoid deadlocks in acquiring the master lock
-            db = Database(db_name)
-            if db.has_queue_job:
-                self.db_by_name[db_name] = db
-                with db.select_jobs("state in %s", (NOT_DONE,)) as cr:
-                    for job_data in cr:
-                        self.channel_manager.notify(db_name, *job_data)
-                _logger.info("queue job runner ready for db %s", db_name)
+            self._attach_database(db_name)
+        # jobs kept in memory for databases which are not there anymore
+        for db_name in self._detached_db_names - set(self.db_by_name):
+            self.channel_manager.remove_db(db_name)
+        self._detached_db_names = set()
+        self._schedule_db_discovery()
+
+    def _attach_database(self, db_name):
+        db = Database(db_name, pool=self.pool)
+        if not db.has_queue_job:
+            db.close()
+            return False
+        self.db_by_name[db_name] = db
+        try:
+            self._load_jobs(db)
+        except BaseException:
+            self._detach_database(db_name)
+            raise
+        if self.relay is not None:
+            # spread the reloads of the databases over the interval
+            self._resync_times[db_name] = time.monotonic() + random.uniform(
+                0, RELAY_RESYNC_INTERVAL
+            )
+        _logger.info("queue job runner ready for db %s", db_name)
+        return True
+
+    def _detach_database(self, db_name):
+        db = self.db_by_name.pop(db_name)
+        self._backlog_keys.pop(db_name, None)
+        self._resync_times.pop(db_name, None)
+        self.channel_manager.remove_db(db_name)
+        db.close()
+        _logger.info("queue job runner detached from db %s", db_name)
+
+    def _schedule_db_discovery(self):
+        if self.db_discovery_interval > 0:
+            self._next_db_discovery = time.monotonic() + self.db_discovery_interval
+        else:
+            self._next_db_discovery = None
+
+    def discover_databases(self):
+        """Attach the new databases and detach the dropped ones.
+
+        The databases which are already attached are left untouched, the
+        other ones are only connected to long enough to check whether
+        queue_job is installed on them.
+        """
+        if (
+            self._next_db_discovery is None
+            or time.monotonic() < self._next_db_discovery
+        ):
+            return
+        db_names = set(self.get_db_names())
+        for db_name in sorted(set(self.db_by_name) - db_names):
+            self._detach_database(db_name)
+        for db_name in sorted(db_names - set(self.db_by_name)):
+            if self._stop:
+                break
+            try:
+                self._attach_database(db_name)
+            except MasterElectionLost as e:
+                # another runner serves this database, try again later
+                _logger.debug("master election lost: %s", e)
+            except psycopg2.Error:
+                # the database may have been dropped or still be
+                # created, try again later
+                _logger.warning("could not check database %s", db_name, exc_info=True)
+        self._schedule_db_discovery()
+
+    def resync_databases(self):
+        """Reload the jobs of the databases whose notifications are relayed.
+
+        Odoo relays the notifications of the jobs it changes itself, this
+        catches up with the jobs changed by other means, such as SQL
+        queries, or whose notifications could not be relayed.
+        """
+        now = time.monotonic()
+        for db_name, resync_time in list(self._resync_times.items()):
+            if self._stop:
+                break
+            if resync_time > now:
+                continue
+            self._load_jobs(self.db_by_name[db_name])
+            self._resync_times[db_name] = now + RELAY_RESYNC_INTERVAL
+
+    def _load_jobs(self, db):
+        # the jobs taking capacity in the channels are loaded first,
+        # so that the channels capacity is right before dispatching
+        loaded = set()
+        for job_datas in db.fetch_active_jobs():
+            self.channel_manager.notify(db.db_name, *job_datas)
+            loaded.add(job_datas[1])
+        # jobs kept in memory since a previous connection may have
+        # changed in the meantime
+        self._refresh_jobs(
+            db, self.channel_manager.get_active_job_uuids(db.db_name) - loaded
+        )
+        # the pending jobs are loaded by chunks between dispatches
+        self._backlog_keys[db.db_name] = None
+
+    def _refresh_jobs(self, db, uuids):
+        """Update the jobs from their current state in the database"""
+        if not uuids:
+            return
+        found = set()
+        for job_datas in db.fetch_jobs(uuids):
+            self.channel_manager.notify(db.db_name, *job_datas)
+            found.add(job_datas[1])
+        for uuid in uuids - found:
+            self.channel_manager.remove_job(uuid)
+
+    def load_backlog(self):
+        """Load the next chunk of pending jobs of the databases"""
+        for db_name, after in list(self._backlog_keys.items()):
+            if self._stop:
+                break
+            rows = self.db_by_name[db_name].fetch_pending_jobs(
+                after, BACKLOG_CHUNK_SIZE
+            )
+            for job_datas in rows:
+                self.channel_manager.notify(db_name, *job_datas)
+            if len(rows) < BACKLOG_CHUNK_SIZE:
+                del self._backlog_keys[db_name]
+                _logger.info("pending jobs loaded for db %s", db_name)
             else:
-                db.close()
+                # (priority, id)
+                self._backlog_keys[db_name] = (rows[-1][4], rows[-1][2])
 
     def run_jobs(self):
         now = _odoo_now()
+        jobs = []
         for job in self.channel_manager.get_jobs_to_run(now):
             if self._stop:
                 break
+            jobs.append(job)
+        if not jobs:
+            return
+        # mark all the jobs enqueued with one query per database
+        # before sending the first HTTP request
+        uuids_by_db = {}
+        for job in jobs:
+            uuids_by_db.setdefault(job.db_name, []).append(job.uuid)
+        not_pending = set()
+        for db_name, uuids in uuids_by_db.items():
+            db = self.db_by_name[db_name]
+            stale_uuids = set(uuids) - set(db.set_jobs_enqueued(uuids))
+            if stale_uuids:
+                # the jobs changed since we have been notified,
+                # reschedule them from their actual state
+                _logger.info(
+                    "jobs %s on db %s are not pending anymore",
+                    ", ".join(sorted(stale_uuids)),
+                    db_name,
+                )
+                for uuid in stale_uuids:
+                    self.channel_manager.remove_job(uuid)
+                self._refresh_jobs(db, stale_uuids)
+                not_pending |= stale_uuids
+        if not_pending:
+            jobs = [job for job in jobs if job.uuid not in not_pending]
+        # uuids of the jobs of each batch formed by the channels,
+        # by first job of the batch
+        batches = {}
+        for job in jobs:
             _logger.info("asking Odoo to run job %s on db %s", job.uuid, job.db_name)
-            self.db_by_name[job.db_name].set_job_enqueued(job.uuid)
-            _async_http_get(
-                self.scheme,
-                self.host,
-                self.port,
-                self.user,
-                self.password,
-                job.db_name,
-                job.uuid,
+            if not job.batch:
+                self.dispatcher.dispatch(job.db_name, job.uuid, job.channel.fullname)
+                continue
+            batches.setdefault(job.slot, []).append(job.uuid)
+        for job, batch in batches.items():
+            self.dispatcher.dispatch_batch(
+                job.db_name, batch, job.channel.batch_time_budget, job.channel.fullname
             )
 
+    def _listening_databases(self):
+        if self.relay is not None:
+            return [self.relay]
+        return list(self.db_by_name.values())
+
     def process_notifications(self):
+        if self.relay is not None:
+            self._process_relayed_notifications()
+            return
         for db in self.db_by_name.values():
             if not db.conn.notifies:
                 # If there are no activity in the queue_job table it seems that
@@ -479,26 +1188,63 @@ class QueueJobRunner:
                 # causing some intermediaries (such as haproxy) to close the
                 # connection, making the jobrunner to restart on a socket error
                 db.keep_alive()
-            while db.conn.notifies:
-                if self._stop:
-                    break
-                notification = db.conn.notifies.pop()
-                uuid = notification.payload
-                with db.select_jobs("uuid = %s", (uuid,)) as cr:
-                    job_datas = cr.fetchone()
-                    if job_datas:
-                        self.channel_manager.notify(db.db_name, *job_datas)
-                    else:
-                        self.channel_manager.remove_job(uuid)
+                continue
+            if self._stop:
+                break
+            payloads = [notification.payload for notification in db.conn.notifies]
+            db.conn.notifies.clear()
+            self._notify_jobs(db, payloads)
+
+    def _process_relayed_notifications(self):
+        if not self.relay.conn.notifies:
+            self.relay.keep_alive()
+            return
+        payloads_by_db = {}
+        for notification in self.relay.conn.notifies:
+            db_name, *uuids = json.loads(notification.payload)
+            payloads_by_db.setdefault(db_name, []).extend(uuids)
+        self.relay.conn.notifies.clear()
+        for db_name, payloads in payloads_by_db.items():
+            if self._stop:
+                break
+            db = self.db_by_name.get(db_name)
+            if db is None:
+                # the jobs are loaded when the database is attached
+                continue
+            self._notify_jobs(db, payloads)
+
+    def _notify_jobs(self, db, payloads):
+        # drain all the pending notifications at once, only the
+        # last notification of a job is relevant
+        job_datas_by_uuid = {}
+        for payload in payloads:
+            job_datas = _parse_notification(payload)
+            uuid = job_datas[1] if job_datas else payload
+            job_datas_by_uuid[uuid] = job_datas
+        # read the jobs which were notified with their uuid only
+        uuids = {uuid for uuid, job_datas in job_datas_by_uuid.items() if not job_datas}
+        if uuids:
+            for job_datas in db.fetch_jobs(uuids):
+                job_datas_by_uuid[job_datas[1]] = job_datas
+        for uuid, job_datas in job_datas_by_uuid.items():
+            if job_datas:
+                self.channel_manager.notify(db.db_name, *job_datas)
+            else:
+                # the job has been deleted
+                self.channel_manager.remove_job(uuid)
 
     def wait_notification(self):
-        for db in self.db_by_name.values():
+        if self._backlog_keys:
+            # pending jobs are still being loaded, no need to wait
+            return
+        listening = self._listening_databases()
+        for db in listening:
             if db.conn.notifies:
                 # something is going on in the queue, no need to wait
                 return
         # wait for something to happen in the queue_job tables
         # we'll select() on database connections and the stop pipe
-        conns = [db.conn for db in self.db_by_name.values()]
+        conns = [db.conn for db in listening]
         conns.append(self._stop_pipe[0])
         # look if the channels specify a wakeup time
         wakeup_time = self.channel_manager.get_wakeup_time()
@@ -509,6 +1255,11 @@ class QueueJobRunner:
             timeout = SELECT_TIMEOUT
         else:
             timeout = wakeup_time - _odoo_now()
+        deadlines = list(self._resync_times.values())
+        if self._next_db_discovery is not None:
+            deadlines.append(self._next_db_discovery)
+        if deadlines:
+            timeout = min(timeout, min(deadlines) - time.monotonic())
         # wait for a notification or a timeout;
         # if timeout is negative (ie wakeup time in the past),
         # do not wait; this should rarely happen
@@ -528,6 +1279,13 @@ class QueueJobRunner:
                             continue
                         key.fileobj.poll()
 
+    def format_metrics(self):
+        return format_metrics(
+            self.channel_manager,
+            self.dispatcher.stats if self.dispatcher else None,
+            db_names=list(self.db_by_name),
+        )
+
     def stop(self):
         _logger.info("graceful stop requested")
         self._stop = True
@@ -536,17 +1294,36 @@ class QueueJobRunner:
 
     def run(self):
         _logger.info("starting")
+        self.dispatcher = HttpDispatcher(
+            self.scheme,
+            self.host,
+            self.port,
+            self.user,
+            self.password,
+            self.http_max_in_flight,
+            notify_database=self.notify_database,
+        )
+        if self.metrics_port:
+            self.metrics_server = MetricsServer(
+                self.metrics_interface, self.metrics_port, self.format_metrics
+            )
+            try:
+                self.metrics_server.start()
+            except OSError:
+                _logger.exception("could not serve the job runner metrics")
+                self.metrics_server = None
         while not self._stop:
             # outer loop does exception recovery
             try:
                 _logger.debug("initializing database connections")
-                # TODO: how to detect new databases or databases
-                #       on which queue_job is installed after server start?
                 self.initialize_databases()
                 _logger.info("database connections ready")
                 # inner loop does the normal processing
                 while not self._stop:
                     self.process_notifications()
+                    self.discover_databases()
+                    self.resync_databases()
+                    self.load_backlog()
                     self.run_jobs()
                     self.wait_notification()
             except KeyboardInterrupt:
@@ -566,7 +1343,12 @@ class QueueJobRunner:
                 _logger.exception(
                     "exception: sleeping %ds and retrying", ERROR_RECOVERY_DELAY
                 )
-                self.close_databases()
+                # keep the jobs in memory, they are refreshed when
+                # the databases are initialized again
+                self.close_databases(remove_jobs=False)
                 time.sleep(ERROR_RECOVERY_DELAY)
         self.close_databases(remove_jobs=False)
+        self.dispatcher.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
         _logger.info("stopped")
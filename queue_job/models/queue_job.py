@@ -24,6 +24,8 @@ from ..job import (
     WAIT_DEPENDENCIES,
     Job,
 )
+from ..post_init_hook import _notify_full_payload, create_notify_trigger
+from ..relay import relay_job_notifications
 
 _logger = logging.getLogger(__name__)
 
@@ -143,6 +145,16 @@ class QueueJob(models.Model):
                 "CREATE INDEX queue_job_channel_date_done_date_created_index "
                 "ON queue_job (channel, date_done, date_created);"
             )
+        index_3 = "queue_job_pending_priority_id_index"
+        if not index_exists(self._cr, index_3):
+            # Used by the job runner to load the pending jobs by chunks
+            self._cr.execute(
+                "CREATE INDEX queue_job_pending_priority_id_index "
+                "ON queue_job (priority, id) WHERE state = 'pending';"
+            )
+        # (re)create the trigger on updates of the module, so a change
+        # of the notify_payload option is applied
+        create_notify_trigger(self._cr, full_payload=_notify_full_payload())
 
     @api.depends("dependencies")
     def _compute_dependency_graph(self):
@@ -237,10 +249,12 @@ class QueueJob(models.Model):
     @api.model_create_multi
     @api.private
     def create(self, vals_list):
-        return super(
+        records = super(
             QueueJob,
             self.with_context(mail_create_nolog=True, mail_create_nosubscribe=True),
         ).create(vals_list)
+        relay_job_notifications(self.env.cr, (record.uuid for record in records))
+        return records
 
     def write(self, vals):
         if self.env.context.get("_job_edit_sentinel") is not self.EDIT_SENTINEL:
@@ -272,8 +286,20 @@ class QueueJob(models.Model):
             super(QueueJob, record).write(
                 {"records": record.records.with_user(vals["user_id"])}
             )
+        relay_job_notifications(self.env.cr, (record.uuid for record in self))
         return result
 
+    def unlink(self):
+        relay_job_notifications(
+            self.env.cr, (record.uuid for record in self if record.state != DONE)
+        )
+        return super().unlink()
+
+    @api.model
+    def _relay_job_notifications(self, job_uuids):
+        """Relay the notifications of jobs changed by SQL queries"""
+        relay_job_notifications(self.env.cr, job_uuids)
+
     def open_related_action(self):
         """Open the related action associated to the job"""
         self.ensure_one()
@@ -2,25 +2,66 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+import os
+
+from .jobrunner import queue_job_config
 
 logger = logging.getLogger(__name__)
 
+# payloads of pg_notify must be shorter than 8000 bytes
+NOTIFY_PAYLOAD_MAX_SIZE = 8000
 
-def post_init_hook(env):
-    # this is the trigger that sends notifications when jobs change
-    logger.info("Create queue_job_notify trigger")
-    env.cr.execute(
-        """
+
+def _notify_full_payload():
+    payload = (
+        os.environ.get("ODOO_QUEUE_JOB_NOTIFY_PAYLOAD")
+        or queue_job_config.get("notify_payload")
+        or "uuid"
+    )
+    return payload.strip().lower() == "full"
+
+
+def create_notify_trigger(cr, full_payload=False):
+    """Create the trigger that sends notifications when jobs change
+
+    By default, the payload of the notifications is the uuid of the job.
+    With ``full_payload``, it is a JSON array with the properties the job
+    runner needs to schedule the job (channel, uuid, id, date_created,
+    priority, eta and state), so it does not need to read the job back.
+    Deleted jobs and payloads that would be too large still only send the
+    uuid.
+    """
+    if full_payload:
+        notify_new = f"""
+                    payload := json_build_array(
+                        NEW.channel,
+                        NEW.uuid,
+                        NEW.id,
+                        to_char(NEW.date_created, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        NEW.priority,
+                        EXTRACT(EPOCH FROM NEW.eta),
+                        NEW.state
+                    )::text;
+                    IF octet_length(payload) >= {NOTIFY_PAYLOAD_MAX_SIZE} THEN
+                        payload := NEW.uuid;
+                    END IF;
+                    PERFORM pg_notify('queue_job', payload);"""
+    else:
+        notify_new = """
+                    PERFORM pg_notify('queue_job', NEW.uuid);"""
+    cr.execute(
+        f"""
             DROP TRIGGER IF EXISTS queue_job_notify ON queue_job;
             CREATE OR REPLACE
                 FUNCTION queue_job_notify() RETURNS trigger AS $$
+            DECLARE
+                payload text;
             BEGIN
                 IF TG_OP = 'DELETE' THEN
                     IF OLD.state != 'done' THEN
                         PERFORM pg_notify('queue_job', OLD.uuid);
                     END IF;
-                ELSE
-                    PERFORM pg_notify('queue_job', NEW.uuid);
+                ELSE{notify_new}
                 END IF;
                 RETURN NULL;
             END;
@@ -31,3 +72,9 @@ def post_init_hook(env):
                 FOR EACH ROW EXECUTE PROCEDURE queue_job_notify();
         """
     )
+
+
+def post_init_hook(env):
+    # this is the trigger that sends notifications when jobs change
+    logger.info("Create queue_job_notify trigger")
+    create_notify_trigger(env.cr, full_payload=_notify_full_payload())
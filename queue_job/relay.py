@@ -0,0 +1,44 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+import logging
+
+from odoo import sql_db
+
+from .jobrunner.runner import RELAY_CHANNEL, _notify_database, _relay_payloads
+
+_logger = logging.getLogger(__name__)
+
+
+def relay_job_notifications(cr, job_uuids):
+    """Relay the notifications of changed jobs to the job runner
+
+    Only used with the ``notify_database`` option: the uuids of the jobs
+    are sent to this database once the transaction of ``cr`` is committed,
+    and dropped if it is rolled back. ``job_uuids`` is not iterated when
+    the option is not set.
+    """
+    notify_database = _notify_database()
+    if not notify_database:
+        return
+    uuids = cr.postcommit.data.get("queue_job.relay")
+    if uuids is None:
+        uuids = cr.postcommit.data["queue_job.relay"] = set()
+        db_name = cr.dbname
+        cr.postcommit.add(lambda: _send(notify_database, db_name, uuids))
+    uuids.update(job_uuids)
+
+
+def _send(notify_database, db_name, job_uuids):
+    if not job_uuids:
+        return
+    try:
+        with sql_db.db_connect(notify_database).cursor() as cr:
+            for payload in _relay_payloads(db_name, job_uuids):
+                cr.execute("SELECT pg_notify(%s, %s)", (RELAY_CHANNEL, payload))
+    except Exception:
+        # the runner catches up when it reloads the jobs of the database
+        _logger.warning(
+            "could not relay the notifications of jobs of db %s",
+            db_name,
+            exc_info=True,
+        )
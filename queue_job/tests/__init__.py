@@ -1,5 +1,6 @@
 from . import test_runner_channels
 from . import test_runner_runner
+from . import test_runner_metrics
 from . import test_delayable
 from . import test_delayable_split
 from . import test_json_field
@@ -4,6 +4,7 @@
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
 import os
+from unittest import mock
 
 from odoo.tests import BaseCase, tagged
 
@@ -57,3 +58,204 @@ class TestRunner(BaseCase):
 
         self.assertFalse(self._is_open_file_descriptor(read_fd))
         self.assertFalse(self._is_open_file_descriptor(write_fd))
+
+    def test_runner_run_jobs_enqueue_in_bulk(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        for db_name, uuid in (("db1", "A"), ("db2", "B"), ("db1", "C")):
+            a_runner.channel_manager.notify(
+                db_name, "root", uuid, 1, 0, 10, None, "pending"
+            )
+        a_runner.db_by_name = {"db1": mock.Mock(), "db2": mock.Mock()}
+        for db in a_runner.db_by_name.values():
+            db.set_jobs_enqueued.side_effect = lambda uuids: uuids
+        a_runner.dispatcher = mock.Mock()
+
+        a_runner.run_jobs()
+
+        a_runner.db_by_name["db1"].set_jobs_enqueued.assert_called_once_with(["A", "C"])
+        a_runner.db_by_name["db2"].set_jobs_enqueued.assert_called_once_with(["B"])
+        self.assertEqual(a_runner.dispatcher.dispatch.call_count, 3)
+
+    def test_runner_run_jobs_by_batches(self):
+        a_runner = runner.QueueJobRunner(
+            channel_config_string="root:2,root.fast:2:batch_size=3:batch_time_budget=5"
+        )
+        for seq, uuid in enumerate("ABCDEFGH"):
+            a_runner.channel_manager.notify(
+                "db", "root.fast", uuid, seq, 0, 10, None, "pending"
+            )
+        db = mock.Mock(db_name="db")
+        db.set_jobs_enqueued.side_effect = lambda uuids: uuids
+        a_runner.db_by_name = {"db": db}
+        a_runner.dispatcher = mock.Mock()
+
+        a_runner.run_jobs()
+
+        # each batch uses a single slot of the capacity of the channels
+        self.assertEqual(
+            a_runner.dispatcher.dispatch_batch.call_args_list,
+            [
+                mock.call("db", ["A", "B", "C"], 5, "root.fast"),
+                mock.call("db", ["D", "E", "F"], 5, "root.fast"),
+            ],
+        )
+        a_runner.dispatcher.dispatch.assert_not_called()
+
+    def test_runner_process_notifications_coalesced(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        a_runner.channel_manager.notify("db", "root", "C", 3, 0, 10, None, "pending")
+        db = mock.Mock(db_name="db")
+        db.conn.notifies = [mock.Mock(payload=uuid) for uuid in "ABAC"]
+        db.fetch_jobs.return_value = [
+            ("root", "A", 1, 0, 10, None, "pending"),
+            ("root", "B", 2, 0, 10, None, "pending"),
+        ]
+        a_runner.db_by_name = {"db": db}
+
+        a_runner.process_notifications()
+
+        db.fetch_jobs.assert_called_once_with({"A", "B", "C"})
+        self.assertFalse(db.conn.notifies)
+        jobs = a_runner.channel_manager.get_jobs_to_run(now=100)
+        self.assertEqual([job.uuid for job in jobs], ["A", "B"])
+
+    def test_runner_process_notifications_full_payload(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        db = mock.Mock(db_name="db")
+        db.conn.notifies = [
+            mock.Mock(
+                payload='["root", "A", 1, "2024-01-02T03:04:05.000000", '
+                '10, null, "pending"]'
+            ),
+            mock.Mock(payload="B"),
+        ]
+        db.fetch_jobs.return_value = []
+        a_runner.db_by_name = {"db": db}
+
+        a_runner.process_notifications()
+
+        # only the job notified without its properties is read back
+        db.fetch_jobs.assert_called_once_with({"B"})
+        jobs = a_runner.channel_manager.get_jobs_to_run(now=100)
+        self.assertEqual([job.uuid for job in jobs], ["A"])
+
+    def test_runner_run_jobs_not_pending_anymore(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        for uuid in ("A", "B"):
+            a_runner.channel_manager.notify(
+                "db", "root", uuid, 1, 0, 10, None, "pending"
+            )
+        db = mock.Mock(db_name="db")
+        # B has been done in the meantime
+        db.set_jobs_enqueued.return_value = ["A"]
+        db.fetch_jobs.return_value = [("root", "B", 1, 0, 10, None, "done")]
+        a_runner.db_by_name = {"db": db}
+        a_runner.dispatcher = mock.Mock()
+
+        a_runner.run_jobs()
+
+        a_runner.dispatcher.dispatch.assert_called_once_with("db", "A", "root")
+        self.assertEqual(a_runner.channel_manager.get_active_job_uuids("db"), {"A"})
+
+    def test_runner_load_backlog_by_chunks(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        db = mock.Mock(db_name="db")
+        db.fetch_active_jobs.return_value = [("root", "S", 1, 0, 10, None, "started")]
+        db.fetch_pending_jobs.side_effect = [
+            [("root", "P1", 2, 0, 5, None, "pending")],
+            [("root", "P2", 3, 0, 10, None, "pending")],
+            [],
+        ]
+        a_runner.db_by_name = {"db": db}
+        a_runner._load_jobs(db)
+
+        with mock.patch.object(runner, "BACKLOG_CHUNK_SIZE", 1):
+            a_runner.load_backlog()
+            a_runner.load_backlog()
+            a_runner.load_backlog()
+
+        self.assertEqual(
+            db.fetch_pending_jobs.call_args_list,
+            [mock.call(None, 1), mock.call((5, 2), 1), mock.call((10, 3), 1)],
+        )
+        self.assertFalse(a_runner._backlog_keys)
+        jobs = a_runner.channel_manager.get_jobs_to_run(now=100)
+        self.assertEqual([job.uuid for job in jobs], ["P1", "P2"])
+
+    def test_runner_discover_databases(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        a_runner.channel_manager.notify("old", "root", "O", 1, 0, 10, None, "pending")
+        a_runner.channel_manager.notify("kept", "root", "K", 2, 0, 10, None, "pending")
+        old_db, kept_db = mock.Mock(), mock.Mock()
+        a_runner.db_by_name = {"old": old_db, "kept": kept_db}
+        a_runner._next_db_discovery = 0
+
+        def new_database(db_name, pool=None):
+            db = mock.Mock(db_name=db_name, has_queue_job=db_name == "new")
+            db.fetch_active_jobs.return_value = []
+            db.fetch_pending_jobs.return_value = [
+                ("root", "N", 3, 0, 10, None, "pending")
+            ]
+            return db
+
+        with (
+            mock.patch.object(
+                a_runner, "get_db_names", return_value=["kept", "new", "other"]
+            ),
+            mock.patch.object(runner, "Database", side_effect=new_database) as database,
+        ):
+            a_runner.discover_databases()
+            a_runner.load_backlog()
+
+        self.assertEqual(
+            [call.args for call in database.call_args_list], [("new",), ("other",)]
+        )
+        self.assertEqual(sorted(a_runner.db_by_name), ["kept", "new"])
+        self.assertIs(a_runner.db_by_name["kept"], kept_db)
+        old_db.close.assert_called_once_with()
+        kept_db.close.assert_not_called()
+        self.assertGreater(a_runner._next_db_discovery, 0)
+        jobs = a_runner.channel_manager.get_jobs_to_run(now=100)
+        self.assertEqual(sorted(job.uuid for job in jobs), ["K", "N"])
+
+    def test_runner_process_relayed_notifications(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        db1, db2 = mock.Mock(db_name="db1"), mock.Mock(db_name="db2")
+        db1.fetch_jobs.return_value = [("root", "A", 1, 0, 10, None, "pending")]
+        db2.fetch_jobs.return_value = []
+        a_runner.db_by_name = {"db1": db1, "db2": db2}
+        a_runner.relay = mock.Mock()
+        a_runner.relay.conn.notifies = [
+            mock.Mock(payload='["db1", "A"]'),
+            mock.Mock(payload='["db2", "B"]'),
+            mock.Mock(payload='["unknown", "C"]'),
+        ]
+
+        a_runner.process_notifications()
+
+        db1.fetch_jobs.assert_called_once_with({"A"})
+        db2.fetch_jobs.assert_called_once_with({"B"})
+        db1.keep_alive.assert_not_called()
+        self.assertFalse(a_runner.relay.conn.notifies)
+        jobs = a_runner.channel_manager.get_jobs_to_run(now=100)
+        self.assertEqual([job.uuid for job in jobs], ["A"])
+
+    def test_runner_connection_pool(self):
+        pool = runner.ConnectionPool(max_idle=1)
+        with (
+            mock.patch.object(runner, "_connection_info_for", return_value={}),
+            mock.patch.object(runner.psycopg2, "connect") as connect,
+        ):
+            connect.side_effect = lambda: mock.Mock()
+            with pool.cursor("db1"):
+                pass
+            with pool.cursor("db1"):
+                pass
+            self.assertEqual(connect.call_count, 1)
+            conn1 = pool._idle["db1"][0]
+            with pool.cursor("db2"):
+                pass
+            self.assertEqual(connect.call_count, 2)
+            # only one idle connection is kept
+            conn1.close.assert_called_once_with()
+            self.assertEqual(list(pool._idle), ["db2"])